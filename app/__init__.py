@@ -69,6 +69,10 @@ def create_app(config_name):
     from .blog import blog as blog_blueprint
     app.register_blueprint(blog_blueprint, url_prefix='/blog')
 
+    # register the celery tasks defined in the parts above and the periodic ones
+    from . import statistics
+    flask_celery.finalize()
+
     # config logger part if not set debug flag
     if not app.debug:
         if os.environ.get("HOSTNAME"):
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from .. import db
+from ..models import User, OJList, Problem, SubmissionStatus, Contest, Tag
+from ..presence import online_count
+import time
+
+
+def _cache():
+
+    '''
+        metrics cache of this worker
+    :return: dict
+    '''
+
+    return current_app.extensions.setdefault('admin_metrics', {})
+
+
+def compute_metrics():
+
+    '''
+        compute the dashboard counters, one pass over users with the small tables as sub queries
+        and one grouped pass over the status index of submissions
+    :return: dict of counters
+    '''
+
+    user_num, unconfirmed_user, problem_num, contest_num, tag_num, oj_status = db.session.query(
+        db.func.count(User.id),
+        db.func.sum(db.case([(User.confirmed == False, 1)], else_=0)),
+        db.session.query(db.func.count(Problem.id)).as_scalar(),
+        db.session.query(db.func.count(Contest.id)).as_scalar(),
+        db.session.query(db.func.count(Tag.id)).as_scalar(),
+        db.session.query(db.func.count(OJList.id)).filter(OJList.status == 0).as_scalar()
+    ).one()
+    status = dict(db.session.query(SubmissionStatus.status, db.func.count(SubmissionStatus.id)).group_by(SubmissionStatus.status).all())
+    return {
+        'user_num': user_num,
+        'unconfirmed_user': int(unconfirmed_user or 0),
+        'online_user_num': online_count(),
+        'oj_status': oj_status,
+        'problem_num': problem_num,
+        'submission_num': sum(status.values()),
+        'contest_num': contest_num,
+        'tag_num': tag_num,
+        'judging_num': status.get(current_app.config['LOCAL_SUBMISSION_STATUS']['Judging'], 0),
+        'waiting_num': status.get(current_app.config['LOCAL_SUBMISSION_STATUS']['Waiting'], 0)
+    }
+
+
+def get_metrics():
+
+    '''
+        get the dashboard counters, computed again after ADMIN_METRICS_TTL seconds or an invalidation
+    :return: dict of counters
+    '''
+
+    cache = _cache()
+    now = time.time()
+    if cache.get('expire', 0) <= now:
+        cache['metrics'] = compute_metrics()
+        cache['expire'] = now + current_app.config['ADMIN_METRICS_TTL']
+    return cache['metrics']
+
+
+def invalidate_metrics():
+
+    '''
+        drop the cached counters after the admin changed them
+    :return: None
+    '''
+
+    _cache().pop('expire', None)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from .. import flask_celery
+from werkzeug.utils import secure_filename
+from contextlib import contextmanager
+import os, re, json, time, fcntl, hashlib, tempfile, zipfile
+
+# bytes copied at a time, files are never held in memory
+BLOCK_SIZE = 64 * 1024
+# ids of resumable uploads, chosen by the client
+UPLOAD_ID = re.compile(r'^[0-9A-Za-z_-]{1,64}$')
+MANIFEST = 'manifest.json'
+
+
+def data_dir(problem_id):
+
+    '''
+        directory of the test data of a problem
+    :param problem_id: problem id
+    :return: path
+    '''
+
+    return os.path.join(current_app.config['UPLOADED_PATH'], str(problem_id))
+
+
+def _part_path(problem_id, upload_id):
+
+    '''
+        file of the bytes received by a resumable upload, in the data directory so it is moved without copy
+    :param problem_id: problem id
+    :param upload_id: upload id
+    :return: path
+    '''
+
+    if not UPLOAD_ID.match(upload_id):
+        raise ValueError('Wrong upload id')
+    return os.path.join(data_dir(problem_id), '.uploads', upload_id + '.part')
+
+
+def copy_stream(source, target, hasher=None):
+
+    '''
+        copy a stream block by block
+    :param source: readable file obj
+    :param target: writable file obj
+    :param hasher: hashlib obj updated with the bytes, or None
+    :return: number of bytes copied
+    '''
+
+    size = 0
+    while True:
+        block = source.read(BLOCK_SIZE)
+        if not block:
+            return size
+        if hasher is not None:
+            hasher.update(block)
+        target.write(block)
+        size += len(block)
+
+
+def file_digest(path):
+
+    '''
+        sha256 of a file, read block by block
+    :param path: file path
+    :return: hex digest
+    '''
+
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+@contextmanager
+def _locked(problem_id):
+
+    '''
+        hold the manifest lock of a problem, shared by the workers on the host
+    :param problem_id: problem id
+    :return: None
+    '''
+
+    with open(os.path.join(data_dir(problem_id), '.manifest.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_manifest(problem_id):
+
+    '''
+        manifest of the test data, judgers compare it with their copy and fetch only the changed files
+    :param problem_id: problem id
+    :return: {'version': int, 'files': {name: {'size': bytes, 'sha256': hex digest}}}
+    '''
+
+    try:
+        with open(os.path.join(data_dir(problem_id), MANIFEST)) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {'version': 0, 'files': {}}
+
+
+def _write_manifest(problem_id, manifest):
+
+    '''
+        replace the manifest at once, hold the lock
+    :param problem_id: problem id
+    :param manifest: manifest dict
+    :return: None
+    '''
+
+    fd, temp = tempfile.mkstemp(dir=data_dir(problem_id), prefix='.manifest')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.rename(temp, os.path.join(data_dir(problem_id), MANIFEST))
+
+
+def rebuild_manifest(problem_id):
+
+    '''
+        hash again the files of the data directory, for files put there by hand
+    :param problem_id: problem id
+    :return: manifest dict
+    '''
+
+    directory = data_dir(problem_id)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with _locked(problem_id):
+        manifest = read_manifest(problem_id)
+        files = {}
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.startswith('.') or name == MANIFEST or not os.path.isfile(path):
+                continue
+            files[name] = {'size': os.path.getsize(path), 'sha256': file_digest(path)}
+        if files != manifest['files']:
+            manifest = {'version': manifest['version'] + 1, 'files': files}
+            _write_manifest(problem_id, manifest)
+    return manifest
+
+
+def _store(problem_id, temp, name, digest):
+
+    '''
+        move a received file to its name, a file with the same content is kept as it is
+    :param problem_id: problem id
+    :param temp: path of the received file, in the data directory
+    :param name: safe file name
+    :param digest: sha256 of the file
+    :return: (name, 'created', 'updated' or 'unchanged')
+    '''
+
+    with _locked(problem_id):
+        manifest = read_manifest(problem_id)
+        old = manifest['files'].get(name)
+        path = os.path.join(data_dir(problem_id), name)
+        if old is not None and old['sha256'] == digest and os.path.exists(path):
+            os.remove(temp)
+            return name, 'unchanged'
+        os.rename(temp, path)
+        manifest['files'][name] = {'size': os.path.getsize(path), 'sha256': digest}
+        manifest['version'] += 1
+        _write_manifest(problem_id, manifest)
+    return name, 'created' if old is None else 'updated'
+
+
+def _receive(problem_id, stream):
+
+    '''
+        write a stream to a temporary file of the data directory
+    :param problem_id: problem id
+    :param stream: readable file obj
+    :return: (temp path, sha256)
+    '''
+
+    hasher = hashlib.sha256()
+    fd, temp = tempfile.mkstemp(dir=data_dir(problem_id), prefix='.receive')
+    with os.fdopen(fd, 'wb') as f:
+        copy_stream(stream, f, hasher)
+    return temp, hasher.hexdigest()
+
+
+def _extract(problem_id, path):
+
+    '''
+        store the files of a zip archive one by one, the directories in the archive are flattened,
+        an archive with names clashing once flattened or without a safe name is rejected before storing anything
+    :param problem_id: problem id
+    :param path: path of the archive
+    :return: [(name, result)]
+    '''
+
+    results = []
+    with zipfile.ZipFile(path) as archive:
+        members = {}
+        rejected = []
+        for member in archive.infolist():
+            if member.filename.endswith('/'):
+                continue
+            name = secure_filename(os.path.basename(member.filename))
+            if not name or name == MANIFEST:
+                rejected.append(member.filename)
+            elif name in members:
+                rejected.extend([members[name].filename, member.filename])
+            else:
+                members[name] = member
+        if rejected:
+            raise ValueError('Wrong file names in the zip file: %s' % ', '.join(sorted(set(rejected))))
+        for member in archive.infolist():
+            name = secure_filename(os.path.basename(member.filename))
+            if members.get(name) is not member:
+                continue
+            source = archive.open(member)
+            try:
+                temp, digest = _receive(problem_id, source)
+            finally:
+                source.close()
+            results.append(_store(problem_id, temp, name, digest))
+    return results
+
+
+def _safe_name(filename):
+
+    '''
+        name of an uploaded file in the data directory
+    :param filename: name given by the client
+    :return: safe name
+    '''
+
+    name = secure_filename(filename or '')
+    if not name or name == MANIFEST:
+        raise ValueError('Wrong file name')
+    return name
+
+
+def _store_received(problem_id, temp, name, digest=None):
+
+    '''
+        store a received file, a zip archive is extracted and removed
+    :param problem_id: problem id
+    :param temp: path of the received file, in the data directory
+    :param name: safe file name
+    :param digest: sha256 of the file, None to read it
+    :return: [(name, result)]
+    '''
+
+    if name.lower().endswith('.zip'):
+        try:
+            return _extract(problem_id, temp)
+        except zipfile.BadZipfile:
+            raise ValueError('Wrong zip file')
+        finally:
+            os.remove(temp)
+    return [_store(problem_id, temp, name, digest or file_digest(temp))]
+
+
+def save_file(problem_id, filename, stream):
+
+    '''
+        store an uploaded file, a zip archive is extracted
+    :param problem_id: problem id
+    :param filename: name given by the client
+    :param stream: readable file obj
+    :return: [(name, result)]
+    '''
+
+    name = _safe_name(filename)
+    if not os.path.isdir(data_dir(problem_id)):
+        os.makedirs(data_dir(problem_id))
+    temp, digest = _receive(problem_id, stream)
+    return _store_received(problem_id, temp, name, digest)
+
+
+def upload_offset(problem_id, upload_id):
+
+    '''
+        bytes received by a resumable upload, the client goes on from there
+    :param problem_id: problem id
+    :param upload_id: upload id
+    :return: offset
+    '''
+
+    path = _part_path(problem_id, upload_id)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def write_chunk(problem_id, upload_id, offset, stream):
+
+    '''
+        append a chunk to a resumable upload, a chunk sent again after a lost response is ignored
+    :param problem_id: problem id
+    :param upload_id: upload id
+    :param offset: position of the chunk in the file
+    :param stream: readable file obj of the chunk
+    :return: (offset after the chunk, True if the chunk was at the expected offset)
+    '''
+
+    path = _part_path(problem_id, upload_id)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'ab') as f:
+        # a single writer per upload, the others see the size and start again from there
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0, os.SEEK_END)
+            received = f.tell()
+            if offset != received:
+                return received, False
+            return received + copy_stream(stream, f), True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def finish_upload(problem_id, upload_id, filename):
+
+    '''
+        store the file of a finished resumable upload
+    :param problem_id: problem id
+    :param upload_id: upload id
+    :param filename: name given by the client
+    :return: [(name, result)]
+    '''
+
+    name = _safe_name(filename)
+    # the part is moved into place, not copied
+    return _store_received(problem_id, _part_path(problem_id, upload_id), name)
+
+
+def clean_uploads(problem_id=None):
+
+    '''
+        delete the resumable uploads not touched in UPLOAD_KEEP seconds
+    :param problem_id: problem id, None for all the problems
+    :return: number of the deleted uploads
+    '''
+
+    root = current_app.config['UPLOADED_PATH']
+    if problem_id is not None:
+        problem_ids = [problem_id]
+    else:
+        problem_ids = [name for name in os.listdir(root) if name.isdigit()] if os.path.isdir(root) else []
+    count = 0
+    for problem_id in problem_ids:
+        directory = os.path.join(data_dir(problem_id), '.uploads')
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.getmtime(path) < time.time() - current_app.config['UPLOAD_KEEP']:
+                os.remove(path)
+                count += 1
+    return count
+
+
+@flask_celery.task(
+    bind=True,
+    ignore_result=True
+)
+def prune_uploads(self):
+
+    '''
+        delete the abandoned uploads, run by the beat
+    :return: None
+    '''
+
+    clean_uploads()
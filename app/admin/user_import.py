@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+from werkzeug.security import generate_password_hash
+from .. import db, flask_celery
+from ..models import User, Role, ContestUsers, ContestImport, KeyValue
+from ..cache import invalidate_session_users
+import json
+
+FIELDS = ('realname', 'student_num', 'school', 'phone_num', 'username', 'password', 'email')
+
+
+def parse_user_list(text):
+
+    '''
+        parse the user list of the import form,
+        users = "user_realname, student_num, school, phone_num, username, password, email; ...."
+    :param text: user list
+    :return: [dict of user], the later line wins for the same username, None if a line is wrong
+    '''
+
+    users = {}
+    order = []
+    for line in text.strip().split(';'):
+        detail = [item.strip() for item in line.strip().split(',')]
+        if len(detail) != len(FIELDS):
+            return None
+        user = dict(zip(FIELDS, detail))
+        if user['username'] not in users:
+            order.append(user['username'])
+        users[user['username']] = user
+    return [users[username] for username in order]
+
+
+def progress_key(contest_id):
+
+    '''
+        key of the import progress in KeyValue
+    :param contest_id: contest id
+    :return: key
+    '''
+
+    return 'contest_import:%s' % contest_id
+
+
+def get_progress(contest_id):
+
+    '''
+        progress of the last import of the contest
+    :param contest_id: contest id
+    :return: {'total', 'done', 'finished', 'error'} or None
+    '''
+
+    value = db.session.query(KeyValue.value).filter_by(key=progress_key(contest_id)).scalar()
+    return json.loads(value) if value is not None else None
+
+
+def save_progress(contest_id, total, done, error=None):
+
+    '''
+        save the progress, committed with the users of the chunk
+    :param contest_id: contest id
+    :param total: number of the users
+    :param done: number of the imported users
+    :param error: message of the error stopping the import, None if it goes on
+    :return: None
+    '''
+
+    KeyValue.put(progress_key(contest_id), json.dumps({'total': total, 'done': done, 'finished': done >= total or error is not None,
+                                                      'error': error}))
+
+
+def stage_import(contest_id, users):
+
+    '''
+        keep the user list in the database for the task, the task params go through the broker and its logs
+    :param contest_id: contest id
+    :param users: [dict of user] from parse_user_list
+    :return: id of the staged import, committed
+    '''
+
+    item = ContestImport(contest_id=contest_id, users=json.dumps(users))
+    db.session.add(item)
+    db.session.commit()
+    return item.id
+
+
+def import_chunk(contest_id, users, pool, role_id):
+
+    '''
+        import a chunk of users: one IN query for the existing users, bulk insert for the new ones,
+        passwords hashed by the pool
+    :param contest_id: contest id
+    :param users: [dict of user]
+    :param pool: ThreadPool
+    :param role_id: role of the new users
+    :return: [user id] of the chunk
+    '''
+
+    now = datetime.utcnow()
+    usernames = [user['username'] for user in users]
+    existing = dict((user.username, user) for user in User.query.filter(User.username.in_(usernames)))
+    new_users = [user for user in users if user['username'] not in existing]
+    hashes = pool.map(generate_password_hash, [user['password'] for user in users])
+    for user, password_hash in zip(users, hashes):
+        user['password_hash'] = password_hash
+        old = existing.get(user['username'])
+        if old is not None:
+            for field in ('realname', 'student_num', 'school', 'phone_num', 'email', 'password_hash'):
+                setattr(old, field, user[field])
+            old.confirmed = True
+    db.session.flush()
+    if new_users:
+        db.session.execute(User.__table__.insert(), [{
+            'username': user['username'],
+            'realname': user['realname'],
+            'nickname': user['realname'],
+            'student_num': user['student_num'],
+            'school': user['school'],
+            'phone_num': user['phone_num'],
+            'email': user['email'],
+            'password_hash': user['password_hash'],
+            'confirmed': True,
+            'role_id': role_id,
+            'photo': User.generate_photo()
+        } for user in new_users])
+
+    ids = dict(db.session.query(User.username, User.id).filter(User.username.in_(usernames)))
+    joined = dict((item.user_id, item) for item in ContestUsers.query.filter(
+        ContestUsers.contest_id == contest_id, ContestUsers.user_id.in_(ids.values())))
+    rows = []
+    for user in users:
+        address = existing[user['username']].address if user['username'] in existing else None
+        item = joined.get(ids[user['username']])
+        if item is not None:
+            item.realname = user['realname']
+            item.address = address
+            item.school = user['school']
+            item.student_num = user['student_num']
+            item.phone_num = user['phone_num']
+            item.user_confirmed = True
+        else:
+            rows.append({
+                'user_id': ids[user['username']],
+                'contest_id': contest_id,
+                'realname': user['realname'],
+                'address': address,
+                'school': user['school'],
+                'student_num': user['student_num'],
+                'phone_num': user['phone_num'],
+                'user_confirmed': True,
+                'register_time': now
+            })
+    if rows:
+        db.session.execute(ContestUsers.__table__.insert(), rows)
+    return ids.values()
+
+
+def run_import(import_id):
+
+    '''
+        import the staged users into the contest in chunks of CONTEST_IMPORT_CHUNK, the progress is saved after every chunk,
+        a failed chunk is rolled back and its error saved in the progress, the staged list is deleted in the end
+    :param import_id: id of the staged import
+    :return: None
+    '''
+
+    item = ContestImport.query.get(import_id)
+    if item is None:
+        return
+    contest_id = item.contest_id
+    users = json.loads(item.users)
+    role_id = db.session.query(Role.id).filter_by(default=True).scalar()
+    chunk = current_app.config['CONTEST_IMPORT_CHUNK']
+    save_progress(contest_id, len(users), 0)
+    db.session.commit()
+    pool = ThreadPool(current_app.config['CONTEST_IMPORT_WORKERS'])
+    done = 0
+    user_ids = []
+    try:
+        for start in range(0, len(users), chunk):
+            chunk_ids = import_chunk(contest_id, users[start:start + chunk], pool, role_id)
+            done = min(start + chunk, len(users))
+            save_progress(contest_id, len(users), done)
+            db.session.commit()
+            user_ids.extend(chunk_ids)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Fail to import users into contest %s' % str(contest_id))
+        save_progress(contest_id, len(users), done, '%s: %s' % (e.__class__.__name__, e))
+        db.session.commit()
+    finally:
+        pool.close()
+        pool.join()
+        ContestImport.query.filter_by(id=import_id).delete(synchronize_session=False)
+        db.session.commit()
+    # the passwords of the existing users may be changed, the new ids may be cached as missing
+    invalidate_session_users(user_ids, password=True)
+
+
+@flask_celery.task(
+    bind=True,
+    ignore_result=True
+)
+def import_contest_users(self, import_id):
+
+    '''
+        celery task of importing the staged users
+    :param import_id: id of the staged import
+    :return: None
+    '''
+
+    run_import(import_id)
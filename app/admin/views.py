@@ -1,16 +1,25 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from flask import render_template, redirect, request, url_for, flash, abort, current_app
+from flask import render_template, redirect, request, url_for, flash, abort, current_app, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from . import admin
 from .. import db
-from ..models import Role, User, Permission, OJList, Problem, SubmissionStatus, CompileInfo, Contest, Logs, Tag, TagProblem, ContestUsers, ContestProblem, KeyValue, Blog
+from ..models import Role, User, Permission, OJList, Problem, SubmissionStatus, CompileInfo, Contest, Logs, Tag, TagProblem, ContestUsers, ContestProblem, ContestImport, KeyValue, Blog, JudgeQueue, Statistic, StatusEvent
 from werkzeug.utils import secure_filename
 from ..decorators import admin_required, permission_required
 from datetime import datetime, timedelta
+from ..contest.ranklist import request_snapshot, bump_generation
+from .metrics import get_metrics, invalidate_metrics
+from ..cache import invalidate_problem_meta, invalidate_session_users
+from .user_import import parse_user_list, stage_import, import_contest_users, get_progress
+from .problem_data import save_file, read_manifest, upload_offset, write_chunk, finish_upload
+from ..pagination import keyset_paginate
+from ..problem.listing import paginate_problems
+from ..problem.search import record_problem_changes
+from ..problem.tag_index import invalidate_tag_index
 from .forms import ModifyProblem, ModifyTag, ModifyUser, ModifyOJStatus, ModifySubmissionStatus, ModifyBlog, ModifyContest, AddContestProblem, ContestUserInsert
-import os, base64, json
+import os, json
 
 @admin.route('/')
 @admin_required
@@ -21,18 +30,7 @@ def admin_index():
     :return: page
     '''
 
-    # Todo: need to optimized the query
-    user_num = User.query.count()
-    unconfirmed_user = User.query.filter_by(confirmed=0).count()
-    oj_status = OJList.query.filter_by(status=0).count()
-    online_user_num = User.query.filter('last_seen>:last_seen').params(last_seen=datetime.utcnow()-timedelta(minutes=1)).count()
-    problem_num = Problem.query.count()
-    submission_num = SubmissionStatus.query.count()
-    contest_num = Contest.query.count()
-    tag_num = Tag.query.count()
-    judging_num = SubmissionStatus.query.filter_by(status=current_app.config['LOCAL_SUBMISSION_STATUS']['Judging']).count()
-    waiting_num = SubmissionStatus.query.filter_by(status=current_app.config['LOCAL_SUBMISSION_STATUS']['Waiting']).count()
-    return render_template('admin/index.html', user_num=user_num, unconfirmed_user=unconfirmed_user, oj_status=oj_status, online_user_num=online_user_num, problem_num=problem_num, submission_num=submission_num, contest_num=contest_num, tag_num=tag_num, judging_num=judging_num, waiting_num=waiting_num)
+    return render_template('admin/index.html', **get_metrics())
 
 
 @admin.route('/problems', methods=['GET', 'POST'])
@@ -44,8 +42,7 @@ def problem_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = Problem.query.order_by(Problem.id.asc()).paginate(page, per_page=current_app.config['FLASKY_PROBLEMS_PER_PAGE'])
+    pagination = paginate_problems(Problem.query, count_key='problem')
     problems = pagination.items
     return render_template('admin/problem_list.html', problems=problems, pagination=pagination)
 
@@ -110,6 +107,11 @@ def problem_insert():
             # db.session.commit()
         db.session.commit()
         current_user.log_operation('Insert problem "%s", problem_id is %s' % (problem.title, str(problem.id)))
+        invalidate_metrics()
+        # a missing id may be cached as None
+        invalidate_problem_meta([problem.id])
+        invalidate_tag_index()
+        record_problem_changes([problem.id])
         return redirect(url_for('admin.problem_list'))
     form.oj_id.data =  problem.oj_id
     form.title.data = problem.title
@@ -144,6 +146,7 @@ def problem_edit(problem_id):
     problem = Problem.query.get_or_404(problem_id)
     form = ModifyProblem()
     if form.validate_on_submit():
+        indexed = problem.tag_index_fields()
         problem.remote_id = form.problem_id.data
         problem.oj_id = form.oj_id.data
         problem.title = form.title.data
@@ -174,6 +177,11 @@ def problem_edit(problem_id):
         db.session.add(problem)
         db.session.commit()
         current_user.log_operation('Edit problem "%s", problem_id is %s' % (problem.title, str(problem.id)))
+        invalidate_problem_meta([problem.id])
+        # most edits only change the statement
+        if problem.tag_index_fields() != indexed:
+            invalidate_tag_index()
+        record_problem_changes([problem.id])
         return redirect(url_for('admin.problem_list'))
     form.problem_id.data = problem.remote_id
     form.oj_id.data = problem.oj_id
@@ -201,19 +209,50 @@ def problem_edit(problem_id):
 def upload_file(problem_id):
 
     '''
-        deal with the input file list upload operation
+        deal with the input file list upload operation, zip archives are extracted,
+        the page sends large files in chunks to upload_chunk
     :param problem_id: problem_id
-    :return: None
+    :return: page
     '''
 
     problem = Problem.query.get_or_404(problem_id)
     if request.method == 'POST':
-        if not os.path.exists(current_app.config['UPLOADED_PATH'] + str(problem_id) + '/'):
-            os.makedirs(current_app.config['UPLOADED_PATH'] + str(problem_id) + '/')
-        for f in request.files.getlist('file'):
-            # print os.path.join(current_app.config['UPLOADED_PATH'] + str(problem_id) + '/', f.filename)
-            f.save(os.path.join(current_app.config['UPLOADED_PATH'] + str(problem_id) + '/', f.filename))
-    return render_template('admin/upload.html', problem_id=problem_id)
+        try:
+            for f in request.files.getlist('file'):
+                for name, result in save_file(problem_id, f.filename, f.stream):
+                    flash('%s: %s' % (name, result))
+        except ValueError as e:
+            flash(e.args[0])
+    return render_template('admin/upload.html', problem_id=problem_id, manifest=read_manifest(problem_id),
+                           chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'])
+
+
+@admin.route('/upload/<int:problem_id>/chunk/<upload_id>', methods=['GET', 'POST'])
+@admin_required
+def upload_chunk(problem_id, upload_id):
+
+    '''
+        deal with the resumable upload operation, GET tells the bytes received, POST appends the raw body at the offset arg,
+        the file is stored with the name arg when the total arg is reached, a chunk not at the received size gets 409
+    :param problem_id: problem_id
+    :param upload_id: id of the upload chosen by the client
+    :return: offset and stored files in json
+    '''
+
+    Problem.query.get_or_404(problem_id)
+    try:
+        if request.method == 'GET':
+            return jsonify({'offset': upload_offset(problem_id, upload_id)})
+        offset, accepted = write_chunk(problem_id, upload_id, request.args.get('offset', 0, type=int), request.stream)
+        if not accepted:
+            return jsonify({'offset': offset}), 409
+        total = request.args.get('total', None, type=int)
+        if total is None or offset < total:
+            return jsonify({'offset': offset})
+        files = finish_upload(problem_id, upload_id, request.args.get('name'))
+    except ValueError as e:
+        return jsonify({'error': 'bad request', 'message': e.args[0]}), 400
+    return jsonify({'offset': offset, 'files': [{'name': name, 'result': result} for name, result in files]})
 
 
 @admin.route('/tags', methods=['GET', 'POST'])
@@ -225,8 +264,7 @@ def tag_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = Tag.query.order_by(Tag.id.desc()).paginate(page, per_page=current_app.config['FLASKY_TAGS_PER_PAGE'])
+    pagination = keyset_paginate(Tag.query, Tag.id, current_app.config['FLASKY_TAGS_PER_PAGE'])
     tags = pagination.items
     return render_template('admin/tag_list.html', tags=tags,  pagination=pagination)
 
@@ -248,6 +286,7 @@ def tag_edit(tag_id):
         db.session.add(tag)
         db.session.commit()
         current_user.log_operation('Edit tag %s, tag_id is %s' % (tag.tag_name, str(tag.id)))
+        invalidate_tag_index()
         flash('Tag update sucessful!')
         return redirect(url_for('admin.tag_list'))
     form.tag_name.data = tag.tag_name
@@ -270,6 +309,8 @@ def tag_insert():
         db.session.add(tag)
         db.session.commit()
         current_user.log_operation('Add tag %s' % tag.tag_name)
+        invalidate_metrics()
+        invalidate_tag_index()
         flash('Add tag sucessful!')
         return redirect(url_for('admin.tag_list'))
     form.tag_name.data = ''
@@ -285,8 +326,7 @@ def user_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = User.query.order_by(User.id.asc()).paginate(page, per_page=current_app.config['FLASKY_USERS_PER_PAGE'])
+    pagination = keyset_paginate(User.query, User.id, current_app.config['FLASKY_USERS_PER_PAGE'], descending=False, count_key='user')
     users = pagination.items
     return render_template('admin/user_list.html', users=users, pagination=pagination)
 
@@ -331,6 +371,8 @@ def user_edit(user_id):
         db.session.add(user)
         db.session.commit()
         current_user.log_operation('Edit user %s, user_id is %s' % (user.username, str(user.id)))
+        invalidate_metrics()
+        invalidate_session_users([user.id])
         flash('Update successful!')
         return redirect(url_for('admin.user_list'))
     form.email.data = user.email
@@ -373,8 +415,7 @@ def oj_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = OJList.query.order_by(OJList.id.asc()).paginate(page, per_page=current_app.config['FLASKY_OJS_PER_PAGE'])
+    pagination = keyset_paginate(OJList.query, OJList.id, current_app.config['FLASKY_OJS_PER_PAGE'], descending=False)
     oj = pagination.items
     return render_template('admin/oj_list.html', oj=oj, pagination=pagination)
 
@@ -414,6 +455,9 @@ def oj_status_edit(oj_id):
         db.session.add(oj)
         db.session.commit()
         current_user.log_operation('Edit oj %s Status, oj_id is %s' % (oj.name, str(oj.id)))
+        invalidate_metrics()
+        invalidate_problem_meta()
+        invalidate_tag_index()
         flash('Update oj status successful!')
         return redirect(url_for('admin.oj_list'))
     form.oj_name.data = oj.name
@@ -444,6 +488,7 @@ def oj_status_insert():
         db.session.add(oj)
         db.session.commit()
         current_user.log_operation('Add oj %s, oj_id is %s' % (oj.name, str(oj.id)))
+        invalidate_metrics()
         flash('Add oj status successful!')
         return redirect(url_for('admin.oj_list'))
     return render_template('admin/oj-status_add.html', form=form)
@@ -466,6 +511,9 @@ def oj_status_delete():
             db.session.delete(oj)
             db.session.commit()
             current_user.log_operation('Delete oj %s, oj_id is %s' % (oj.name, str(oj.id)))
+            invalidate_metrics()
+            invalidate_problem_meta()
+            invalidate_tag_index()
             flash('Delete oj successful!')
             return redirect(url_for('admin.oj_list'))
         else:
@@ -484,8 +532,7 @@ def submission_status_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = SubmissionStatus.query.order_by(SubmissionStatus.id.desc()).paginate(page, per_page=current_app.config['FLASKY_STATUS_PER_PAGE'])
+    pagination = keyset_paginate(SubmissionStatus.query, SubmissionStatus.id, current_app.config['FLASKY_STATUS_PER_PAGE'], count_key='status')
     status = pagination.items
     submissions = {}
     language = {}
@@ -507,7 +554,7 @@ def submission_status_detail(submission_id):
     '''
 
     status_detail = SubmissionStatus.query.filter_by(id=submission_id).first_or_404()
-    code = base64.b64decode(status_detail.code)
+    code = status_detail.code
     ce_info = CompileInfo.query.filter_by(submission_id=submission_id).first()
     submissions = {}
     language = {}
@@ -529,14 +576,32 @@ def submission_status_edit(submission_id):
     '''
 
     status_detail = SubmissionStatus.query.filter_by(id=submission_id).first_or_404()
-    code = base64.b64decode(status_detail.code)
+    code = status_detail.code
     ce_info = CompileInfo.query.filter_by(submission_id=submission_id).first()
     form = ModifySubmissionStatus()
     if form.validate_on_submit():
+        Statistic.record([(status_detail.author_username, status_detail.problem_id, status_detail.status, form.status.data)])
+        verdict_changed = status_detail.status != form.status.data
         status_detail.status = form.status.data
         status_detail.exec_time = form.exec_time.data
         status_detail.exec_memory = form.exec_memory.data
         status_detail.visible = form.visible.data
+        StatusEvent.record([(status_detail.id, status_detail.contest_id, status_detail.author_username, status_detail.status,
+                             status_detail.exec_time, status_detail.exec_memory)])
+        if status_detail.status == current_app.config['LOCAL_SUBMISSION_STATUS']['Waiting']:
+            JudgeQueue.enqueue(status_detail)
+        elif status_detail.status == current_app.config['LOCAL_SUBMISSION_STATUS']['Judging']:
+            # the judger holding it posts the verdict, or its lease expires and it is claimed again
+            if JudgeQueue.query.filter_by(submission_id=status_detail.id).first() is None:
+                JudgeQueue.enqueue(status_detail)
+        else:
+            JudgeQueue.ack(status_detail.id)
+        contest = Contest.query.get(status_detail.contest_id) if status_detail.contest_id else None
+        if contest is not None and verdict_changed:
+            # the ranklist engines only follow waiting and judging submissions, rebuild them
+            bump_generation(contest.id)
+            db.session.commit()
+            request_snapshot(contest, force=True)
         return redirect(url_for('admin.submission_status_list'))
     form.status.data = status_detail.status
     form.exec_time.data = status_detail.exec_time
@@ -554,8 +619,7 @@ def log_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = Logs.query.order_by(Logs.id.desc()).paginate(page, per_page=current_app.config['FLASKY_LOGS_PER_PAGE'])
+    pagination = keyset_paginate(Logs.query, Logs.id, current_app.config['FLASKY_LOGS_PER_PAGE'], count_key='logs')
     logs = pagination.items
     return render_template('admin/log_list.html', logs=logs, pagination=pagination)
 
@@ -569,8 +633,7 @@ def blog_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = Blog.query.order_by(Blog.id.desc()).paginate(page, per_page=current_app.config['FLASKY_BLOGS_PER_PAGE'])
+    pagination = keyset_paginate(Blog.query, Blog.id, current_app.config['FLASKY_BLOGS_PER_PAGE'])
     blogs = pagination.items
     return render_template('admin/blog_list.html', blogs=blogs, pagination=pagination)
 
@@ -649,8 +712,7 @@ def contest_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = Contest.query.order_by(Contest.id.desc()).paginate(page, per_page=current_app.config['FLASKY_CONTESTS_PER_PAGE'])
+    pagination = keyset_paginate(Contest.query, Contest.id, current_app.config['FLASKY_CONTESTS_PER_PAGE'])
     contests = pagination.items
     now = datetime.utcnow()
     return render_template('admin/contest_list.html', contests=contests, pagination=pagination, now=now)
@@ -714,6 +776,7 @@ def contest_insert():
         db.session.add(contest)
         db.session.commit()
         current_user.log_operation('Add contest %s, contest_id is %s' % (contest.contest_name, str(contest.id)))
+        invalidate_metrics()
         flash(u'添加比赛成功!')
         # Todo: check if the contest.id is good for use
         return redirect(url_for('admin.add_contest_problem', contest_id=contest.id))
@@ -782,8 +845,10 @@ def contest_edit(contest_id):
         db.session.commit()
         current_user.log_operation('Edit contest %s, contest_id is %s' % (contest.contest_name, str(contest.id)))
         flash(u'编辑比赛成功!')
+        # contest time or frozen setting may change
+        request_snapshot(contest, force=True)
         # Todo: check if the contest.id is good for use
-        return redirect(url_for('admin.add_contest_problem', contest_id=contest.id))
+        return redirect(url_for('admin.add_contest_problem', contest_id=contest_id))
     form.contest_name.data = contest.contest_name
     form.start_time.data = contest.start_time + timedelta(hours=8)
     form.end_time.data = contest.end_time + timedelta(hours=8)
@@ -889,12 +954,18 @@ def rejudge_contest_problem(contest_id):
                 # rejudge it
             submissions = contest.submissions.filter_by(problem_id=problem.id).all()
             for item in submissions:
+                Statistic.record([(item.author_username, item.problem_id, item.status, 0)])
                 item.status = 0
                 db.session.add(item)
+                JudgeQueue.enqueue(item)
+            StatusEvent.record((item.id, item.contest_id, item.author_username, 0, None, None) for item in submissions)
+            # the verdicts of old submissions changed, every ranklist engine rebuilds from scratch
+            bump_generation(contest.id)
             db.session.commit()
             current_user.log_operation('Rejudge problem %s from contest %s, problem id is %s, contest_id is %s' % (
             problem.title, contest.contest_name, str(problem.id), str(contest.id)))
             flash(u'rejudge请求提交成功')
+            request_snapshot(contest, force=True)
         else:
             flash(u'题目列表中不存在该题目！')
     else:
@@ -919,51 +990,39 @@ def contest_insert_user(contest_id):
     contest = Contest.query.get_or_404(contest_id)
     form = ContestUserInsert()
     if form.validate_on_submit():
-        users = form.user_list.data.strip().split(';')
-        user_to_insert = []
-        for user in users:
-            user = user.strip()
-            user_detail = user.split(',')
-            if len(user_detail) != 7:
-                flash(u'输入的用户数据错误, 每个数据行只能有7个元素,数据行间以英文分号分隔!')
-                return redirect(url_for('admin.contest_insert_user',contest_id=contest_id))
-            find_user = User.query.filter_by(username=user_detail[4].strip()).first()
-            if find_user is not None:
-                find_user.realname = user_detail[0].strip()
-                find_user.student_num = user_detail[1].strip()
-                find_user.school = user_detail[2].strip()
-                find_user.phone_num = user_detail[3].strip()
-                find_user.password = user_detail[5].strip()
-                find_user.email = user_detail[6].strip()
-                find_user.confirmed = True
-            else:
-                find_user = User()
-                find_user.username = user_detail[4].strip()
-                find_user.realname = user_detail[0].strip()
-                find_user.nickname = user_detail[0].strip()
-                find_user.student_num = user_detail[1].strip()
-                find_user.school = user_detail[2].strip()
-                find_user.phone_num = user_detail[3].strip()
-                find_user.password = user_detail[5].strip()
-                find_user.email = user_detail[6].strip()
-                find_user.confirmed = True
-            user_to_insert.append(find_user)
-        for user in user_to_insert:
-            db.session.add(user)
+        users = parse_user_list(form.user_list.data)
+        if users is None:
+            flash(u'输入的用户数据错误, 每个数据行只能有7个元素,数据行间以英文分号分隔!')
+            return redirect(url_for('admin.contest_insert_user',contest_id=contest_id))
+        current_user.log_operation('Insert %d users into contest "%s", contest_id is %s' % (len(users), contest.contest_name, str(contest.id)))
+        # the passwords stay out of the broker
+        import_id = stage_import(contest_id, users)
+        try:
+            result = import_contest_users.delay(import_id)
+        except Exception:
+            # nobody will read the staged passwords
+            ContestImport.query.filter_by(id=import_id).delete(synchronize_session=False)
             db.session.commit()
-            contest_user = ContestUsers(
-                user_id=user.id,
-                contest_id=contest_id,
-                realname=user.realname,
-                address=user.address,
-                school=user.school,
-                student_num=user.student_num,
-                phone_num=user.phone_num,
-                user_confirmed=True,
-                register_time=datetime.utcnow()
-            )
-            db.session.add(contest_user)
-            db.session.commit()
-        flash(u'插入用户成功!')
+            current_app.logger.exception('Fail to send the import task of contest %s' % str(contest_id))
+            flash(u'导入任务提交失败, 请稍后重试!')
+            return redirect(url_for('admin.contest_insert_user', contest_id=contest_id))
+        if result.ready():
+            flash(u'插入用户成功!')
+        else:
+            flash(u'正在导入用户, 进度见导入页面')
         return redirect(url_for('admin.contest_detail', contest_id=contest_id))
-    return render_template('admin/contest_insert_user.html', form=form, contest=contest)
\ No newline at end of file
+    progress = get_progress(contest_id)
+    return render_template('admin/contest_insert_user.html', form=form, contest=contest, progress=progress)
+
+
+@admin.route('/contest/insert_user/<int:contest_id>/progress')
+@admin_required
+def contest_insert_user_progress(contest_id):
+
+    '''
+        define operation about showing the progress of the user import
+    :param contest_id: contest_id
+    :return: progress in json
+    '''
+
+    return jsonify(get_progress(contest_id) or {})
\ No newline at end of file
@@ -5,4 +5,4 @@ from flask import Blueprint
 
 api = Blueprint('api', __name__)
 
-from . import authentication, errors, status, problem
\ No newline at end of file
+from . import authentication, errors, status, problem, metrics
\ No newline at end of file
@@ -1,15 +1,71 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from flask import g, jsonify
+from flask import g, jsonify, current_app
 from flask_httpauth import HTTPBasicAuth
+from itsdangerous import TimedJSONWebSignatureSerializer as Serializer
 from ..models import User, AnonymousUser, Permission
+from ..cache import VersionedCache, get_session_user
 from . import api
 from .errors import unauthorized, forbidden
+import hashlib, hmac, time
 
 auth = HTTPBasicAuth()
 
 
+def load_credential(fingerprint, username_or_token, password):
+
+    '''
+        verify the credentials of an api call, the token signature or the password hash
+    :param fingerprint: key of the credentials in the cache
+    :param username_or_token: username or token, depend on the password
+    :param password: password or ''
+    :return: (expire time, user id or None)
+    '''
+
+    now = time.time()
+    expire = now + current_app.config['API_AUTH_CACHE_TTL']
+    if password == '':
+        s = Serializer(current_app.config['SECRET_KEY'])
+        try:
+            data, header = s.loads(username_or_token, return_header=True)
+        except:
+            return now, None
+        return min(expire, header['exp']), data.get('id')
+    user = User.query.filter_by(username=username_or_token).first()
+    if user is None or not user.verify_password(password):
+        return now, None
+    return expire, user.id
+
+
+# dropped after a password changed, the users themselves come from the session users
+credentials = VersionedCache('api_credential', load_credential)
+
+
+def credential_user(username_or_token, password):
+
+    '''
+        user of the credentials, verified once and kept until API_AUTH_CACHE_TTL or the token expires
+    :param username_or_token: username or token, depend on the password
+    :param password: password or ''
+    :return: user or None
+    '''
+
+    # the cache never keeps the password itself
+    fingerprint = hmac.new(str(current_app.config['SECRET_KEY']),
+                           (u'%s\0%s' % (username_or_token, password)).encode('utf-8'), hashlib.sha256).hexdigest()
+    now = time.time()
+    expire, user_id = credentials.get(fingerprint, username_or_token, password)
+    if user_id is not None and expire <= now:
+        credentials.discard(fingerprint)
+        expire, user_id = credentials.get(fingerprint, username_or_token, password)
+    if user_id is None:
+        # wrong credentials are checked every time
+        credentials.discard(fingerprint)
+        return None
+    return get_session_user(user_id)
+
+
 @auth.verify_password
 def verify_password(username_or_token, password):
 
@@ -22,18 +78,11 @@ def verify_password(username_or_token, password):
     if username_or_token == '':
         g.current_user = AnonymousUser()
         return True
-    if password == '':
-        g.current_user = User.verify_auth_token(username_or_token)
-        g.token_used = True
-        return (g.current_user is not None)
-    user = User.query.filter_by(username=username_or_token).first()
-    if not user:
-        return False
-    g.current_user = user
-    g.token_used = False
-    if not user.verify_password(password):
+    g.current_user = credential_user(username_or_token, password)
+    g.token_used = password == ''
+    if g.current_user is None:
         return False
-    if not g.current_user.can(Permission.JUDGER):
+    if not g.token_used and not g.current_user.can(Permission.JUDGER):
         return False
     return True
 
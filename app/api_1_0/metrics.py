@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import jsonify
+from ..models import Permission
+from ..admin.metrics import get_metrics
+from . import api
+from .decorators import permission_required
+
+
+@api.route('/metrics')
+@permission_required(Permission.JUDGER)
+def get_site_metrics():
+
+    '''
+        define operation of getting the counters of the admin dashboard, used for monitoring
+    :return: counters in json
+    '''
+
+    return jsonify(get_metrics())
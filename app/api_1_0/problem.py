@@ -2,10 +2,15 @@
 # -*- coding: utf-8 -*-
 
 from datetime import datetime
-from flask import jsonify, request, g, abort, url_for, current_app
+import json, os
+from flask import jsonify, request, g, abort, url_for, current_app, send_from_directory
 from ..exceptions import ValidationError
 from .. import db
 from ..models import Problem, OJList, Permission
+from ..cache import invalidate_problem_meta
+from ..problem.search import record_problem_changes
+from ..problem.tag_index import invalidate_tag_index
+from ..admin.problem_data import read_manifest, data_dir
 from . import api
 from .decorators import permission_required
 
@@ -23,6 +28,37 @@ def get_problem(id):
     return jsonify(problem.to_json())
 
 
+@api.route('/problem/<int:id>/data/')
+@permission_required(Permission.JUDGER)
+def get_problem_data(id):
+
+    '''
+        deal with operation of getting the manifest of the test data, judgers compare the sha256
+        with their copy and fetch only the changed files
+    :param id: problem id
+    :return: manifest in json
+    '''
+
+    Problem.query.get_or_404(id)
+    return jsonify(read_manifest(id))
+
+
+@api.route('/problem/<int:id>/data/<filename>')
+@permission_required(Permission.JUDGER)
+def get_problem_data_file(id, filename):
+
+    '''
+        deal with operation of getting a test data file listed in the manifest
+    :param id: problem id
+    :param filename: file name
+    :return: file
+    '''
+
+    if filename not in read_manifest(id)['files']:
+        abort(404)
+    return send_from_directory(os.path.abspath(data_dir(id)), filename, as_attachment=True)
+
+
 @api.route('/problem/update/<int:oj_id>/<int:remote_id>/', methods=['POST'])
 @permission_required(Permission.JUDGER)
 def update_problem(oj_id, remote_id):
@@ -39,6 +75,7 @@ def update_problem(oj_id, remote_id):
     problem_new = Problem.from_json(request.json)
     if not oj.vjudge:
         raise ValidationError('OJ is not vjudge!')
+    indexed = problem_old.tag_index_fields() if problem_old else None
     if not problem_old:
         problem_old = Problem()
         problem_old.oj_id = problem_new.oj_id
@@ -79,5 +116,132 @@ def update_problem(oj_id, remote_id):
         problem_old.visible = True if int(problem_new.visible) == 1 else False
     db.session.add(problem_old)
     db.session.commit()
+    invalidate_problem_meta([problem_old.id])
+    if problem_old.tag_index_fields() != indexed:
+        invalidate_tag_index()
+    record_problem_changes([problem_old.id])
     return jsonify(problem_old.to_json()), 201, \
-        {'Location': url_for('api.get_problem', id=problem_old.id, _external=True)}
\ No newline at end of file
+        {'Location': url_for('api.get_problem', id=problem_old.id, _external=True)}
+
+# columns merged by the problem imports, empty values keep the old ones
+MERGED_FIELDS = ('title', 'time_limit', 'memory_limit', 'special_judge', 'submission_num', 'accept_num', 'description', 'input',
+                 'output', 'sample_input', 'sample_output', 'source_name', 'hint', 'author', 'last_update')
+
+
+def read_problem_items():
+
+    '''
+        items of a problem import, a json array, or one json object per line (ndjson) read from the stream
+    :return: iterable of (line, item), line is the position in the array for json
+    '''
+
+    if request.mimetype == 'application/json':
+        items = request.get_json()
+        if not isinstance(items, list):
+            raise ValidationError('Problems require a list')
+        return enumerate(items, 1)
+    return ((line, text) for line, text in enumerate(request.stream, 1) if text.strip())
+
+
+def import_problem_chunk(oj_id, chunk):
+
+    '''
+        upsert a chunk of problems of one oj in one transaction, the existing rows are found by one IN query
+        and merged like update_problem
+    :param oj_id: oj id
+    :param chunk: [(line, item)], an item is a dict or a line of json
+    :return: [result dict] in the order of the chunk
+    '''
+
+    results = []
+    # remote id -> values to write
+    values = {}
+    for line, item in chunk:
+        result = {'line': line}
+        results.append(result)
+        try:
+            if not isinstance(item, dict):
+                try:
+                    item = json.loads(item)
+                except ValueError:
+                    raise ValidationError('Invalid json')
+                if not isinstance(item, dict):
+                    raise ValidationError('Problem require an object')
+            item.setdefault('oj_id', oj_id)
+            problem = Problem.from_json(item)
+            try:
+                remote_id = result['remote_id'] = int(problem.remote_id)
+            except (TypeError, ValueError):
+                raise ValidationError('Wrong remote_id!')
+            if str(problem.oj_id) != str(oj_id):
+                raise ValidationError('Wrong oj_id or remote_id!')
+        except ValidationError as e:
+            result['result'] = 'error'
+            result['message'] = e.args[0]
+            continue
+        merged = values.setdefault(remote_id, {})
+        merged.update((field, getattr(problem, field)) for field in MERGED_FIELDS if getattr(problem, field))
+        if problem.visible:
+            merged['visible'] = True if int(problem.visible) == 1 else False
+    if not values:
+        return results
+    existing = dict(db.session.query(Problem.remote_id, Problem.id).filter(Problem.oj_id == oj_id, Problem.remote_id.in_(values.keys())))
+    if existing:
+        db.session.bulk_update_mappings(Problem, [dict(values[remote_id], id=problem_id) for remote_id, problem_id in existing.items()])
+    created = [remote_id for remote_id in values if remote_id not in existing]
+    if created:
+        columns = [column.key for column in Problem.__table__.columns if column.key != 'id']
+        now = datetime.utcnow()
+        rows = []
+        for remote_id in created:
+            # the keys given as None are written as NULL, so the column defaults are filled here
+            row = dict.fromkeys(columns)
+            row.update(oj_id=oj_id, remote_id=remote_id, submission_num=0, accept_num=0, special_judge=False, type=False, visible=False,
+                       last_update=now)
+            row.update(values[remote_id])
+            rows.append(row)
+        db.session.execute(Problem.__table__.insert(), rows)
+        ids = dict(db.session.query(Problem.remote_id, Problem.id).filter(Problem.oj_id == oj_id, Problem.remote_id.in_(created)))
+    else:
+        ids = {}
+    ids.update(existing)
+    # record_problem_changes commits the transaction of the chunk
+    record_problem_changes(ids.values())
+    for result in results:
+        if 'result' not in result:
+            result['id'] = ids[result['remote_id']]
+            result['result'] = 'updated' if result['remote_id'] in existing else 'created'
+    return results
+
+
+@api.route('/problem/import/<int:oj_id>/', methods=['POST'])
+@permission_required(Permission.JUDGER)
+def import_problems(oj_id):
+
+    '''
+        deal with operation of inserting or updating many problems of an oj, the request is a json array or
+        ndjson of the problems in the format of update_problem, written in transactions of PROBLEM_IMPORT_CHUNK problems
+    :param oj_id: oj_id
+    :return: counts and the result of every problem in json
+    '''
+
+    oj = OJList.query.filter_by(id=oj_id).first_or_404()
+    if not oj.vjudge:
+        raise ValidationError('OJ is not vjudge!')
+    size = current_app.config['PROBLEM_IMPORT_CHUNK']
+    results = []
+    chunk = []
+    for item in read_problem_items():
+        chunk.append(item)
+        if len(chunk) >= size:
+            results.extend(import_problem_chunk(oj_id, chunk))
+            chunk = []
+    if chunk:
+        results.extend(import_problem_chunk(oj_id, chunk))
+    problem_ids = [result['id'] for result in results if result['result'] != 'error']
+    if problem_ids:
+        invalidate_problem_meta(problem_ids)
+        # new problems and the visible flags
+        invalidate_tag_index()
+    counts = dict((name, len([result for result in results if result['result'] == name])) for name in ('created', 'updated', 'error'))
+    return jsonify(dict(counts, results=results))
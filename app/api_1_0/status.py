@@ -4,12 +4,12 @@
 
 from flask import jsonify, request, g, url_for, current_app
 from .. import db
-from ..models import SubmissionStatus, Permission, CompileInfo, Problem
+from ..models import SubmissionStatus, Permission, CompileInfo, Problem, JudgeQueue, Statistic, StatusEvent
 from . import api
 from .decorators import permission_required
 from ..exceptions import ValidationError
 from .errors import pending
-import hashlib
+import hashlib, time
 
 
 @api.route('/status/<int:status_id>')
@@ -22,7 +22,7 @@ def get_status(status_id):
     :return: status in json
     '''
 
-    status = SubmissionStatus.query.get_or_404(status_id)
+    status = SubmissionStatus.judge_query().filter_by(id=status_id).first_or_404()
     return jsonify(status.to_json())
 
 
@@ -38,21 +38,75 @@ def change_status(status_id):
 
     status = SubmissionStatus.query.get_or_404(status_id)
     new_status = SubmissionStatus.from_json(request.json)
+    Statistic.record([(status.author_username, status.problem_id, status.status, new_status.status)])
     status.status = new_status.status
     status.exec_time = new_status.exec_time
     status.exec_memory = new_status.exec_memory
     db.session.add(status)
+    StatusEvent.record([(status.id, status.contest_id, status.author_username, status.status, status.exec_time, status.exec_memory)])
+    if is_final(status.status):
+        JudgeQueue.ack(status.id)
+    if int(status.status) == current_app.config['LOCAL_SUBMISSION_STATUS']['Accepted']:
+        Problem.add_accept_num({status.problem_id: 1})
     db.session.commit()
-    if status.status == 1:
-        problem = Problem.query.with_lockmode('update').get(status.problem_id)
-        problem.accept_num = problem.accept_num + 1
-        db.session.add(problem)
-        db.session.commit()
+    status = SubmissionStatus.judge_query().filter_by(id=status_id).first()
     return jsonify(status.to_json()), 201, \
            {'Location': url_for('api.get_status', status_id=status.id,
                                 _external=True)}
 
 
+@api.route('/status/modify/batch/', methods=['POST'])
+@permission_required(Permission.JUDGER)
+def change_status_batch():
+
+    '''
+        define operation of change submission status in batch,
+        the request is a list of {id, status, exec_time, exec_memory, ce_info (optional)},
+        all verdicts are applied in one transaction
+    :return: ids of the changed submissions in json
+    '''
+
+    verdicts = request.json
+    if not isinstance(verdicts, list) or len(verdicts) == 0:
+        raise ValidationError('Verdicts require a list')
+    if len(verdicts) > current_app.config['JUDGE_VERDICT_BATCH_MAX']:
+        raise ValidationError('Too many verdicts')
+    new_status = {}
+    for verdict in verdicts:
+        if not isinstance(verdict, dict) or not isinstance(verdict.get('id'), int):
+            raise ValidationError('Verdict require submission id')
+        new_status[verdict['id']] = (SubmissionStatus.from_json(verdict), verdict.get('ce_info'))
+    submissions = SubmissionStatus.query.filter(SubmissionStatus.id.in_(new_status.keys())).all()
+    if len(submissions) != len(new_status):
+        missing = set(new_status.keys()) - set(submission.id for submission in submissions)
+        raise ValidationError('No such submission: %s' % ', '.join(str(i) for i in sorted(missing)))
+    accept = {}
+    finished = []
+    changes = []
+    events = []
+    for submission in submissions:
+        verdict, ce_info = new_status[submission.id]
+        changes.append((submission.author_username, submission.problem_id, submission.status, verdict.status))
+        submission.status = verdict.status
+        submission.exec_time = verdict.exec_time
+        submission.exec_memory = verdict.exec_memory
+        db.session.add(submission)
+        events.append((submission.id, submission.contest_id, submission.author_username, verdict.status, verdict.exec_time, verdict.exec_memory))
+        if ce_info:
+            db.session.add(CompileInfo(submission_id=submission.id, info=ce_info))
+        if is_final(verdict.status):
+            finished.append(submission.id)
+        if int(verdict.status) == current_app.config['LOCAL_SUBMISSION_STATUS']['Accepted']:
+            accept[submission.problem_id] = accept.get(submission.problem_id, 0) + 1
+    if finished:
+        JudgeQueue.query.filter(JudgeQueue.submission_id.in_(finished)).delete(synchronize_session=False)
+    Problem.add_accept_num(accept)
+    Statistic.record(changes)
+    StatusEvent.record(events)
+    db.session.commit()
+    return jsonify({'updated': sorted(new_status.keys())}), 201
+
+
 @api.route('/status/<int:status_id>/modify_virtual/', methods=['POST'])
 @permission_required(Permission.JUDGER)
 def change_status_virtual(status_id):
@@ -65,13 +119,18 @@ def change_status_virtual(status_id):
 
     status = SubmissionStatus.query.get_or_404(status_id)
     new_status = SubmissionStatus.from_json_virtual(request.json)
-    if new_status.code != hashlib.sha1(status.submit_time.strftime("%Y-%m-%d %H:%M:%S")).hexdigest() or status_id != new_status.code_length or status.problem.remote_id != new_status.language:
+    if new_status.check_str != hashlib.sha1(status.submit_time.strftime("%Y-%m-%d %H:%M:%S")).hexdigest() or status_id != new_status.code_length or status.problem.remote_id != new_status.language:
         raise ValidationError('Check Sum is Wrong!')
+    Statistic.record([(status.author_username, status.problem_id, status.status, new_status.status)])
     status.status = new_status.status
     status.exec_time = new_status.exec_time
     status.exec_memory = new_status.exec_memory
     db.session.add(status)
+    StatusEvent.record([(status.id, status.contest_id, status.author_username, status.status, status.exec_time, status.exec_memory)])
+    if is_final(status.status):
+        JudgeQueue.ack(status.id)
     db.session.commit()
+    status = SubmissionStatus.judge_query().filter_by(id=status_id).first()
     return jsonify(status.to_json()), 201, \
            {'Location': url_for('api.get_status', status_id=status.id,
                                 _external=True)}
@@ -96,20 +155,95 @@ def add_ce_info(status_id):
                                 _external=True)}
 
 
+def claimed_json(submission):
+
+    '''
+        json of a claimed submission, with the lease token to renew its lease
+    :param submission: submission item from claim_submissions
+    :return: json
+    '''
+
+    json_submission = submission.to_json()
+    json_submission['lease_token'] = submission.lease_token
+    return json_submission
+
+
+def claim_submissions(max_num):
+
+    '''
+        claim submissions from the judge queue with the filters in the request args,
+        wait at most `wait` seconds if the queue is empty
+    :param max_num: max number of submissions
+    :return: [submission item]
+    '''
+
+    language = request.args.get('language', None, type=int)
+    oj_id = request.args.get('oj', None, type=int)
+    wait = min(request.args.get('wait', 0, type=int), current_app.config['JUDGE_MAX_WAIT'])
+    deadline = time.time() + wait
+    while True:
+        submissions = JudgeQueue.claim_many(g.current_user.username, max_num, language, oj_id)
+        if submissions or time.time() >= deadline:
+            return submissions
+        time.sleep(current_app.config['JUDGE_POLL_INTERVAL'])
+
+
 @api.route('/status/judge/', methods=['POST', 'GET'])
 @permission_required(Permission.JUDGER)
 def judge_new():
 
     '''
-        deal with operation of judge new submission
+        deal with operation of judge new submission, claim one submission from the judge queue
     :return: submission in json
     '''
 
-    status = SubmissionStatus.query.with_lockmode('update').filter_by(status=0).first()
-    if status is None:
-        db.session.commit()
+    submissions = claim_submissions(1)
+    if not submissions:
         return pending("No more waiting submissions")
-    status.status = 10
-    db.session.add(status)
-    db.session.commit()
-    return jsonify(status.to_json())
\ No newline at end of file
+    return jsonify(claimed_json(submissions[0]))
+
+
+@api.route('/status/judge/batch', methods=['POST'])
+@permission_required(Permission.JUDGER)
+def judge_new_batch():
+
+    '''
+        deal with operation of judge new submissions in batch, claim at most `max` submissions
+    :return: list of submissions in json
+    '''
+
+    max_num = request.args.get('max', 1, type=int)
+    if max_num < 1:
+        raise ValidationError('max should be positive')
+    submissions = claim_submissions(min(max_num, current_app.config['JUDGE_BATCH_MAX']))
+    return jsonify([claimed_json(submission) for submission in submissions])
+
+
+@api.route('/status/<int:status_id>/lease/', methods=['POST'])
+@permission_required(Permission.JUDGER)
+def renew_lease(status_id):
+
+    '''
+        extend the lease of the submission being judged, the request holds the lease_token given by the claim
+    :param status_id: submission id
+    :return: json
+    '''
+
+    token = (request.get_json(silent=True) or {}).get('lease_token')
+    if not token:
+        raise ValidationError('Lease token required')
+    if not JudgeQueue.renew(status_id, token):
+        raise ValidationError('Lease is lost')
+    return jsonify({'id': status_id, 'lease': current_app.config['JUDGE_LEASE_TIMEOUT']})
+
+
+def is_final(status):
+
+    '''
+        judge if the status is a verdict
+    :param status: status code
+    :return: True or False
+    '''
+
+    return int(status) not in (current_app.config['LOCAL_SUBMISSION_STATUS']['Waiting'],
+                               current_app.config['LOCAL_SUBMISSION_STATUS']['Judging'])
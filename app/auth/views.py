@@ -5,10 +5,13 @@ from flask import render_template, redirect, request, url_for, flash, abort, cur
 from flask_login import login_user, logout_user, login_required, current_user
 from . import auth
 from .. import db
-from ..models import User, Permission, SubmissionStatus, Follow
+from ..models import User, Permission, Follow, Statistic
 from ..email import send_email
 from .forms import LoginForm, RegistrationForm, ChangePasswordForm, PasswordResetRequestForm, PasswordResetForm, ChangeEmailForm, EditProfileForm
 from ..decorators import admin_required
+from ..pagination import keyset_paginate
+from ..presence import touch
+from ..cache import invalidate_session_users
 from datetime import datetime
 
 @auth.before_app_request
@@ -20,7 +23,7 @@ def before_request():
     '''
 
     if current_user.is_authenticated:
-        current_user.ping()
+        touch(current_user.id)
         if (not current_user.confirmed) and request.endpoint[:5] != 'auth.' and request.endpoint != 'static':
             return redirect(url_for('auth.unconfirmed'))
 
@@ -120,6 +123,7 @@ def confirm(token):
     if current_user.confirmed:
         return redirect(url_for('index.index_page'))
     if current_user.confirm(token):
+        invalidate_session_users([current_user.id])
         flash(u'感谢您确认了您的账号！')
         # return redirect(url_for('auth.edit_profile'))
         return redirect(url_for('index.index_page'))
@@ -158,6 +162,7 @@ def change_password():
             current_user.password = form.password.data
             db.session.add(current_user)
             db.session.commit()
+            invalidate_session_users([current_user.id], password=True)
             flash(u'您的密码已经被更新！')
             return redirect(url_for('index.index_page'))
         else:
@@ -204,6 +209,7 @@ def password_reset(token):
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user.reset_password(token, form.password.data):
+            invalidate_session_users([user.id], password=True)
             flash(u'您的密码已经被更新')
             return redirect(url_for('auth.login'))
         else:
@@ -245,6 +251,7 @@ def change_email(token):
     '''
 
     if current_user.change_email(token):
+        invalidate_session_users([current_user.id])
         flash(u'您的邮箱已经被更新！')
     else:
         flash(u'重置邮箱链接无效或超过了最长的有效时间')
@@ -262,10 +269,11 @@ def user_detail(username):
     '''
 
     user = User.query.filter_by(username = username).first_or_404()
-    total_submission = SubmissionStatus.query.filter(SubmissionStatus.author_username==user.username).count()
+    histogram = Statistic.histogram('user', user.username)
+    total_submission = sum(histogram.values())
     status = {}
     for k in current_app.config["LOCAL_SUBMISSION_STATUS"].keys():
-        status[k] = SubmissionStatus.query.filter(SubmissionStatus.status==current_app.config['LOCAL_SUBMISSION_STATUS'][k], SubmissionStatus.author_username==user.username).count()
+        status[k] = histogram.get(current_app.config['LOCAL_SUBMISSION_STATUS'][k], 0)
     return render_template('auth/user_detail.html', user=user, total_submission=total_submission, status=status)
 
 
@@ -293,6 +301,7 @@ def edit_profile():
         current_user.about_me = form.about_me.data
         db.session.add(current_user)
         db.session.commit()
+        invalidate_session_users([current_user.id])
         flash(u'您的个人信息已经更新')
         return redirect(request.args.get('next') or url_for('auth.user_detail', username=current_user.username))
     form.nickname.data = current_user.nickname
@@ -362,8 +371,7 @@ def followed():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = current_user.followed.order_by(Follow.followed_id.asc()).paginate(page, per_page=current_app.config['FLASKY_USERS_PER_PAGE'])
+    pagination = keyset_paginate(current_user.followed, Follow.followed_id, current_app.config['FLASKY_USERS_PER_PAGE'], descending=False)
     follows = pagination.items
     return render_template('auth/followed.html', follows=follows, pagination=pagination)
 
@@ -377,7 +385,6 @@ def followed_by():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = current_user.followers.order_by(Follow.follower_id.asc()).paginate(page, per_page=current_app.config['FLASKY_USERS_PER_PAGE'])
+    pagination = keyset_paginate(current_user.followers, Follow.follower_id, current_app.config['FLASKY_USERS_PER_PAGE'], descending=False)
     follows = pagination.items
     return render_template('auth/followed_by.html', follows=follows, pagination=pagination)
\ No newline at end of file
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from collections import OrderedDict
+from io import BytesIO
+from . import db
+from .models import User
+import identicon, os, re, tempfile
+
+# photo names are the hex seed of the identicon
+PHOTO_NAME = re.compile(r'^[0-9a-f]{1,64}$')
+
+
+def avatar_path(photo):
+
+    '''
+        file of the rendered avatar
+    :param photo: photo name of the user
+    :return: path
+    '''
+
+    return os.path.join(current_app.config['AVATAR_DIR'], photo + '.png')
+
+
+def render_avatar(photo):
+
+    '''
+        render the identicon of the photo name, the same name always gives the same image
+    :param photo: photo name of the user
+    :return: png data
+    '''
+
+    icon = identicon.render_identicon(int(photo, 16), current_app.config['AVATAR_PATCH_SIZE'], identicon.MaskDonRenderer)
+    data = BytesIO()
+    icon.save(data, 'PNG')
+    return data.getvalue()
+
+
+def save_avatar(photo, data):
+
+    '''
+        write the avatar file, other workers never see a half written file
+    :param photo: photo name of the user
+    :param data: png data
+    :return: None
+    '''
+
+    path = avatar_path(photo)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.rename(tmp, path)
+
+
+def get_avatar(photo):
+
+    '''
+        avatar of the photo name, from the LRU of this worker, then AVATAR_DIR, then rendered and saved,
+        only the photo names of users are rendered so made up names fill neither the disk nor the LRU
+    :param photo: photo name of the user
+    :return: png data or None if no user has the photo name
+    '''
+
+    lru = current_app.extensions.setdefault('avatar', OrderedDict())
+    data = lru.pop(photo, None)
+    if data is None:
+        path = avatar_path(photo)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+        else:
+            if db.session.query(User.id).filter_by(photo=photo).first() is None:
+                return None
+            data = render_avatar(photo)
+            save_avatar(photo, data)
+        if len(lru) >= current_app.config['AVATAR_CACHE_SIZE']:
+            lru.popitem(last=False)
+    lru[photo] = data
+    return data
+
+
+def render_missing_avatars():
+
+    '''
+        render the avatars of all users not in AVATAR_DIR yet, for running offline
+    :return: number of the rendered avatars
+    '''
+
+    rendered = 0
+    for (photo, ) in db.session.query(User.photo).filter(User.photo != None).yield_per(1000):
+        if PHOTO_NAME.match(photo) and not os.path.exists(avatar_path(photo)):
+            save_avatar(photo, render_avatar(photo))
+            rendered += 1
+    return rendered
@@ -7,6 +7,7 @@ from . import blog
 from .. import db
 from ..models import Blog
 from ..decorators import admin_required, permission_required
+from ..pagination import keyset_paginate
 from datetime import datetime
 import base64
 
@@ -18,11 +19,10 @@ def blog_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
     if current_user.is_admin():
-        pagination = Blog.query.order_by(Blog.id.desc()).paginate(page,per_page=current_app.config['FLASKY_BLOGS_PER_PAGE'])
+        pagination = keyset_paginate(Blog.query, Blog.id, current_app.config['FLASKY_BLOGS_PER_PAGE'])
     else:
-        pagination = Blog.query.filter_by(public=True).order_by(Blog.id.desc()).paginate(page, per_page=current_app.config['FLASKY_BLOGS_PER_PAGE'])
+        pagination = keyset_paginate(Blog.query.filter_by(public=True), Blog.id, current_app.config['FLASKY_BLOGS_PER_PAGE'])
     blogs = pagination.items
     return render_template('blog/blog_list.html', blogs=blogs, pagination=pagination)
 
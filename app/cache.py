@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from werkzeug.utils import import_string
+from datetime import datetime, timedelta
+from . import db, flask_celery
+from .models import KeyValue, CacheChange, Problem, OJList, User
+import time, os, binascii
+
+
+class MemoryVersionBackend(object):
+
+    '''
+        versions kept in this process, for a single worker
+    '''
+
+    def __init__(self):
+        self.versions = {}
+
+    def get(self, name):
+
+        '''
+            current version of the cache
+        :param name: cache name
+        :return: version string
+        '''
+
+        return self.versions.get(name, '')
+
+    def bump(self, name):
+
+        '''
+            give the cache a new version
+        :param name: cache name
+        :return: new version string
+        '''
+
+        self.versions[name] = binascii.hexlify(os.urandom(8))
+        return self.versions[name]
+
+    def touch(self, name, keys):
+
+        '''
+            mark keys changed, nothing to share in a single process
+        :param name: cache name
+        :param keys: iterable of keys
+        :return: None
+        '''
+
+        pass
+
+    def changes(self, name, since):
+
+        '''
+            keys changed by the other processes
+        :param name: cache name
+        :param since: unix time
+        :return: set of keys as strings
+        '''
+
+        return set()
+
+
+class DatabaseVersionBackend(object):
+
+    '''
+        versions kept in KeyValue, shared by all gunicorn workers and celery processes
+    '''
+
+    def key(self, name):
+        return 'cache_version:' + name
+
+    def get(self, name):
+
+        '''
+            current version of the cache
+        :param name: cache name
+        :return: version string
+        '''
+
+        value = db.session.query(KeyValue.value).filter_by(key=self.key(name)).scalar()
+        return value or ''
+
+    def bump(self, name):
+
+        '''
+            give the cache a new version, committed at once
+        :param name: cache name
+        :return: new version string
+        '''
+
+        version = binascii.hexlify(os.urandom(8))
+        KeyValue.put(self.key(name), version)
+        db.session.commit()
+        return version
+
+    def touch(self, name, keys):
+
+        '''
+            mark keys changed, committed at once
+        :param name: cache name
+        :param keys: iterable of keys
+        :return: None
+        '''
+
+        now = datetime.utcnow()
+        rows = [{'name': name, 'key': str(key), 'created': now} for key in set(keys)]
+        if rows:
+            db.session.execute(CacheChange.__table__.insert(), rows)
+            db.session.commit()
+
+    def changes(self, name, since):
+
+        '''
+            keys changed since a time, the changes of slow transactions are committed late so the caller reads
+            a little before its last check
+        :param name: cache name
+        :param since: unix time
+        :return: set of keys as strings
+        '''
+
+        return set(key for (key, ) in db.session.query(CacheChange.key).filter(
+            CacheChange.name == name, CacheChange.created >= datetime.utcfromtimestamp(since)))
+
+
+VERSION_BACKENDS = {
+    'memory': MemoryVersionBackend,
+    'database': DatabaseVersionBackend
+}
+
+
+def version_backend():
+
+    '''
+        version backend set by CACHE_VERSION_BACKEND, a name in VERSION_BACKENDS or an import path of a class
+    :return: backend obj
+    '''
+
+    extensions = current_app.extensions
+    if 'cache_version_backend' not in extensions:
+        name = current_app.config['CACHE_VERSION_BACKEND']
+        extensions['cache_version_backend'] = (VERSION_BACKENDS.get(name) or import_string(name))()
+    return extensions['cache_version_backend']
+
+
+class VersionedCache(object):
+
+    '''
+        per-worker cache of loaded values, dropped when the version in the backend changes,
+        the version is checked at most once every CACHE_VERSION_CHECK_INTERVAL seconds
+    '''
+
+    def __init__(self, name, loader, version=None):
+
+        '''
+            define a cache
+        :param name: cache name
+        :param loader: function loading the value of a key
+        :param version: name of the version to follow, the name of the cache by default
+        '''
+
+        self.name = name
+        self.loader = loader
+        self.version = version or name
+
+    def _state(self):
+
+        '''
+            cached values of this worker
+        :return: dict
+        '''
+
+        caches = current_app.extensions.setdefault('versioned_cache', {})
+        if self.name not in caches:
+            caches[self.name] = {'follows': self.version, 'version': None, 'checked': 0, 'items': {}}
+        return caches[self.name]
+
+    def get(self, key, *args):
+
+        '''
+            get the value, loaded on miss
+        :param key: key
+        :param args: more params of the loader
+        :return: value
+        '''
+
+        state = self._state()
+        now = time.time()
+        if state['checked'] + current_app.config['CACHE_VERSION_CHECK_INTERVAL'] <= now:
+            version = version_backend().get(self.version)
+            if version != state['version'] or state['checked'] + current_app.config['CACHE_CHANGE_KEEP'] <= now:
+                # a new version, or the changes since the last check may be pruned
+                state['version'] = version
+                state['items'] = {}
+            elif state['items']:
+                changed = version_backend().changes(self.version, state['checked'] - current_app.config['CACHE_CHANGE_GRACE'])
+                for item in [item for item in state['items'] if str(item) in changed]:
+                    del state['items'][item]
+            state['checked'] = now
+        items = state['items']
+        if key not in items:
+            if len(items) >= current_app.config['CACHE_MAX_KEYS']:
+                items.clear()
+            items[key] = self.loader(key, *args)
+        return items[key]
+
+    def discard(self, key):
+
+        '''
+            drop the value of a key in this worker only
+        :param key: key
+        :return: None
+        '''
+
+        self._state()['items'].pop(key, None)
+
+    def invalidate_keys(self, keys):
+
+        '''
+            drop the values of some keys in all workers, and in the caches following the same version,
+            call it after the change is committed
+        :param keys: iterable of keys
+        :return: None
+        '''
+
+        keys = list(keys)
+        self._state()
+        for state in current_app.extensions['versioned_cache'].values():
+            if state['follows'] == self.version:
+                for key in keys:
+                    state['items'].pop(key, None)
+        version_backend().touch(self.version, keys)
+
+    def invalidate(self):
+
+        '''
+            drop the values in all workers, and in the caches following the same version, call it after the change is committed
+        :return: None
+        '''
+
+        invalidate_version(self.version)
+
+
+def invalidate_version(name):
+
+    '''
+        drop the values of the caches following a version in all workers, for callers not holding the cache
+    :param name: version name
+    :return: None
+    '''
+
+    version = version_backend().bump(name)
+    for state in current_app.extensions.setdefault('versioned_cache', {}).values():
+        if state['follows'] == name:
+            state['version'] = version
+            state['checked'] = time.time()
+            state['items'] = {}
+
+
+def load_problem_meta(problem_id):
+
+    '''
+        load the small fields of a problem used by submit, judge and problem pages
+    :param problem_id: problem id
+    :return: dict or None
+    '''
+
+    row = db.session.query(Problem.id, Problem.title, Problem.time_limit, Problem.memory_limit, Problem.special_judge,
+                           Problem.type, Problem.visible, Problem.remote_id, Problem.last_update, OJList.id, OJList.name, OJList.vjudge,
+                           *[getattr(Problem, field) for field in Problem.BODY_FIELDS]).outerjoin(
+        OJList, OJList.id == Problem.oj_id).filter(Problem.id == problem_id).first()
+    if row is None:
+        return None
+    keys = ('id', 'title', 'time_limit', 'memory_limit', 'special_judge', 'type', 'visible', 'remote_id', 'last_update', 'oj_id', 'oj', 'vjudge')
+    meta = dict(zip(keys, row))
+    # the statement itself is not kept, only its version
+    meta['body_version'] = Problem.body_version(row[len(keys):])
+    return meta
+
+
+problem_meta = VersionedCache('problem_meta', load_problem_meta)
+
+
+def get_problem_meta(problem_id):
+
+    '''
+        cached metadata of a problem
+    :param problem_id: problem id
+    :return: dict or None if no such problem
+    '''
+
+    return problem_meta.get(int(problem_id))
+
+
+def invalidate_problem_meta(problem_ids=None):
+
+    '''
+        drop the cached metadata after problems or ojs changed
+    :param problem_ids: iterable of the changed problems, None for all the problems (an oj changed)
+    :return: None
+    '''
+
+    if problem_ids is None:
+        problem_meta.invalidate()
+    else:
+        problem_meta.invalidate_keys(int(problem_id) for problem_id in problem_ids)
+
+
+def load_session_user(user_id):
+
+    '''
+        load the user with the role, detached from the session so it can be shared by the requests of this worker,
+        only called when the user is not in the session
+    :param user_id: user id
+    :return: (expire time, user or None)
+    '''
+
+    user = User.query.options(db.joinedload('role')).get(user_id)
+    if user is not None:
+        db.session.expunge(user)
+    return time.time() + current_app.config['USER_CACHE_TTL'], user
+
+
+session_users = VersionedCache('session_user', load_session_user)
+
+
+def get_session_user(user_id):
+
+    '''
+        user of the session, a cached copy merged into the session without a query
+    :param user_id: user id
+    :return: user or None
+    '''
+
+    user_id = int(user_id)
+    # already loaded by this session, the instance must stay attached
+    user = db.session.identity_map.get(db.inspect(User).identity_key_from_primary_key((user_id, )))
+    if user is not None:
+        return user
+    expire, user = session_users.get(user_id)
+    if expire <= time.time():
+        session_users.discard(user_id)
+        expire, user = session_users.get(user_id)
+    if user is None:
+        return None
+    return db.session.merge(user, load=False)
+
+
+def invalidate_session_users(user_ids, password=False):
+
+    '''
+        drop the cached users after they changed, call it after the commit
+    :param user_ids: iterable of the changed users
+    :param password: True if a password changed, the api credentials of all the users are dropped
+    :return: None
+    '''
+
+    session_users.invalidate_keys(int(user_id) for user_id in user_ids)
+    if password:
+        # keyed by the credentials, not the user, passwords change rarely
+        invalidate_version('api_credential')
+
+
+@flask_celery.task(
+    bind=True,
+    ignore_result=True
+)
+def prune_cache_changes(self):
+
+    '''
+        delete the cache changes older than CACHE_CHANGE_KEEP seconds, workers not checking for so long drop all their values
+    :return: None
+    '''
+
+    CacheChange.query.filter(CacheChange.created < datetime.utcnow() - timedelta(seconds=current_app.config['CACHE_CHANGE_KEEP'])).delete(
+        synchronize_session=False)
+    db.session.commit()
@@ -0,0 +1,436 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from datetime import datetime, timedelta
+from .. import db, flask_celery
+from ..models import User, Role, Permission, SubmissionStatus, ContestUsers, ContestProblem, Contest, KeyValue
+import json, os, binascii, bisect
+
+
+def _ranklists():
+
+    '''
+        ranklist engines of this worker, keyed by contest id
+    :return: dict
+    '''
+
+    return current_app.extensions.setdefault('contest_ranklist', {})
+
+
+def get_ranklist(contest_id):
+
+    '''
+        get the ranklist engine of the contest, create it if not exist
+    :param contest_id: contest id
+    :return: ContestRanklist obj
+    '''
+
+    ranklists = _ranklists()
+    ranklist = ranklists.get(contest_id)
+    if ranklist is None:
+        ranklist = ContestRanklist(contest_id)
+        ranklists[contest_id] = ranklist
+    return ranklist
+
+
+def invalidate_ranklist(contest_id):
+
+    '''
+        drop the state of the contest in this worker, the other workers follow bump_generation
+    :param contest_id: contest id
+    :return: None
+    '''
+
+    _ranklists().pop(contest_id, None)
+
+
+def generation_key(contest_id):
+
+    '''
+        key of the rebuild generation of the contest in KeyValue
+    :param contest_id: contest id
+    :return: key
+    '''
+
+    return 'contest_rank_%s_generation' % str(contest_id)
+
+
+def current_generation(contest_id):
+
+    '''
+        read the rebuild generation of the contest
+    :param contest_id: contest id
+    :return: generation string
+    '''
+
+    return db.session.query(KeyValue.value).filter_by(key=generation_key(contest_id)).scalar() or ''
+
+
+def bump_generation(contest_id):
+
+    '''
+        give the contest a new rebuild generation, every ranklist engine of all the workers drops its state
+        on the next refresh, used when the verdicts of old submissions changed (rejudge, status edit),
+        committed with the changed submissions by the caller
+    :param contest_id: contest id
+    :return: None
+    '''
+
+    KeyValue.put(generation_key(contest_id), binascii.hexlify(os.urandom(8)))
+
+
+class ContestRanklist(object):
+
+    '''
+        keep the per-user/per-problem state of a contest in memory,
+        load all submissions once in id order and then only apply the deltas:
+        submissions with a bigger id and the verdicts of waiting/judging submissions,
+        submissions younger than RANKLIST_SUBMIT_GRACE seconds are read again on each refresh
+        since a submission with a smaller id may not be committed yet
+    '''
+
+    # sqlite can not bind more than 999 params in one query
+    CHUNK_SIZE = 500
+
+    def __init__(self, contest_id):
+
+        '''
+            init the empty state
+        :param contest_id: contest id
+        '''
+
+        self.contest_id = contest_id
+        # rebuild generation of the state, None before the first refresh
+        self.generation = None
+        self.reset()
+
+    def reset(self):
+
+        '''
+            drop the state, the next refresh loads all the submissions again
+        :return: None
+        '''
+
+        # the biggest submission id all the submissions before it are loaded
+        self.last_id = 0
+        # ids after last_id already applied, read again until they are older than the grace period
+        self.recent = set()
+        # (username, problem_id) -> [[submission_id, status, submit_time], ...] in id order
+        self.cells = {}
+        # submission_id -> (username, problem_id), submissions still waiting for the verdict
+        self.pending = {}
+
+    def _query(self):
+
+        '''
+            query the columns used by ranklist, do not load the code
+        :return: query
+        '''
+
+        return db.session.query(
+            SubmissionStatus.id,
+            SubmissionStatus.author_username,
+            SubmissionStatus.problem_id,
+            SubmissionStatus.status,
+            SubmissionStatus.submit_time
+        ).filter(SubmissionStatus.contest_id == self.contest_id)
+
+    def _is_pending(self, status):
+
+        '''
+            judge if the submission do not have the final verdict
+        :param status: status code
+        :return: True or False
+        '''
+
+        return status in (current_app.config['LOCAL_SUBMISSION_STATUS']['Waiting'],
+                          current_app.config['LOCAL_SUBMISSION_STATUS']['Judging'])
+
+    def refresh(self):
+
+        '''
+            apply the new submissions and the new verdicts to the state
+        :return: number of the submissions applied
+        '''
+
+        generation = current_generation(self.contest_id)
+        if generation != self.generation:
+            # final verdicts changed somewhere, start again from scratch
+            self.reset()
+            self.generation = generation
+        applied = 0
+        # verdicts of the submissions we have seen as waiting or judging
+        pending_ids = list(self.pending.keys())
+        for i in range(0, len(pending_ids), self.CHUNK_SIZE):
+            chunk = pending_ids[i:i + self.CHUNK_SIZE]
+            for sid, username, problem_id, status, submit_time in self._query().filter(SubmissionStatus.id.in_(chunk)):
+                if self._is_pending(status):
+                    continue
+                for entry in self.cells.get(self.pending.pop(sid), []):
+                    if entry[0] == sid:
+                        entry[1] = status
+                        break
+                applied += 1
+        # submissions newer than the last scan, last_id stops at the first young one
+        settled = datetime.utcnow() - timedelta(seconds=current_app.config['RANKLIST_SUBMIT_GRACE'])
+        young = False
+        for sid, username, problem_id, status, submit_time in self._query().filter(SubmissionStatus.id > self.last_id).order_by(SubmissionStatus.id.asc()):
+            if sid not in self.recent:
+                key = (username, problem_id)
+                # a late commit goes before the submissions with bigger ids
+                bisect.insort(self.cells.setdefault(key, []), [sid, status, submit_time])
+                if self._is_pending(status):
+                    self.pending[sid] = key
+                applied += 1
+            young = young or (submit_time is not None and submit_time > settled)
+            if young:
+                self.recent.add(sid)
+            else:
+                self.recent.discard(sid)
+                self.last_id = sid
+        return applied
+
+    def cell_detail(self, key, start_time, until=None):
+
+        '''
+            summarize one user and one problem
+        :param key: (username, problem_id)
+        :param start_time: contest start time
+        :param until: ignore the submissions submitted at this time or later
+        :return: dict(submission_num, ac, time, ac_id)
+        '''
+
+        detail = {'submission_num': 0, 'ac': False, 'first_blood': False, 'time': 0, 'ac_id': None}
+        for sid, status, submit_time in self.cells.get(key, []):
+            if until is not None and submit_time >= until:
+                break
+            if status == current_app.config['LOCAL_SUBMISSION_STATUS']['Accepted']:
+                detail['ac'] = True
+                detail['ac_id'] = sid
+                detail['time'] = detail['submission_num'] * 20 + (submit_time - start_time).seconds / 60
+                detail['submission_num'] += 1
+                break
+            detail['submission_num'] += 1
+        return detail
+
+    def rows(self, contest, problems, until=None):
+
+        '''
+            generate the sorted ranklist from the state
+        :param contest: contest obj
+        :param problems: contest problems
+        :param until: ignore the submissions submitted at this time or later, used for frozen rank
+        :return: [{'username': (str), 'realname': (str), 'total_ac': (int), 'total_time': (int), 'submission_detail': {problem_index: {...}}}]
+        '''
+
+        users = db.session.query(
+            ContestUsers.realname,
+            User.username,
+            User.nickname,
+            Role.permission
+        ).join(User, User.id == ContestUsers.user_id).outerjoin(Role, Role.id == User.role_id).filter(ContestUsers.contest_id == contest.id).all()
+        ranklists = []
+        first_blood = {}
+        for realname, username, nickname, permission in users:
+            if (permission is not None and (permission & Permission.ADMIN) == Permission.ADMIN) or contest.manager_username == username:
+                continue
+            user_total = {
+                'username': username,
+                'realname': realname if realname else nickname,
+                'submission_detail': {},
+                'total_time': 0,
+                'total_ac': 0
+            }
+            for problem in problems:
+                detail = self.cell_detail((username, problem.problem_id), contest.start_time, until)
+                if detail['ac']:
+                    user_total['total_ac'] += 1
+                    user_total['total_time'] += detail['time']
+                    if problem.problem_index not in first_blood or detail['ac_id'] < first_blood[problem.problem_index]['ac_id']:
+                        first_blood[problem.problem_index] = detail
+                user_total['submission_detail'][problem.problem_index] = detail
+            ranklists.append(user_total)
+        for detail in first_blood.values():
+            detail['first_blood'] = True
+        ranklists.sort(cmp=cmp_ranklist)
+        return ranklists
+
+
+def snapshot_key(contest_id, admin=False):
+
+    '''
+        key of the ranklist snapshot in KeyValue
+    :param contest_id: contest id
+    :param admin: admin (unfrozen) view or public view
+    :return: key
+    '''
+
+    if admin:
+        return 'contest_rank_%s_admin' % str(contest_id)
+    return 'contest_rank_%s' % str(contest_id)
+
+
+def load_snapshot(contest_id, admin=False):
+
+    '''
+        read the ranklist snapshot, web requests only read snapshots
+    :param contest_id: contest id
+    :param admin: admin (unfrozen) view or public view
+    :return: snapshot dict or None
+    '''
+
+    item = KeyValue.query.get(snapshot_key(contest_id, admin))
+    if item is None or not item.value:
+        return None
+    try:
+        return json.loads(item.value)
+    except ValueError:
+        # html table written by the old version
+        return None
+
+
+def build_snapshot(ranklists, problems, version, frozen=False):
+
+    '''
+        pack the ranklist into a compact structure
+    :param ranklists: rows from ContestRanklist.rows
+    :param problems: contest problems, same order as the table head
+    :param version: snapshot version
+    :param frozen: if the submissions in the frozen time are hidden
+    :return: {'version': (int), 'generate_time': (str), 'frozen': bool, 'problems': [problem_index],
+              'rows': [{'username', 'realname', 'total_ac', 'total_time', 'cells': [[submission_num, ac, time, first_blood]]}]}
+    '''
+
+    rows = []
+    for ranklist in ranklists:
+        cells = []
+        for problem in problems:
+            detail = ranklist['submission_detail'][problem.problem_index]
+            cells.append([detail['submission_num'], int(detail['ac']), detail['time'], int(detail['first_blood'])])
+        rows.append({
+            'username': ranklist['username'],
+            'realname': ranklist['realname'],
+            'total_ac': ranklist['total_ac'],
+            'total_time': ranklist['total_time'],
+            'cells': cells
+        })
+    return {
+        'version': version,
+        'generate_time': datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        'frozen': frozen,
+        'problems': [problem.problem_index for problem in problems],
+        'rows': rows
+    }
+
+
+def save_snapshot(contest_id, snapshot, admin=False):
+
+    '''
+        write the ranklist snapshot to KeyValue
+    :param contest_id: contest id
+    :param snapshot: snapshot dict
+    :param admin: admin (unfrozen) view or public view
+    :return: None
+    '''
+
+    KeyValue.put(snapshot_key(contest_id, admin), json.dumps(snapshot, separators=(',', ':')))
+
+
+def generate_snapshot(contest_id):
+
+    '''
+        refresh the ranklist engine and write the public (frozen) and admin (unfrozen) snapshots
+    :param contest_id: contest id
+    :return: version of the snapshots
+    '''
+
+    contest = Contest.query.get(contest_id)
+    if contest is None:
+        return None
+    key = snapshot_key(contest_id, admin=True)
+    if KeyValue.query.get(key) is None:
+        KeyValue.put(key, '')
+    # the lock keeps two tasks of the contest from writing the same version
+    KeyValue.query.filter_by(key=key).with_for_update().first()
+    ranklist = get_ranklist(contest_id)
+    ranklist.refresh()
+    problems = contest.problems.order_by(ContestProblem.problem_index.asc()).all()
+    old = load_snapshot(contest_id, admin=True)
+    version = old['version'] + 1 if old else 1
+    save_snapshot(contest_id, build_snapshot(ranklist.rows(contest, problems), problems, version), admin=True)
+    # frozen rank setting, hide the submissions of the last hour
+    until = contest.end_time - timedelta(hours=1) if contest.rank_frozen else None
+    save_snapshot(contest_id, build_snapshot(ranklist.rows(contest, problems, until), problems, version, until is not None))
+    db.session.commit()
+    return version
+
+
+@flask_celery.task(
+    bind=True,
+    ignore_result=True
+)
+def generate_ranklist_snapshot(self, contest_id):
+
+    '''
+        celery task of generating the ranklist snapshots
+    :param contest_id: contest id
+    :return: None
+    '''
+
+    generate_snapshot(contest_id)
+
+
+def request_snapshot(contest, force=False):
+
+    '''
+        ask the celery worker to generate new snapshots when the old ones are out of date,
+        the update of last_generate_rank is the claim, so only one request in all workers sends the task
+    :param contest: contest obj
+    :param force: send the task even if the snapshots are new, at most once every RANKLIST_RETRY_INTERVAL seconds
+    :return: True if the task is sent
+    '''
+
+    now = datetime.utcnow()
+    if not force:
+        # no more changes after the contest and its judging finished
+        if contest.start_time > now or (contest.last_generate_rank is not None and
+                                        contest.end_time + timedelta(hours=1) < contest.last_generate_rank):
+            return False
+    contest_id = contest.id
+    interval = timedelta(seconds=current_app.config['RANKLIST_RETRY_INTERVAL' if force else 'RANKLIST_REFRESH_INTERVAL'])
+    query = Contest.query.filter(Contest.id == contest_id,
+                                 db.or_(Contest.last_generate_rank == None, Contest.last_generate_rank < now - interval))
+    claimed = query.update({Contest.last_generate_rank: now}, synchronize_session=False) == 1
+    db.session.commit()
+    if not claimed:
+        return False
+    try:
+        generate_ranklist_snapshot.apply_async(args=[contest_id])
+    except Exception:
+        # the broker is down, the pages keep the last snapshots and the claim is tried again after the interval
+        current_app.logger.exception('Fail to send the ranklist task of contest %s' % str(contest_id))
+        return False
+    return True
+
+
+def cmp_ranklist(a, b):
+
+    '''
+        define operation of cmp two ranklist item
+    :param a: ranklist item
+    :param b: ranklist item
+    :return: bigger: -1, less: 1, equal 0
+    '''
+
+    if a['total_ac'] > b['total_ac']:
+        return -1
+    elif a['total_ac'] == b['total_ac']:
+        if a['total_time'] < b['total_time']:
+            return -1
+        elif a['total_time'] == b['total_time']:
+            return 0
+        else:
+            return 1
+    else:
+        return 1
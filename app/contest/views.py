@@ -5,11 +5,16 @@ from flask import render_template, redirect, request, url_for, flash, abort, cur
 from flask_login import login_user, logout_user, login_required, current_user
 from . import contest
 from .. import db
-from ..models import Role, User, Permission, OJList, Problem, SubmissionStatus, CompileInfo, Contest, Logs, Tag, ContestUsers, Topic, KeyValue
+from ..models import Role, User, Permission, OJList, Problem, SubmissionStatus, CompileInfo, Contest, Logs, Tag, ContestUsers, ContestProblem, Topic, KeyValue, JudgeQueue, Statistic
 from .forms import PasswordRegisterForm, SubmitForm
+from .ranklist import load_snapshot, request_snapshot
 from ..decorators import admin_required, permission_required
+from ..pagination import keyset_paginate
+from ..cache import get_problem_meta
+from ..problem.fragments import get_body
+from ..status.events import latest_event_id, stream_events
 from datetime import datetime, timedelta
-import base64, time
+import time
 
 
 def in_contest(contest, user_id):
@@ -38,8 +43,7 @@ def contest_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
-    pagination = Contest.query.filter_by(visible=True).order_by(Contest.id.desc()).paginate(page, per_page=current_app.config['FLASKY_CONTESTS_PER_PAGE'])
+    pagination = keyset_paginate(Contest.query.filter_by(visible=True), Contest.id, current_app.config['FLASKY_CONTESTS_PER_PAGE'])
     contests = pagination.items
     now = datetime.utcnow()
     return render_template('contest/contest_list.html', contests=contests, pagination=pagination, now=now)
@@ -313,8 +317,12 @@ def contest_problem_detail(contest_id, problem_index):
     sec_end = time.mktime(contest.end_time.timetuple())
     if not result[0]:
         return result[1]
-    problem = contest.problems.filter_by(problem_index=problem_index).first_or_404().problem
-    return render_template('contest/contest_problem.html', contest=contest, problem=problem, problem_index=problem_index, contest_id=contest_id, sec_now = sec_now, sec_init = sec_init, sec_end = sec_end)
+    contest_problem = db.session.query(ContestProblem.problem_id, ContestProblem.problem_alias).filter_by(contest_id=contest_id, problem_index=problem_index).first_or_404()
+    problem = get_problem_meta(contest_problem.problem_id)
+    if problem is None:
+        abort(404)
+    body = get_body(problem['id'], problem['body_version'], 'contest')
+    return render_template('contest/contest_problem.html', contest=contest, problem=problem, problem_alias=contest_problem.problem_alias, body=body, problem_index=problem_index, contest_id=contest_id, sec_now = sec_now, sec_init = sec_init, sec_end = sec_end)
 
 
 @contest.route('/<int:contest_id>/status', methods=['GET', 'POST'])
@@ -326,15 +334,15 @@ def contest_status_list(contest_id):
     :param contest_id: contest_id
     :return: page
     '''
-    page = request.args.get('page', 1, type=int)
     contest = Contest.query.get_or_404(contest_id)
     result = in_contest(contest, current_user.id)
     if not result[0]:
         return result[1]
+    event_id = latest_event_id()
     if current_user.is_admin() or current_user.username == contest.manager_username:
-        pagination = SubmissionStatus.query.filter_by(contest_id=contest_id).order_by( SubmissionStatus.id.desc()).paginate(page, per_page=current_app.config['FLASKY_STATUS_PER_PAGE'])
+        pagination = keyset_paginate(SubmissionStatus.query.filter_by(contest_id=contest_id), SubmissionStatus.id, current_app.config['FLASKY_STATUS_PER_PAGE'], count_key='contest_status_%d' % contest_id)
     else:
-        pagination = SubmissionStatus.query.filter_by(contest_id=contest_id, author_username=current_user.username).order_by(SubmissionStatus.id.desc()).paginate(page, per_page=current_app.config['FLASKY_STATUS_PER_PAGE'])
+        pagination = keyset_paginate(SubmissionStatus.query.filter_by(contest_id=contest_id, author_username=current_user.username), SubmissionStatus.id, current_app.config['FLASKY_STATUS_PER_PAGE'])
     status = pagination.items
     now = datetime.utcnow()
     sec_now = time.mktime(now.timetuple())
@@ -346,7 +354,28 @@ def contest_status_list(contest_id):
         status_list[current_app.config['LOCAL_SUBMISSION_STATUS'][k]] = k
     for k in current_app.config['LOCAL_LANGUAGE'].keys():
         language[current_app.config['LOCAL_LANGUAGE'][k]] = k
-    return render_template('contest/contest_status_list.html', status_list=status_list, language=language, status=status, pagination=pagination, contest_id=contest_id, contest=contest, sec_now=sec_now, sec_init=sec_init, sec_end=sec_end)
+    return render_template('contest/contest_status_list.html', status_list=status_list, language=language, status=status, pagination=pagination, contest_id=contest_id, contest=contest, sec_now=sec_now, sec_init=sec_init, sec_end=sec_end, event_id=event_id)
+
+
+@contest.route('/<int:contest_id>/status/events')
+@login_required
+def contest_status_events(contest_id):
+
+    '''
+        define operations about pushing the status changes of the contest,
+        all submissions for admins and the manager, own submissions for the others
+    :param contest_id: contest_id
+    :return: event stream
+    '''
+
+    contest = Contest.query.get_or_404(contest_id)
+    result = in_contest(contest, current_user.id)
+    if not result[0]:
+        return result[1]
+    username = current_user.username
+    if current_user.is_admin() or username == contest.manager_username:
+        return stream_events(lambda event: event['contest_id'] == contest_id)
+    return stream_events(lambda event: event['contest_id'] == contest_id and event['author_username'] == username)
 
 
 @contest.route('/<int:contest_id>/problem/<int:problem_index>/submit', methods=['GET', 'POST'])
@@ -385,11 +414,13 @@ def contest_submit(contest_id, problem_index):
                                       exec_memory = 0,
                                       code_length = len(form.code.data),
                                       language = form.language.data,
-                                      code = base64.b64encode(form.code.data.encode('utf-8')),
+                                      code = form.code.data,
                                       author_username = current_user.username,
                                       visible = False,
                                       contest_id = contest_id)
         db.session.add(submission)
+        JudgeQueue.enqueue(submission)
+        Statistic.record([(submission.author_username, problem.id, None, submission.status)])
         db.session.commit()
         return redirect(url_for('contest.contest_status_list',contest_id=contest_id))
     return render_template('contest/contest_submit.html', form=form, problem=problem, problem_index=problem_index, contest_id=contest_id, contest=contest, sec_now=sec_now, sec_init=sec_init, sec_end=sec_end)
@@ -413,7 +444,7 @@ def contest_status_detail(run_id, contest_id):
     status = contest.submissions.filter_by(id=run_id).first_or_404()
     if current_user.username != status.author_username and (not current_user.is_admin()) and current_user.username != contest.manager_username:
         return abort(403)
-    code=base64.b64decode(status.code).decode('utf-8')
+    code = status.code
     ce_info = CompileInfo.query.filter_by(submission_id=status.id).first()
     now = datetime.utcnow()
     sec_now = time.mktime(now.timetuple())
@@ -433,124 +464,16 @@ def contest_status_detail(run_id, contest_id):
 def contest_ranklist(contest_id):
 
     '''
-        define operation of showing ranklist
+        define operation of showing ranklist, only read the snapshot generated by the celery worker
     :param contest_id: contest_id
     :return: page
     '''
 
-    '''
-        data_struct:
-        ranklist = [{username': (str), 'total_ac': (int), 'total_time': (int), 'submission_detail': {problem_index : {'submission_num': (int), 'ac': bool, 'first_blood': bool, 'time': (int)}}}]
-    '''
-
     contest = Contest.query.get_or_404(contest_id)
     result = in_contest(contest, current_user.id)
     if not result[0]:
         return result[1]
-    now = datetime.utcnow()
-    sec_now = time.mktime(now.timetuple())
-    sec_init = time.mktime(contest.start_time.timetuple())
-    sec_end = time.mktime(contest.end_time.timetuple())
-    problems = contest.problems.all()
-    ranklists_table_in_database = KeyValue.query.filter_by(key='contest_rank_%s' % str(contest.id)).first()
-    # frozen rank setting
-    if contest.rank_frozen:
-        delay = timedelta(hours=1)
-    else:
-        delay = timedelta(hours=0)
-    if contest.end_time - delay < now or contest.last_generate_rank + timedelta(seconds=10) > now:
-        if ranklists_table_in_database is None:
-            ranklists = ''
-        else:
-            ranklists = ranklists_table_in_database.value
-        return render_template('contest/contest_ranklist.html', ranklists=ranklists, problems=problems, contest=contest, contest_id=contest_id, sec_now=sec_now, sec_init=sec_init, sec_end=sec_end)
-    users = contest.users.all()
-    ranklists = []
-    for user in users:
-        if user.user.is_admin() or contest.manager_username==user.user.username:
-            continue
-        user_total = {}
-        user_total['username'] = user.user.username
-        user_total['realname'] = user.realname if user.realname else user.user.nickname
-        user_total['submission_detail'] = {}
-        user_total['total_time'] = 0
-        user_total['total_ac'] = 0
-        for problem in problems:
-            status = contest.submissions.filter_by(problem_id=problem.problem_id, author_username=user_total['username']).order_by(SubmissionStatus.id.asc()).all()
-            problem_detail = {}
-            problem_detail['submission_num'] = 0
-            problem_detail['ac'] = False
-            problem_detail['first_blood'] = False
-            problem_detail['time'] = 0
-            for item in status:
-                if item.status == 1:
-                    problem_detail['ac'] = True
-                    user_total['total_ac'] += 1
-                    problem_detail['time'] = problem_detail['submission_num'] * 20 + (item.submit_time - contest.start_time).seconds / 60
-                    user_total['total_time'] += problem_detail['time']
-                    problem_detail['submission_num'] += 1
-                    break
-                else:
-                    problem_detail['submission_num'] += 1
-            user_total['submission_detail'][problem.problem_index] = problem_detail
-        ranklists.append(user_total)
-    for problem in problems:
-        submissions = contest.submissions.filter_by(problem_id=problem.problem_id, status=current_app.config['LOCAL_SUBMISSION_STATUS']['Accepted']).order_by(SubmissionStatus.id.asc()).limit(20)
-        flag = False
-        for submission in submissions:
-            for user_total in ranklists:
-                if user_total['username'] == submission.author_username:
-                    user_total['submission_detail'][problem.problem_index]['first_blood'] = True
-                    flag = True
-                    break
-            if flag:
-                break
-    ranklists.sort(cmp=cmp_ranklist)
-    # generate html ranklist
-    ranklist_table = ''
-    for i, ranklist in enumerate(ranklists):
-        ranklist_table += '<tr><td>'
-        ranklist_table += str(i+1)
-        ranklist_table += '</td><td>'
-        ranklist_table += ranklist['realname']
-        ranklist_table += '</td><td>'
-        ranklist_table += str(ranklist['total_ac'])
-        ranklist_table += '</td><td>'
-        ranklist_table += str(ranklist['total_time'])
-        ranklist_table += '</td>'
-        for problem in ranklist['submission_detail']:
-            ranklist_table += '<td '
-            if ranklist['submission_detail'][problem]['first_blood']:
-                ranklist_table += 'class="firstaccept">'
-            elif ranklist['submission_detail'][problem]['ac']:
-                ranklist_table += 'class="accept">'
-            elif ranklist['submission_detail'][problem]['submission_num'] > 0:
-                ranklist_table += 'class="wrong">'
-            if ranklist['submission_detail'][problem]['submission_num'] > 0:
-                ranklist_table += str(ranklist['submission_detail'][problem]['submission_num'])
-            else:
-                ranklist_table += '-'
-            ranklist_table += '/'
-            if ranklist['submission_detail'][problem]['ac']:
-                ranklist_table += str(ranklist['submission_detail'][problem]['time'])
-            else:
-                ranklist_table += '--'
-            ranklist_table += '</td>'
-        ranklist_table += '</tr>'
-
-    if ranklists_table_in_database is None:
-        newKV = KeyValue(key='contest_rank_%s'% str(contest.id), value=ranklist_table)
-        contest.last_generate_rank = now
-        db.session.add(newKV)
-        db.session.add(contest)
-        db.session.commit()
-    else:
-        ranklists_table_in_database.value = ranklist_table
-        contest.last_generate_rank = now
-        db.session.add(ranklists_table_in_database)
-        db.session.add(contest)
-        db.session.commit()
-    return render_template('contest/contest_ranklist.html', ranklists=ranklist_table, problems=problems, contest=contest, contest_id=contest_id, sec_now=sec_now, sec_init=sec_init, sec_end=sec_end)
+    return show_ranklist(contest, admin=False)
 
 
 @contest.route('/<int:contest_id>/ranklist_admin', methods=['GET', 'POST'])
@@ -558,121 +481,40 @@ def contest_ranklist(contest_id):
 def contest_ranklist_admin(contest_id):
 
     '''
-        define operation of showing ranklist
+        define operation of showing ranklist without frozen
     :param contest_id: contest_id
     :return: page
     '''
 
-    '''
-        data_struct:
-        ranklist = [{username': (str), 'total_ac': (int), 'total_time': (int), 'submission_detail': {problem_index : {'submission_num': (int), 'ac': bool, 'first_blood': bool, 'time': (int)}}}]
-    '''
-
     contest = Contest.query.get_or_404(contest_id)
     if current_user.username != contest.manager_username and (not current_user.is_admin()):
         return redirect(url_for('contest.contest_ranklist', contest_id=contest.id))
+    return show_ranklist(contest, admin=True)
+
+
+def show_ranklist(contest, admin):
+
+    '''
+        render the ranklist snapshot, then ask the worker for a new one if it is out of date
+    :param contest: contest obj
+    :param admin: admin (unfrozen) view or public view
+    :return: page
+    '''
+
     now = datetime.utcnow()
     sec_now = time.mktime(now.timetuple())
     sec_init = time.mktime(contest.start_time.timetuple())
     sec_end = time.mktime(contest.end_time.timetuple())
-    problems = contest.problems.all()
-    ranklists_table_in_database = KeyValue.query.filter_by(key='contest_rank_%s_admin' % str(contest.id)).first()
-    users = contest.users.all()
-    ranklists = []
-    for user in users:
-        if user.user.is_admin() or contest.manager_username==user.user.username:
-            continue
-        user_total = {}
-        user_total['username'] = user.user.username
-        user_total['realname'] = user.realname if user.realname else user.user.nickname
-        user_total['submission_detail'] = {}
-        user_total['total_time'] = 0
-        user_total['total_ac'] = 0
-        for problem in problems:
-            status = contest.submissions.filter_by(problem_id=problem.problem_id, author_username=user_total['username']).order_by(SubmissionStatus.id.asc()).all()
-            problem_detail = {}
-            problem_detail['submission_num'] = 0
-            problem_detail['ac'] = False
-            problem_detail['first_blood'] = False
-            problem_detail['time'] = 0
-            for item in status:
-                if item.status == 1:
-                    problem_detail['ac'] = True
-                    user_total['total_ac'] += 1
-                    problem_detail['time'] = problem_detail['submission_num'] * 20 + (item.submit_time - contest.start_time).seconds / 60
-                    user_total['total_time'] += problem_detail['time']
-                    problem_detail['submission_num'] += 1
-                    break
-                else:
-                    problem_detail['submission_num'] += 1
-            user_total['submission_detail'][problem.problem_index] = problem_detail
-        ranklists.append(user_total)
-    for problem in problems:
-        submissions = contest.submissions.filter_by(problem_id=problem.problem_id, status=current_app.config['LOCAL_SUBMISSION_STATUS']['Accepted']).order_by(SubmissionStatus.id.asc()).limit(20)
-        flag = False
-        for submission in submissions:
-            for user_total in ranklists:
-                if user_total['username'] == submission.author_username:
-                    user_total['submission_detail'][problem.problem_index]['first_blood'] = True
-                    flag = True
-                    break
-            if flag:
-                break
-    ranklists.sort(cmp=cmp_ranklist)
-    # generate html ranklist
-    ranklist_table = ''
-    for i, ranklist in enumerate(ranklists):
-        ranklist_table += '<tr><td>'
-        ranklist_table += str(i+1)
-        ranklist_table += '</td><td>'
-        ranklist_table += ranklist['realname']
-        ranklist_table += '</td><td>'
-        ranklist_table += str(ranklist['total_ac'])
-        ranklist_table += '</td><td>'
-        ranklist_table += str(ranklist['total_time'])
-        ranklist_table += '</td>'
-        for problem in ranklist['submission_detail']:
-            ranklist_table += '<td '
-            if ranklist['submission_detail'][problem]['first_blood']:
-                ranklist_table += 'class="firstaccept">'
-            elif ranklist['submission_detail'][problem]['ac']:
-                ranklist_table += 'class="accept">'
-            elif ranklist['submission_detail'][problem]['submission_num'] > 0:
-                ranklist_table += 'class="wrong">'
-            if ranklist['submission_detail'][problem]['submission_num'] > 0:
-                ranklist_table += str(ranklist['submission_detail'][problem]['submission_num'])
-            else:
-                ranklist_table += '-'
-            ranklist_table += '/'
-            if ranklist['submission_detail'][problem]['ac']:
-                ranklist_table += str(ranklist['submission_detail'][problem]['time'])
-            else:
-                ranklist_table += '--'
-            ranklist_table += '</td>'
-        ranklist_table += '</tr>'
-    return render_template('contest/contest_ranklist.html', ranklists=ranklist_table, problems=problems, contest=contest, contest_id=contest_id, sec_now=sec_now, sec_init=sec_init, sec_end=sec_end)
-
-
-def cmp_ranklist(a, b):
-
-    '''
-        define operation of cmp two ranklist item
-    :param a: ranklist item
-    :param b: ranklist item
-    :return: bigger: -1, less: 1, equal 0
-    '''
-
-    if a['total_ac'] > b['total_ac']:
-        return -1
-    elif a['total_ac'] == b['total_ac']:
-        if a['total_time'] < b['total_time']:
-            return -1
-        elif a['total_time'] == b['total_time']:
-            return 0
-        else:
-            return 1
+    ranklist = load_snapshot(contest.id, admin)
+    if ranklist is None:
+        problems = [problem.problem_index for problem in contest.problems.order_by(ContestProblem.problem_index.asc())]
     else:
-        return 1
+        problems = ranklist['problems']
+    page = render_template('contest/contest_ranklist.html', ranklist=ranklist, problems=problems, contest=contest, contest_id=contest.id, sec_now=sec_now, sec_init=sec_init, sec_end=sec_end)
+    # the task may run in this process, so send it after all the objects are used
+    request_snapshot(contest, force=ranklist is None)
+    return page
+
 
 @contest.route('/balloon/<int:contest_id>', methods=['GET', 'POST'])
 @login_required
@@ -687,7 +529,7 @@ def contest_show_balloon(contest_id):
     contest = Contest.query.get_or_404(contest_id)
     if contest.manager_username != current_user.username and (current_user.is_admin() is False):
         abort(403)
-    submissions = SubmissionStatus.query.filter_by(contest_id=contest_id, balloon_sent=False, status=current_app.config['LOCAL_SUBMISSION_STATUS']['Accepted']).order_by(SubmissionStatus.id.asc()).paginate(1, per_page=current_app.config['FLASKY_STATUS_PER_PAGE']).items
+    submissions = SubmissionStatus.query.filter_by(contest_id=contest_id, balloon_sent=False, status=current_app.config['LOCAL_SUBMISSION_STATUS']['Accepted']).order_by(SubmissionStatus.id.asc()).limit(current_app.config['FLASKY_STATUS_PER_PAGE']).all()
     now = datetime.utcnow()
     sec_now = time.mktime(now.timetuple())
     sec_init = time.mktime(contest.start_time.timetuple())
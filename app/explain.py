@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from datetime import datetime
+from . import db
+from .models import SubmissionStatus, JudgeQueue, Statistic, User, StatusEvent, ProblemChange
+import re
+
+
+def hot_queries():
+
+    '''
+        the queries run on every page view or judger poll, with sample params
+    :return: [(name, query, tables allowed to be scanned)]
+    '''
+
+    per_page = current_app.config['FLASKY_STATUS_PER_PAGE']
+    accepted = current_app.config['LOCAL_SUBMISSION_STATUS']['Accepted']
+    return [
+        ('status list', SubmissionStatus.query.filter_by(visible=True).filter(SubmissionStatus.id < 1000).order_by(SubmissionStatus.id.desc()).limit(per_page), []),
+        ('contest status list', SubmissionStatus.query.filter_by(contest_id=1).filter(SubmissionStatus.id < 1000).order_by(SubmissionStatus.id.desc()).limit(per_page), []),
+        ('contest ranklist delta', db.session.query(SubmissionStatus.id, SubmissionStatus.author_username, SubmissionStatus.problem_id, SubmissionStatus.status, SubmissionStatus.submit_time).filter(
+            SubmissionStatus.contest_id == 1, SubmissionStatus.id > 1000).order_by(SubmissionStatus.id.asc()), []),
+        ('contest user problem', SubmissionStatus.query.filter_by(contest_id=1, problem_id=1, author_username='test'), []),
+        ('contest balloon', SubmissionStatus.query.filter_by(contest_id=1, status=accepted, balloon_sent=False).order_by(SubmissionStatus.id.asc()).limit(per_page), []),
+        ('user verdicts', db.session.query(SubmissionStatus.status, db.func.count(SubmissionStatus.id)).filter(SubmissionStatus.author_username == 'test').group_by(SubmissionStatus.status), []),
+        ('user histogram', db.session.query(Statistic.status, Statistic.count).filter_by(kind='user', owner='test'), []),
+        ('avatar owner', db.session.query(User.id).filter_by(photo='abc123').limit(1), []),
+        ('online users', db.session.query(db.func.count(User.id)).filter(User.last_seen > datetime.utcnow()), []),
+        ('status events poll', StatusEvent.query.filter(StatusEvent.id > 1000).order_by(StatusEvent.id.asc()).limit(per_page), []),
+        ('problem changes poll', ProblemChange.query.filter(ProblemChange.id > 1000).order_by(ProblemChange.id.asc()).limit(per_page), []),
+        ('judge queue claim', db.session.query(JudgeQueue.id, JudgeQueue.submission_id, JudgeQueue.attempts).filter(
+            JudgeQueue.lease_expire <= datetime.utcnow()).order_by(JudgeQueue.id.asc()).limit(1),
+         # only the unjudged submissions are in the queue, the scan in id order stops at the first free one
+         ['judge_queue'])
+    ]
+
+
+def explain(query):
+
+    '''
+        run EXPLAIN of the query on the configured database
+    :param query: query
+    :return: (plan lines, list of the tables read by full scan)
+    '''
+
+    connection = db.session.connection()
+    dialect = connection.dialect
+    compiled = query.statement.compile(dialect=dialect)
+    if dialect.positional:
+        params = tuple(compiled.params[key] for key in compiled.positiontup)
+    else:
+        params = compiled.params
+    if dialect.name == 'sqlite':
+        rows = connection.execute('EXPLAIN QUERY PLAN ' + unicode(compiled), params).fetchall()
+        lines = [row[-1] for row in rows]
+        # "SCAN TABLE t" or "SCAN t" without an index, a covering index scan is fine
+        scans = []
+        for line in lines:
+            match = re.match(r'SCAN (TABLE )?(\w+)', line)
+            if match and 'USING' not in line:
+                scans.append(match.group(2))
+    elif dialect.name == 'mysql':
+        result = connection.execute('EXPLAIN ' + unicode(compiled), params)
+        keys = result.keys()
+        rows = [dict(zip(keys, row)) for row in result.fetchall()]
+        lines = ['%s: type=%s key=%s rows=%s %s' % (row['table'], row['type'], row['key'], row['rows'], row.get('Extra') or '') for row in rows]
+        scans = [row['table'] for row in rows if row['type'] == 'ALL']
+    else:
+        raise ValueError('EXPLAIN is not supported on %s' % dialect.name)
+    return lines, scans
+
+
+def explain_hot_queries():
+
+    '''
+        explain all hot queries
+    :return: [(name, plan lines, tables read by full scan but not allowed)]
+    '''
+
+    result = []
+    for name, query, allowed in hot_queries():
+        lines, scans = explain(query)
+        result.append((name, lines, [table for table in scans if table not in allowed]))
+    db.session.rollback()
+    return result
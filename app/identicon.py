@@ -24,7 +24,7 @@ from PIL import ImageDraw
 from PIL import ImagePath
 from PIL import ImageColor
 
-__all__ = ['render_identicon', 'IdenticonRendererBase']
+__all__ = ['render_identicon', 'render_identicons', 'IdenticonRendererBase']
 
 
 class Matrix2D(list):
@@ -233,8 +233,93 @@ class DonRenderer(IdenticonRendererBase):
                foreColor, ImageColor.getrgb('white')
 
 
+class MaskDonRenderer(DonRenderer):
+    """
+    DonRenderer pasting precomputed patch masks instead of transforming and
+    drawing every patch path. The masks of all patch types and turns are
+    built once per patch size, an identicon is then 18 pastes in C on a
+    one byte per pixel palette image, which also makes a smaller PNG.
+    The colors are the same as DonRenderer pixel by pixel.
+    """
+
+    MASKS = {}
+
+    @classmethod
+    def masks(kls, size):
+        """
+        @param size patch size
+        @return {(type, turn): mask image of (size + 1) * (size + 1)}
+        """
+        masks = kls.MASKS.get(size)
+        if masks is None:
+            masks = {}
+            for type in xrange(len(kls.PATH_SET)):
+                path = kls.PATH_SET[type] or \
+                    [(0., 0.), (1., 0.), (1., 1.), (0., 1.), (0., 0.)]
+                for turn in xrange(4):
+                    # the edges of the patch are drawn one pixel over the
+                    # patch, like the rectangle and outline of DonRenderer
+                    mask = Image.new('L', (size + 1, size + 1), 0)
+                    patch = ImagePath.Path(path)
+                    mat = Matrix2D.rotateSquare(turn, pivot=(0.5, 0.5)) * \
+                          Matrix2D.scale(size, size)
+                    patch.transform(mat.for_PIL())
+                    ImageDraw.Draw(mask).polygon(patch, fill=255, outline=255)
+                    masks[(type, turn)] = mask
+            kls.MASKS[size] = masks
+        return masks
+
+    def render(self, size):
+        """
+        render identicon to PIL.Image
+
+        @param size identicon patchsize. (image size is 3 * [size])
+        @return PIL.Image in "P" mode
+        """
+        middle, corner, side, foreColor, backColor = self.decode(self.code)
+        masks = self.masks(size)
+        # palette: 0 unused black, 1 fore color, 2 back color
+        image = Image.new("P", (size * 3, size * 3), 0)
+        # same order as DonRenderer, the later patches cover the edges
+        patches = [((1, 1), middle[2], middle[1], middle[0])]
+        patches += [(pos, side[2] + 1 + i, side[1], side[0]) for i, pos in
+                    enumerate([(1, 0), (2, 1), (1, 2), (0, 1)])]
+        patches += [(pos, corner[2] + 1 + i, corner[1], corner[0]) for i, pos
+                    in enumerate([(0, 0), (2, 0), (2, 2), (0, 2)])]
+        for pos, turn, invert, type in patches:
+            fore, back = 1, 2
+            if not self.PATH_SET[type]:
+                # blank patch
+                invert = not invert
+            if invert:
+                fore, back = back, fore
+            box = (pos[0] * size, pos[1] * size,
+                   pos[0] * size + size + 1, pos[1] * size + size + 1)
+            image.paste(back, box)
+            image.paste(fore, box, masks[(type, turn % 4)])
+        image.putpalette((0, 0, 0) + foreColor + backColor)
+        return image
+
+
 def render_identicon(code, size, renderer=None):
     if not renderer:
         renderer = DonRenderer
     return renderer(code).render(size)
 
+
+def render_identicons(codes, size, raw=False, renderer=None):
+    """
+    render a batch of identicons
+
+    @param codes codes for icons
+    @param size identicon patchsize. (image size is 3 * [size])
+    @param raw return the RGB pixel buffers instead of PIL.Image
+    @return list of PIL.Image or str
+    """
+    if not renderer:
+        renderer = MaskDonRenderer
+    images = [renderer(code).render(size) for code in codes]
+    if raw:
+        return [image.convert("RGB").tobytes() for image in images]
+    return images
+
@@ -8,6 +8,7 @@ from . import index
 from .. import db
 from ..models import Permission, KeyValue
 from ..decorators import admin_required
+from ..avatar import PHOTO_NAME, get_avatar
 import os, re, json, random, urllib, base64
 
 
@@ -72,3 +73,25 @@ def ckupload():
     response = make_response(res)
     response.headers["Content-Type"] = "text/html"
     return response
+
+
+@index.route('/avatar/<photo>.png')
+def avatar(photo):
+
+    '''
+        identicon avatar of a user, rendered on first view
+    :param photo: photo name of the user
+    :return: png
+    '''
+
+    if not PHOTO_NAME.match(photo):
+        abort(404)
+    data = get_avatar(photo)
+    if data is None:
+        abort(404)
+    response = make_response(data)
+    response.headers['Content-Type'] = 'image/png'
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['AVATAR_MAX_AGE']
+    response.set_etag(photo)
+    return response.make_conditional(request)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from datetime import datetime
+from datetime import datetime, timedelta
 import hashlib
 from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import TimedJSONWebSignatureSerializer as Serializer
@@ -9,7 +9,7 @@ from flask import current_app
 from flask_login import UserMixin, AnonymousUserMixin
 from . import db, login_manager
 from app.exceptions import ValidationError
-import identicon, random, os
+import random, os, binascii, base64, zlib, json
 
 class Permission(object):
 
@@ -41,6 +41,38 @@ class KeyValue(db.Model):
     key = db.Column(db.String(64), primary_key=True)
     value = db.Column(db.Text)
 
+    @staticmethod
+    def put(key, value):
+
+        '''
+            insert or update the value, no row lock is held by reading
+        :param key: key
+        :param value: value
+        :return: None
+        '''
+
+        if KeyValue.query.filter_by(key=key).update({KeyValue.value: value}, synchronize_session=False) == 1:
+            return
+        # the key may be created by another request just now
+        db.session.execute(KeyValue.__table__.insert().prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite').values(
+            key=key, value=value))
+        KeyValue.query.filter_by(key=key).update({KeyValue.value: value}, synchronize_session=False)
+
+
+class CacheChange(db.Model):
+
+    '''
+        define the keys changed in a versioned cache, read by every worker to drop its copies,
+        pruned after CACHE_CHANGE_KEEP seconds
+    '''
+
+    __tablename__ = 'cache_changes'
+    id = db.Column(db.Integer, primary_key=True)
+    # version name of the cache
+    name = db.Column(db.String(64))
+    key = db.Column(db.String(64))
+    created = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
+
 
 class Role(db.Model):
 
@@ -109,6 +141,21 @@ class ContestUsers(db.Model):
     register_time = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+class ContestImport(db.Model):
+
+    '''
+        define the user lists waiting for the import task, the passwords are kept here instead of the broker,
+        deleted by the task
+    '''
+
+    __tablename__ = 'contest_imports'
+    id = db.Column(db.Integer, primary_key=True)
+    contest_id = db.Column(db.Integer, db.ForeignKey('contests.id'))
+    # json list of the users, LONGTEXT on mysql
+    users = db.Column(db.Text(length=2 ** 24))
+    created = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class ContestProblem(db.Model):
 
     '''
@@ -158,9 +205,9 @@ class User(UserMixin, db.Model):
     phone_num = db.Column(db.String(32))
     about_me = db.Column(db.Text)
     member_since = db.Column(db.DateTime(), default=datetime.utcnow)
-    last_seen = db.Column(db.DateTime(), default=datetime.utcnow)
+    last_seen = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
     rating = db.Column(db.Integer, default=1500)
-    photo = db.Column(db.String(64))
+    photo = db.Column(db.String(64), index=True)
     # Todo: need to update to all connection part
     info_protection = db.Column(db.Boolean, default=False)
     submission = db.relationship('SubmissionStatus', backref='auther', lazy='dynamic', cascade='all, delete-orphan')
@@ -205,13 +252,20 @@ class User(UserMixin, db.Model):
             if self.role is None:
                 self.role = Role.query.filter_by(default=True).first()
         if self.photo is None:
-            code = random.randint(1, 1000000000000)
-            icon = identicon.render_identicon(code, 128)
-            icon.save('./app/static/photo/%08x.png' % code, 'PNG')
-            self.photo = '%08x' % code
+            self.photo = User.generate_photo()
         if self.nickname is None:
             self.nickname = self.username
 
+    @staticmethod
+    def generate_photo():
+
+        '''
+            pick a random identicon seed, the image is rendered by the avatar endpoint on first view
+        :return: photo name
+        '''
+
+        return '%08x' % random.randint(1, 1000000000000)
+
     def generate_auth_token(self, expiration=3600):
 
         '''
@@ -534,7 +588,9 @@ def load_user(user_id):
     :return: user
     '''
 
-    return User.query.get(int(user_id))
+    # cache imports models
+    from .cache import get_session_user
+    return get_session_user(user_id)
 
 
 class OJList(db.Model):
@@ -626,6 +682,9 @@ class Problem(db.Model):
         cascade='all, delete-orphan'
     )
 
+    # fields of the statement, rendered once into ProblemFragment
+    BODY_FIELDS = ('description', 'input', 'output', 'sample_input', 'sample_output', 'hint', 'source_name', 'author')
+
     def __init__(self, **kwargs):
 
         '''
@@ -654,6 +713,39 @@ class Problem(db.Model):
         }
         return json_problem
 
+    def tag_index_fields(self):
+
+        '''
+            fields read by the tag index, compared before and after an edit
+        :return: tuple
+        '''
+
+        return self.oj_id, self.remote_id, bool(self.visible), sorted(item.tag_id for item in self.tags)
+
+    @staticmethod
+    def body_version(values):
+
+        '''
+            version of the statement, a digest of the fields so every edit changes it, even two in the same second
+        :param values: values of BODY_FIELDS in the same order
+        :return: hex digest
+        '''
+
+        return hashlib.sha1(json.dumps(list(values))).hexdigest()
+
+    @staticmethod
+    def add_accept_num(counts):
+
+        '''
+            increase accept_num in the database, no row lock is held
+        :param counts: {problem_id: number of new accepted submissions}
+        :return: None
+        '''
+
+        for problem_id, num in counts.items():
+            if num:
+                Problem.query.filter_by(id=problem_id).update({Problem.accept_num: Problem.accept_num + num}, synchronize_session=False)
+
     @staticmethod
     def from_json(json_problem):
 
@@ -693,6 +785,18 @@ class SubmissionStatus(db.Model):
     '''
 
     __tablename__ = 'submission_status'
+    __table_args__ = (
+        # contest status list, contest ranklist
+        db.Index('ix_submission_status_contest_id_id', 'contest_id', 'id'),
+        # contest rejudge, submissions of one user on one contest problem
+        db.Index('ix_submission_status_contest_problem_author', 'contest_id', 'problem_id', 'author_username'),
+        # balloons and verdict counts of one contest
+        db.Index('ix_submission_status_contest_status_id', 'contest_id', 'status', 'id'),
+        # histograms of users
+        db.Index('ix_submission_status_author_status', 'author_username', 'status'),
+        # public status list
+        db.Index('ix_submission_status_visible_id', 'visible', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     submit_time = db.Column(db.DateTime(), default=datetime.utcnow)
     problem_id = db.Column(db.Integer, db.ForeignKey('problems.id'))
@@ -701,13 +805,57 @@ class SubmissionStatus(db.Model):
     exec_memory = db.Column(db.Integer)
     code_length = db.Column(db.Integer)
     language = db.Column(db.Integer)
-    code = db.Column(db.Text)
+    # source is in another table, only loaded when the code is used
+    source_id = db.Column(db.Integer, db.ForeignKey('source_code.id'))
+    source = db.relationship('SourceCode', lazy='select')
     author_username = db.Column(db.String(64), db.ForeignKey('users.username'))
     visible = db.Column(db.Boolean, default=True)
     contest_id = db.Column(db.Integer, db.ForeignKey('contests.id'))
     balloon_sent = db.Column(db.Boolean, default=False)
     submit_ip = db.Column(db.String(32))
 
+    @property
+    def code(self):
+
+        '''
+            source code of the submission
+        :return: unicode text or None
+        '''
+
+        if self.source is None:
+            return None
+        return self.source.text
+
+    @code.setter
+    def code(self, text):
+
+        '''
+            store the source code, the same code is stored once
+        :param text: unicode text or None
+        :return: None
+        '''
+
+        self.source = SourceCode.store(text) if text is not None else None
+
+    @staticmethod
+    def set_status(ids, status):
+
+        '''
+            change the status of the submissions and keep the statistics and the status events
+        :param ids: submission ids
+        :param status: new status code
+        :return: None
+        '''
+
+        if not ids:
+            return
+        status = int(status)
+        rows = db.session.query(SubmissionStatus.id, SubmissionStatus.contest_id, SubmissionStatus.author_username, SubmissionStatus.problem_id,
+                                SubmissionStatus.status).filter(SubmissionStatus.id.in_(ids)).all()
+        SubmissionStatus.query.filter(SubmissionStatus.id.in_(ids)).update({SubmissionStatus.status: status}, synchronize_session=False)
+        Statistic.record((username, problem_id, old, status) for submission_id, contest_id, username, problem_id, old in rows)
+        StatusEvent.record((submission_id, contest_id, username, status, None, None) for submission_id, contest_id, username, problem_id, old in rows)
+
     def send_balloon(self):
 
         '''
@@ -719,10 +867,21 @@ class SubmissionStatus(db.Model):
         db.session.add(self)
         db.session.commit()
 
+    @staticmethod
+    def judge_query():
+
+        '''
+            query of submissions loading the problem, oj and source code in the same SELECT,
+            to_json of the results needs no more queries
+        :return: query
+        '''
+
+        return SubmissionStatus.query.options(db.joinedload('problem').joinedload('oj'), db.joinedload('source'))
+
     def to_json(self):
 
         '''
-            submissions to json
+            submissions to json, load the submission with judge_query to avoid lazy loads
         :return: json
         '''
 
@@ -732,7 +891,7 @@ class SubmissionStatus(db.Model):
             'problem_id': self.problem_id,
             'language': self.language,
             'status': self.status,
-            'code': self.code,
+            'code': base64.b64encode(self.code.encode('utf-8')) if self.code is not None else None,
             'max_time': self.problem.time_limit,
             'max_memory': self.problem.memory_limit,
             'special_judge': 1 if self.problem.special_judge is True else 0,
@@ -776,7 +935,61 @@ class SubmissionStatus(db.Model):
         submission_id = json_submission.get('submission_id')
         if status is None or status == '' or exec_time is None or exec_time == '' or exec_memory is None or exec_memory == '' or check_str is None or check_str == '' or remote_id is None or remote_id == '' or submission_id is None or submission_id == '' :
             raise ValidationError('Status require full data')
-        return SubmissionStatus(status=status, exec_time=exec_time, exec_memory=exec_memory, code=check_str, code_length=submission_id, language = remote_id)
+        submission = SubmissionStatus(status=status, exec_time=exec_time, exec_memory=exec_memory, code_length=submission_id, language = remote_id)
+        submission.check_str = check_str
+        return submission
+
+
+class SourceCode(db.Model):
+
+    '''
+        define source code of submissions, addressed by the sha1 of the content
+    '''
+
+    __tablename__ = 'source_code'
+    id = db.Column(db.Integer, primary_key=True)
+    hash = db.Column(db.String(40), unique=True)
+    compressed = db.Column(db.Boolean, default=False)
+    content = db.Column(db.LargeBinary)
+
+    @property
+    def text(self):
+
+        '''
+            source code text
+        :return: unicode text
+        '''
+
+        data = zlib.decompress(self.content) if self.compressed else self.content
+        return data.decode('utf-8')
+
+    @staticmethod
+    def store(text):
+
+        '''
+            store the source code if it is new
+        :param text: unicode text
+        :return: SourceCode obj
+        '''
+
+        data = text.encode('utf-8') if isinstance(text, unicode) else text
+        digest = hashlib.sha1(data).hexdigest()
+        source = SourceCode.query.filter_by(hash=digest).first()
+        if source is not None:
+            return source
+        compressed = False
+        if len(data) >= current_app.config['SOURCE_CODE_COMPRESS_MIN']:
+            packed = zlib.compress(data)
+            if len(packed) < len(data):
+                data, compressed = packed, True
+        # the same code may be stored by another request just now
+        db.session.execute(SourceCode.__table__.insert().prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite').values(
+            hash=digest, compressed=compressed, content=data))
+        # a locking read sees the row committed by the other request, the snapshot of repeatable read does not
+        source = SourceCode.query.filter_by(hash=digest).with_for_update().first()
+        if source is None:
+            raise RuntimeError('Fail to store source code %s' % digest)
+        return source
 
 
 class CompileInfo(db.Model):
@@ -819,6 +1032,376 @@ class CompileInfo(db.Model):
         return CompileInfo(info=info)
 
 
+class ProblemChange(db.Model):
+
+    '''
+        define the changed problems, read by every worker to update its search index,
+        pruned when a new index file is written
+    '''
+
+    __tablename__ = 'problem_changes'
+    id = db.Column(db.Integer, primary_key=True)
+    problem_id = db.Column(db.Integer)
+    created = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
+
+    @staticmethod
+    def record(problem_ids):
+
+        '''
+            add the changes of problems, committed with the changes
+        :param problem_ids: iterable of problem ids
+        :return: None
+        '''
+
+        now = datetime.utcnow()
+        rows = [{'problem_id': problem_id, 'created': now} for problem_id in problem_ids]
+        if rows:
+            db.session.execute(ProblemChange.__table__.insert(), rows)
+
+
+class ProblemFragment(db.Model):
+
+    '''
+        define the rendered statements of problems, shared by all workers
+    '''
+
+    __tablename__ = 'problem_fragments'
+    problem_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # 'problem' or 'contest'
+    variant = db.Column(db.String(16), primary_key=True)
+    version = db.Column(db.String(40))
+    # LONGTEXT on mysql, statements with inline pictures do not fit in TEXT
+    html = db.Column(db.Text(length=2 ** 24))
+
+    @staticmethod
+    def put(problem_id, variant, version, html):
+
+        '''
+            insert or update the rendered statement, no row lock is held by reading
+        :param problem_id: problem id
+        :param variant: 'problem' or 'contest'
+        :param version: Problem.body_version of the statement
+        :param html: html
+        :return: None
+        '''
+
+        query = ProblemFragment.query.filter_by(problem_id=problem_id, variant=variant)
+        if query.update({ProblemFragment.version: version, ProblemFragment.html: html}, synchronize_session=False) == 1:
+            return
+        # the statement may be rendered by another request just now
+        db.session.execute(ProblemFragment.__table__.insert().prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite').values(
+            problem_id=problem_id, variant=variant, version=version, html=html))
+        query.update({ProblemFragment.version: version, ProblemFragment.html: html}, synchronize_session=False)
+
+
+class StatusEvent(db.Model):
+
+    '''
+        define the status changes of submissions, written with the status and pushed to the status pages,
+        pruned after STATUS_EVENT_KEEP seconds
+    '''
+
+    __tablename__ = 'status_events'
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer)
+    contest_id = db.Column(db.Integer)
+    author_username = db.Column(db.String(64))
+    status = db.Column(db.Integer)
+    exec_time = db.Column(db.Integer)
+    exec_memory = db.Column(db.Integer)
+    created = db.Column(db.DateTime(), default=datetime.utcnow, index=True)
+
+    @staticmethod
+    def record(changes):
+
+        '''
+            add the events of status changes, committed with the changes
+        :param changes: iterable of (submission id, contest id, username, new status, exec time, exec memory)
+        :return: None
+        '''
+
+        now = datetime.utcnow()
+        rows = [{
+            'submission_id': submission_id,
+            'contest_id': contest_id,
+            'author_username': username,
+            'status': int(status),
+            'exec_time': exec_time,
+            'exec_memory': exec_memory,
+            'created': now
+        } for submission_id, contest_id, username, status, exec_time, exec_memory in changes]
+        if rows:
+            db.session.execute(StatusEvent.__table__.insert(), rows)
+
+    def to_json(self):
+
+        '''
+            event to json
+        :return: json
+        '''
+
+        return {
+            'id': self.id,
+            'submission_id': self.submission_id,
+            'contest_id': self.contest_id,
+            'author_username': self.author_username,
+            'status': self.status,
+            'exec_time': self.exec_time,
+            'exec_memory': self.exec_memory
+        }
+
+
+class Statistic(db.Model):
+
+    '''
+        define verdict histograms of users and problems,
+        changed with every status write and reconciled from submission_status periodically
+    '''
+
+    __tablename__ = 'statistics'
+    # 'user' or 'problem'
+    kind = db.Column(db.String(16), primary_key=True)
+    # username or problem id
+    owner = db.Column(db.String(64), primary_key=True)
+    status = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, default=0)
+
+    @staticmethod
+    def add(kind, owner, status, num):
+
+        '''
+            add num to one bucket, no row lock is held by reading
+        :param kind: 'user' or 'problem'
+        :param owner: username or problem id
+        :param status: status code
+        :param num: number to add, can be negative
+        :return: None
+        '''
+
+        owner = str(owner)
+        query = Statistic.query.filter_by(kind=kind, owner=owner, status=status)
+        if query.update({Statistic.count: Statistic.count + num}, synchronize_session=False) == 1:
+            return
+        # create the empty bucket, it may be created by another request just now
+        db.session.execute(Statistic.__table__.insert().prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite').values(
+            kind=kind, owner=owner, status=status, count=0))
+        query.update({Statistic.count: Statistic.count + num}, synchronize_session=False)
+
+    @staticmethod
+    def record(changes):
+
+        '''
+            apply status changes of submissions to the histograms
+        :param changes: iterable of (username, problem_id, old status or None for new submission, new status)
+        :return: None
+        '''
+
+        deltas = {}
+        for username, problem_id, old, new in changes:
+            for kind, owner in (('user', username), ('problem', problem_id)):
+                if owner is None:
+                    continue
+                if old is not None:
+                    deltas[(kind, str(owner), int(old))] = deltas.get((kind, str(owner), int(old)), 0) - 1
+                deltas[(kind, str(owner), int(new))] = deltas.get((kind, str(owner), int(new)), 0) + 1
+        # same order in all requests
+        for kind, owner, status in sorted(deltas.keys()):
+            if deltas[(kind, owner, status)]:
+                Statistic.add(kind, owner, status, deltas[(kind, owner, status)])
+
+    @staticmethod
+    def histogram(kind, owner):
+
+        '''
+            read the histogram
+        :param kind: 'user' or 'problem'
+        :param owner: username or problem id
+        :return: {status: count}
+        '''
+
+        return dict(db.session.query(Statistic.status, Statistic.count).filter_by(kind=kind, owner=str(owner)).all())
+
+    @staticmethod
+    def reconcile():
+
+        '''
+            rebuild all histograms from submission_status, the buckets and the submissions are read in one transaction
+            and only the difference is added, so the changes committed meanwhile are kept
+        :return: number of the buckets
+        '''
+
+        counts = {}
+        for username, status, num in db.session.query(SubmissionStatus.author_username, SubmissionStatus.status, db.func.count(SubmissionStatus.id)).group_by(SubmissionStatus.author_username, SubmissionStatus.status):
+            if username is not None and status is not None:
+                counts[('user', username, status)] = num
+        for problem_id, status, num in db.session.query(SubmissionStatus.problem_id, SubmissionStatus.status, db.func.count(SubmissionStatus.id)).group_by(SubmissionStatus.problem_id, SubmissionStatus.status):
+            if problem_id is not None and status is not None:
+                counts[('problem', str(problem_id), status)] = num
+        deltas = {}
+        for kind, owner, status, num in db.session.query(Statistic.kind, Statistic.owner, Statistic.status, Statistic.count):
+            deltas[(kind, owner, status)] = counts.pop((kind, owner, status), 0) - (num or 0)
+        deltas.update(counts)
+        # same order as record
+        for kind, owner, status in sorted(deltas.keys()):
+            if deltas[(kind, owner, status)]:
+                Statistic.add(kind, owner, status, deltas[(kind, owner, status)])
+        Statistic.query.filter_by(count=0).delete(synchronize_session=False)
+        db.session.commit()
+        return Statistic.query.count()
+
+
+class JudgeQueue(db.Model):
+
+    '''
+        define the submissions waiting for judgers, a claimed item holds a lease,
+        the item is removed when the verdict is posted and reclaimed when the lease expires
+    '''
+
+    __tablename__ = 'judge_queue'
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission_status.id'), unique=True)
+    enqueue_time = db.Column(db.DateTime(), default=datetime.utcnow)
+    lease_owner = db.Column(db.String(64))
+    # random token of the claim which took the item
+    lease_token = db.Column(db.String(32))
+    lease_expire = db.Column(db.DateTime(), index=True)
+    attempts = db.Column(db.Integer, default=0)
+    submission = db.relationship('SubmissionStatus')
+
+    @staticmethod
+    def enqueue(submission):
+
+        '''
+            put the submission into the queue, reset the lease if it is already in
+        :param submission: submission item, status should be Waiting
+        :return: queue item
+        '''
+
+        item = None
+        if submission.id is not None:
+            item = JudgeQueue.query.filter_by(submission_id=submission.id).first()
+        if item is None:
+            item = JudgeQueue(submission=submission)
+        item.enqueue_time = datetime.utcnow()
+        item.lease_owner = None
+        item.lease_token = None
+        # free items have an expired lease, so the claim can search the index of lease_expire
+        item.lease_expire = item.enqueue_time
+        item.attempts = 0
+        db.session.add(item)
+        return item
+
+    @staticmethod
+    def claim(owner, language=None, oj_id=None, lease=None):
+
+        '''
+            claim the oldest free item
+        :param owner: username of the judger
+        :param language: only claim submissions in this language
+        :param oj_id: only claim submissions of problems from this oj
+        :param lease: lease timeout in seconds
+        :return: submission item or None
+        '''
+
+        submissions = JudgeQueue.claim_many(owner, 1, language, oj_id, lease)
+        return submissions[0] if submissions else None
+
+    @staticmethod
+    def claim_many(owner, max_num, language=None, oj_id=None, lease=None):
+
+        '''
+            claim at most max_num free items in submission order, no row lock is held:
+            one conditional update marks the items still free with a new lease token,
+            items taken by other judgers in the meantime are skipped and the next ones are tried
+        :param owner: username of the judger
+        :param max_num: max number of submissions
+        :param language: only claim submissions in this language
+        :param oj_id: only claim submissions of problems from this oj
+        :param lease: lease timeout in seconds
+        :return: [submission item] in id order, with the lease_token of its item, needed to renew the lease
+        '''
+
+        if lease is None:
+            lease = current_app.config['JUDGE_LEASE_TIMEOUT']
+        claimed_ids = []
+        # submission id -> lease token
+        tokens = {}
+        for i in range(current_app.config['JUDGE_CLAIM_RETRY']):
+            if len(claimed_ids) >= max_num:
+                break
+            now = datetime.utcnow()
+            free = JudgeQueue.lease_expire <= now
+            query = db.session.query(JudgeQueue.id, JudgeQueue.submission_id, JudgeQueue.attempts).filter(free)
+            if language is not None or oj_id is not None:
+                query = query.join(SubmissionStatus, SubmissionStatus.id == JudgeQueue.submission_id)
+                if language is not None:
+                    query = query.filter(SubmissionStatus.language == language)
+                if oj_id is not None:
+                    query = query.join(Problem, Problem.id == SubmissionStatus.problem_id).filter(Problem.oj_id == oj_id)
+            items = query.order_by(JudgeQueue.id.asc()).limit(max_num - len(claimed_ids)).all()
+            if not items:
+                break
+            # judgers keep crashing on them, give up
+            dead = [submission_id for item_id, submission_id, attempts in items if attempts >= current_app.config['JUDGE_MAX_ATTEMPTS']]
+            if dead:
+                JudgeQueue.query.filter(JudgeQueue.submission_id.in_(dead), free).delete(synchronize_session=False)
+                queued = set(submission_id for (submission_id, ) in db.session.query(JudgeQueue.submission_id).filter(JudgeQueue.submission_id.in_(dead)))
+                SubmissionStatus.set_status([submission_id for submission_id in dead if submission_id not in queued],
+                                            current_app.config['LOCAL_SUBMISSION_STATUS']['Judge Error'])
+            ids = [item_id for item_id, submission_id, attempts in items if attempts < current_app.config['JUDGE_MAX_ATTEMPTS']]
+            if ids:
+                token = binascii.hexlify(os.urandom(16))
+                JudgeQueue.query.filter(JudgeQueue.id.in_(ids), free).update({
+                    JudgeQueue.lease_owner: owner,
+                    JudgeQueue.lease_token: token,
+                    JudgeQueue.lease_expire: now + timedelta(seconds=lease),
+                    JudgeQueue.attempts: JudgeQueue.attempts + 1
+                }, synchronize_session=False)
+                for (submission_id, ) in db.session.query(JudgeQueue.submission_id).filter_by(lease_token=token):
+                    claimed_ids.append(submission_id)
+                    tokens[submission_id] = token
+            db.session.commit()
+        if not claimed_ids:
+            return []
+        SubmissionStatus.set_status(claimed_ids, current_app.config['LOCAL_SUBMISSION_STATUS']['Judging'])
+        db.session.commit()
+        submissions = SubmissionStatus.judge_query().filter(SubmissionStatus.id.in_(claimed_ids)).order_by(SubmissionStatus.id.asc()).all()
+        for submission in submissions:
+            submission.lease_token = tokens[submission.id]
+        return submissions
+
+    @staticmethod
+    def renew(submission_id, token, lease=None):
+
+        '''
+            extend the lease of a claimed item, judgers of one account share the owner, so the lease is matched by its token
+        :param submission_id: submission id
+        :param token: lease token given by the claim
+        :param lease: lease timeout in seconds
+        :return: True if the lease is still held by the token
+        '''
+
+        if not token:
+            return False
+        if lease is None:
+            lease = current_app.config['JUDGE_LEASE_TIMEOUT']
+        renewed = JudgeQueue.query.filter_by(submission_id=submission_id, lease_token=token).update(
+            {JudgeQueue.lease_expire: datetime.utcnow() + timedelta(seconds=lease)}, synchronize_session=False) == 1
+        db.session.commit()
+        return renewed
+
+    @staticmethod
+    def ack(submission_id):
+
+        '''
+            remove the item after the verdict is posted
+        :param submission_id: submission id
+        :return: None
+        '''
+
+        JudgeQueue.query.filter_by(submission_id=submission_id).delete(synchronize_session=False)
+
+
 class Contest(db.Model):
 
     '''
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app, request, abort
+import time
+
+
+def _counts():
+
+    '''
+        cached total counts of this worker, keyed by listing
+    :return: dict
+    '''
+
+    return current_app.extensions.setdefault('pagination_count', {})
+
+
+def cached_count(key, query):
+
+    '''
+        count the rows of the listing, the result is reused for PAGINATION_COUNT_TTL seconds
+    :param key: key of the listing, should include the filters
+    :param query: query of the listing
+    :return: count
+    '''
+
+    counts = _counts()
+    now = time.time()
+    item = counts.get(key)
+    if item is None or item[0] <= now:
+        if len(counts) >= current_app.config['PAGINATION_COUNT_MAX_KEYS']:
+            counts.clear()
+        item = (now + current_app.config['PAGINATION_COUNT_TTL'], query.order_by(None).count())
+        counts[key] = item
+    return item[1]
+
+
+class KeysetPagination(object):
+
+    '''
+        pagination keyed on a unique column: a page is found through the index of the column instead of OFFSET,
+        the links carry the key of the first item (before) or the last item (after) on the page
+    '''
+
+    def __init__(self, query, column, per_page, before=None, after=None, page=None, descending=True, total=None):
+
+        '''
+            query one page
+        :param query: query of the listing, without order
+        :param column: unique column, usually the primary key
+        :param per_page: items per page
+        :param before: show the items before this key
+        :param after: show the items after this key
+        :param page: page number of the old links, use OFFSET
+        :param descending: listing order of the column
+        :param total: total count shown in the widget, None for unknown
+        '''
+
+        self.per_page = per_page
+        self.total = total
+        order, reverse = (column.desc(), column.asc()) if descending else (column.asc(), column.desc())
+        if before is not None:
+            items = query.filter(column > before if descending else column < before).order_by(reverse).limit(per_page + 1).all()
+            self.has_prev = len(items) > per_page
+            self.has_next = True
+            items = items[:per_page]
+            items.reverse()
+            if not self.has_prev and len(items) < per_page:
+                # reached the front, show a full first page
+                items = query.order_by(order).limit(per_page + 1).all()
+                self.has_next = len(items) > per_page
+                items = items[:per_page]
+        elif page is not None and page > 1:
+            items = query.order_by(order).offset((page - 1) * per_page).limit(per_page + 1).all()
+            if not items:
+                abort(404)
+            self.has_prev = True
+            self.has_next = len(items) > per_page
+            items = items[:per_page]
+        else:
+            if after is not None:
+                query = query.filter(column < after if descending else column > after)
+            items = query.order_by(order).limit(per_page + 1).all()
+            self.has_prev = after is not None
+            self.has_next = len(items) > per_page
+            items = items[:per_page]
+        self.items = items
+        self.prev_cursor = getattr(items[0], column.key) if items else None
+        self.next_cursor = getattr(items[-1], column.key) if items else None
+
+
+class BitmapPagination(object):
+
+    '''
+        keyset pagination over a set of ids held as a bitmap, bit i is set for id i, in ascending order,
+        used like KeysetPagination
+    '''
+
+    def __init__(self, bitmap, per_page, before=None, after=None):
+
+        '''
+            pick the ids of one page
+        :param bitmap: int bitmap of the ids
+        :param per_page: items per page
+        :param before: show the ids before this one
+        :param after: show the ids after this one
+        '''
+
+        self.per_page = per_page
+        self.total = bin(bitmap).count('1')
+        items = None
+        if before is not None and before > 0:
+            items = BitmapPagination.highest(bitmap & ((1 << before) - 1), per_page + 1)
+            self.has_prev = len(items) > per_page
+            self.has_next = True
+            items = items[:per_page]
+            items.reverse()
+            if not self.has_prev and len(items) < per_page:
+                # reached the front, show a full first page
+                items = None
+        if items is None:
+            self.has_prev = False
+            if after is not None and after >= 0:
+                self.has_prev = bitmap & ((1 << (after + 1)) - 1) != 0
+                bitmap = bitmap >> (after + 1) << (after + 1)
+            items = BitmapPagination.lowest(bitmap, per_page + 1)
+            self.has_next = len(items) > per_page
+            items = items[:per_page]
+        self.items = items
+        self.prev_cursor = items[0] if items else None
+        self.next_cursor = items[-1] if items else None
+
+    @staticmethod
+    def lowest(bitmap, num):
+
+        '''
+            the smallest ids of the bitmap
+        :param bitmap: int bitmap
+        :param num: max number of ids
+        :return: [id] in ascending order
+        '''
+
+        ids = []
+        while bitmap and len(ids) < num:
+            low = bitmap & -bitmap
+            ids.append(low.bit_length() - 1)
+            bitmap ^= low
+        return ids
+
+    @staticmethod
+    def highest(bitmap, num):
+
+        '''
+            the largest ids of the bitmap
+        :param bitmap: int bitmap
+        :param num: max number of ids
+        :return: [id] in descending order
+        '''
+
+        ids = []
+        while bitmap and len(ids) < num:
+            ids.append(bitmap.bit_length() - 1)
+            bitmap ^= 1 << ids[-1]
+        return ids
+
+
+def bitmap_paginate(bitmap, per_page):
+
+    '''
+        bitmap pagination with the before/after args of the request
+    :param bitmap: int bitmap of the ids
+    :param per_page: items per page
+    :return: BitmapPagination obj
+    '''
+
+    return BitmapPagination(bitmap, per_page,
+                            before=request.args.get('before', None, type=int),
+                            after=request.args.get('after', None, type=int))
+
+
+def keyset_paginate(query, column, per_page, descending=True, count_key=None):
+
+    '''
+        keyset pagination with the before/after/page args of the request
+    :param query: query of the listing, without order
+    :param column: unique column, usually the primary key
+    :param per_page: items per page
+    :param descending: listing order of the column
+    :param count_key: key of the cached total count, None for no total
+    :return: KeysetPagination obj
+    '''
+
+    total = cached_count(count_key, query) if count_key is not None else None
+    return KeysetPagination(query, column, per_page,
+                            before=request.args.get('before', None, type=int),
+                            after=request.args.get('after', None, type=int),
+                            page=request.args.get('page', None, type=int),
+                            descending=descending,
+                            total=total)
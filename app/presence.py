@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from datetime import datetime, timedelta
+from . import db
+from .models import User
+import atexit, threading, time
+
+
+def _state():
+
+    '''
+        presence of this worker: pending last_seen values and the time each user was last written
+    :return: dict
+    '''
+
+    state = current_app.extensions.get('presence')
+    if state is None:
+        state = current_app.extensions['presence'] = {'pending': {}, 'written': {}, 'batch_start': None}
+        if current_app.config['PRESENCE_BACKGROUND_FLUSH']:
+            # the last batch of a worker going down
+            atexit.register(_flush_in_background, current_app._get_current_object())
+    return state
+
+
+def _flush_in_background(app):
+
+    '''
+        write the pending values out of a request, from the batch timer or at exit
+    :param app: app obj
+    :return: None
+    '''
+
+    with app.app_context():
+        try:
+            flush()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Fail to write last_seen')
+
+
+def touch(user_id):
+
+    '''
+        record the activity of the user, last_seen is written at most once every PRESENCE_WRITE_INTERVAL seconds,
+        the pending values of all users are written together after PRESENCE_BATCH_DELAY seconds, by the next request
+        or by a timer
+    :param user_id: user id
+    :return: None
+    '''
+
+    state = _state()
+    now = time.time()
+    written = state['written']
+    if now - written.get(user_id, 0) >= current_app.config['PRESENCE_WRITE_INTERVAL']:
+        written[user_id] = now
+        if not state['pending']:
+            state['batch_start'] = now
+            if current_app.config['PRESENCE_BACKGROUND_FLUSH']:
+                # a quiet worker gets no more requests to write the batch, a greenlet under gevent
+                timer = threading.Timer(current_app.config['PRESENCE_BATCH_DELAY'], _flush_in_background,
+                                        (current_app._get_current_object(), ))
+                timer.daemon = True
+                timer.start()
+        state['pending'][user_id] = datetime.utcnow()
+        if len(written) >= current_app.config['PRESENCE_MAX_USERS']:
+            written.clear()
+    if state['pending'] and (now - state['batch_start'] >= current_app.config['PRESENCE_BATCH_DELAY'] or
+                             len(state['pending']) >= current_app.config['PRESENCE_BATCH_SIZE']):
+        flush()
+
+
+def flush():
+
+    '''
+        write the pending last_seen values in one UPDATE
+    :return: number of the users written
+    '''
+
+    state = _state()
+    pending, state['pending'] = state['pending'], {}
+    if not pending:
+        return 0
+    User.query.filter(User.id.in_(pending.keys())).update(
+        {User.last_seen: db.case(pending, value=User.id)}, synchronize_session=False)
+    db.session.commit()
+    return len(pending)
+
+
+def online_count():
+
+    '''
+        number of the users seen in the last PRESENCE_ONLINE_WINDOW seconds, a range on the index of last_seen
+    :return: count
+    '''
+
+    since = datetime.utcnow() - timedelta(seconds=current_app.config['PRESENCE_ONLINE_WINDOW'])
+    return db.session.query(db.func.count(User.id)).filter(User.last_seen > since).scalar()
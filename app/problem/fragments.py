@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app, Markup
+from datetime import datetime, timedelta
+from .. import db, flask_celery
+from ..models import Problem, Contest, ContestProblem, ProblemFragment
+
+# the problem page shows the source, the contest page hides it
+VARIANTS = ('problem', 'contest')
+
+
+def fragment_version(problem):
+
+    '''
+        version of the rendered body, changed by every edit of the statement
+    :param problem: problem item
+    :return: version string
+    '''
+
+    return Problem.body_version(getattr(problem, field) for field in Problem.BODY_FIELDS)
+
+
+def render_body(problem, variant):
+
+    '''
+        render the statement part of the problem page, no request is needed
+    :param problem: problem item
+    :param variant: 'problem' or 'contest'
+    :return: html
+    '''
+
+    return current_app.jinja_env.get_template('problem/_problem_body.html').render(problem=problem, show_source=variant == 'problem')
+
+
+def store_body(problem, variant):
+
+    '''
+        render the body and share it with all workers through ProblemFragment, committed at once
+    :param problem: problem item
+    :param variant: 'problem' or 'contest'
+    :return: html
+    '''
+
+    html = render_body(problem, variant)
+    ProblemFragment.put(problem.id, variant, fragment_version(problem), html)
+    db.session.commit()
+    return html
+
+
+def get_body(problem_id, version, variant):
+
+    '''
+        rendered problem body, from this worker, then ProblemFragment, then rendered again
+    :param problem_id: problem id
+    :param version: body_version in the problem meta
+    :param variant: 'problem' or 'contest'
+    :return: html Markup
+    '''
+
+    local = current_app.extensions.setdefault('problem_fragment', {})
+    item = local.get((problem_id, variant))
+    if item is not None and item[0] == version:
+        return Markup(item[1])
+    html = None
+    row = db.session.query(ProblemFragment.version, ProblemFragment.html).filter_by(problem_id=problem_id, variant=variant).first()
+    if row is not None and row[0] == version:
+        html = row[1]
+    if html is None:
+        html = store_body(Problem.query.get(problem_id), variant)
+    if len(local) >= current_app.config['PROBLEM_FRAGMENT_MAX_KEYS']:
+        local.clear()
+    local[(problem_id, variant)] = (version, html)
+    return Markup(html)
+
+
+@flask_celery.task(
+    bind=True,
+    ignore_result=True
+)
+def prewarm_contest_problems(self):
+
+    '''
+        render the problems of the contests starting in PROBLEM_PREWARM_AHEAD seconds,
+        so the first views at the start read the body from ProblemFragment
+    :return: None
+    '''
+
+    now = datetime.utcnow()
+    problems = Problem.query.join(ContestProblem, ContestProblem.problem_id == Problem.id).join(
+        Contest, Contest.id == ContestProblem.contest_id).filter(
+        Contest.start_time > now, Contest.start_time <= now + timedelta(seconds=current_app.config['PROBLEM_PREWARM_AHEAD'])).all()
+    for problem in problems:
+        version = db.session.query(ProblemFragment.version).filter_by(problem_id=problem.id, variant='contest').scalar()
+        if version != fragment_version(problem):
+            store_body(problem, 'contest')
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app, request
+from flask_sqlalchemy import Pagination
+from .. import db
+from ..models import Problem, OJList, Tag, TagProblem
+from ..pagination import keyset_paginate, bitmap_paginate
+
+# columns shown by the problem lists
+LISTING_COLUMNS = (Problem.id, Problem.title, Problem.oj_id, Problem.remote_id, Problem.submission_num,
+                   Problem.accept_num, Problem.last_update, Problem.visible)
+
+
+def load_listing(rows):
+
+    '''
+        add the oj and tags of a page of problems, one query for the ojs and one for the tags of the whole page
+    :param rows: rows of LISTING_COLUMNS
+    :return: [dict of problem], 'oj' and 'vjudge' of the oj, 'tags' is a list of tag names
+    '''
+
+    problems = [dict(zip([column.key for column in LISTING_COLUMNS], row)) for row in rows]
+    if not problems:
+        return problems
+    oj_ids = set(problem['oj_id'] for problem in problems if problem['oj_id'] is not None)
+    ojs = {}
+    if oj_ids:
+        ojs = dict((oj_id, (name, vjudge)) for oj_id, name, vjudge in db.session.query(
+            OJList.id, OJList.name, OJList.vjudge).filter(OJList.id.in_(oj_ids)))
+    tags = {}
+    for problem_id, tag_name in db.session.query(TagProblem.problem_id, Tag.tag_name).join(Tag, Tag.id == TagProblem.tag_id).filter(
+            TagProblem.problem_id.in_([problem['id'] for problem in problems])).order_by(TagProblem.problem_id, Tag.id):
+        tags.setdefault(problem_id, []).append(tag_name)
+    for problem in problems:
+        problem['oj'], problem['vjudge'] = ojs.get(problem['oj_id'], (None, None))
+        problem['tags'] = tags.get(problem['id'], [])
+    return problems
+
+
+def paginate_problems(query, count_key=None):
+
+    '''
+        one page of a problem list, only the listed columns are loaded
+    :param query: query of Problem with the filters of the list
+    :param count_key: key of the cached total count, None for no total
+    :return: KeysetPagination obj, the items are dicts from load_listing
+    '''
+
+    pagination = keyset_paginate(query.with_entities(*LISTING_COLUMNS), Problem.id, current_app.config['FLASKY_PROBLEMS_PER_PAGE'],
+                                 descending=False, count_key=count_key)
+    pagination.items = load_listing(pagination.items)
+    return pagination
+
+
+def paginate_problem_ids(bitmap):
+
+    '''
+        one page of a problem list found by the tag index, the page is loaded by primary key
+    :param bitmap: bitmap of the problem ids
+    :return: BitmapPagination obj, the items are dicts from load_listing
+    '''
+
+    pagination = bitmap_paginate(bitmap, current_app.config['FLASKY_PROBLEMS_PER_PAGE'])
+    pagination.items = load_listing(_rows_of(pagination.items))
+    return pagination
+
+
+def paginate_ranked_ids(problem_ids):
+
+    '''
+        one page of a ranked problem list, numbered pages in the order of the ranking
+    :param problem_ids: [problem id], best first
+    :return: Pagination obj, the items are dicts from load_listing
+    '''
+
+    per_page = current_app.config['FLASKY_PROBLEMS_PER_PAGE']
+    page = max(request.args.get('page', 1, type=int), 1)
+    page_ids = problem_ids[(page - 1) * per_page:page * per_page]
+    return Pagination(None, page, per_page, len(problem_ids), load_listing(_rows_of(page_ids)))
+
+
+def _rows_of(problem_ids):
+
+    '''
+        rows of LISTING_COLUMNS loaded by primary key
+    :param problem_ids: [problem id]
+    :return: rows in the order of problem_ids
+    '''
+
+    if not problem_ids:
+        return []
+    rows = dict((row[0], row) for row in db.session.query(*LISTING_COLUMNS).filter(Problem.id.in_(problem_ids)))
+    return [rows[problem_id] for problem_id in problem_ids if problem_id in rows]
@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from datetime import datetime, timedelta
+from .. import db, flask_celery
+from ..models import Problem, ProblemChange, KeyValue
+import marshal, math, os, re, tempfile, time
+
+# searched columns and the weight of their words
+FIELDS = ((Problem.title, 4), (Problem.source_name, 2), (Problem.author, 2), (Problem.description, 1))
+# latin words and numbers, runs of CJK characters
+WORD = re.compile(u'[0-9a-z]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+', re.UNICODE)
+# html tags and entities of the statements
+MARKUP = re.compile(u'<[^>]*>|&#?\\w+;')
+# layout of the index file, files of another layout are rebuilt
+FORMAT = 1
+# bm25 params
+K1 = 1.2
+B = 0.75
+# problems found by LIKE while the index file is built
+FALLBACK_LIMIT = 1000
+# key of the last ProblemChange id deleted in KeyValue, an index before it misses changes
+PRUNED_KEY = 'search_change_pruned'
+
+
+def tokenize(text):
+
+    '''
+        terms of a text: latin words and numbers as they are, CJK text as overlapping bigrams,
+        a single CJK character stays a term of its own
+    :param text: text
+    :return: [term]
+    '''
+
+    if not text:
+        return []
+    if isinstance(text, str):
+        text = text.decode('utf-8', 'ignore')
+    terms = []
+    for word in WORD.findall(MARKUP.sub(u' ', text).lower()):
+        if word[0] < u'\u3400':
+            terms.append(word)
+            continue
+        if len(word) == 1:
+            terms.append(word)
+        terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def _settled():
+
+    '''
+        time before which a missing change id is given up, its insert was rolled back rather than not committed yet
+    :return: datetime
+    '''
+
+    return datetime.utcnow() - timedelta(seconds=current_app.config['SEARCH_CHANGE_GRACE'])
+
+
+def pruned_change():
+
+    '''
+        id of the last deleted ProblemChange
+    :return: change id
+    '''
+
+    return int(db.session.query(KeyValue.value).filter_by(key=PRUNED_KEY).scalar() or 0)
+
+
+def _problem_rows(*criterion):
+
+    '''
+        id, visible and searched columns of problems
+    :param criterion: filters
+    :return: query
+    '''
+
+    return db.session.query(Problem.id, Problem.visible, *[column for column, weight in FIELDS]).filter(*criterion)
+
+
+class SearchIndex(object):
+
+    '''
+        inverted index of the problems, ranked by bm25 on the weighted counts of the terms
+    '''
+
+    def __init__(self, last_change=0, postings=None, docs=None):
+
+        '''
+            make an index
+        :param last_change: id of the last ProblemChange in the index
+        :param postings: term -> {problem id: weighted count}
+        :param docs: problem id -> (visible, weighted length, [term])
+        '''
+
+        self.last_change = last_change
+        self.postings = postings if postings is not None else {}
+        self.docs = docs if docs is not None else {}
+        self.length = sum(doc[1] for doc in self.docs.values())
+
+    @staticmethod
+    def build():
+
+        '''
+            index all the problems
+        :return: SearchIndex obj
+        '''
+
+        # changes made while building are read again later, adding a problem twice is harmless, the recent changes
+        # are read again too since a lower id may still be committed, the deleted changes are all in the problems
+        last_change = db.session.query(db.func.max(ProblemChange.id)).filter(ProblemChange.created <= _settled()).scalar() or 0
+        index = SearchIndex(max(last_change, pruned_change()))
+        for row in _problem_rows().yield_per(1000):
+            index.add(row)
+        return index
+
+    @staticmethod
+    def load(path):
+
+        '''
+            read an index file
+        :param path: file path
+        :return: SearchIndex obj or None for a missing file or an old layout
+        '''
+
+        try:
+            with open(path, 'rb') as f:
+                data = marshal.load(f)
+        except (IOError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(data, tuple) or data[0] != FORMAT:
+            return None
+        return SearchIndex(*data[1:])
+
+    def dump(self, path):
+
+        '''
+            write the index file, replaced at once so workers never read half of it
+        :param path: file path
+        :return: None
+        '''
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        fd, temp = tempfile.mkstemp(dir=directory, prefix='.search_index')
+        with os.fdopen(fd, 'wb') as f:
+            marshal.dump((FORMAT, self.last_change, self.postings, self.docs), f)
+        os.rename(temp, path)
+
+    def add(self, row):
+
+        '''
+            index a problem, replacing its old terms
+        :param row: row of _problem_rows
+        :return: None
+        '''
+
+        problem_id = row[0]
+        self.remove(problem_id)
+        counts = {}
+        for (column, weight), text in zip(FIELDS, row[2:]):
+            for term in tokenize(text):
+                counts[term] = counts.get(term, 0) + weight
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[problem_id] = count
+        length = sum(counts.values())
+        self.docs[problem_id] = (bool(row[1]), length, counts.keys())
+        self.length += length
+
+    def remove(self, problem_id):
+
+        '''
+            drop a problem from the index
+        :param problem_id: problem id
+        :return: None
+        '''
+
+        doc = self.docs.pop(problem_id, None)
+        if doc is None:
+            return
+        self.length -= doc[1]
+        for term in doc[2]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(problem_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def catch_up(self):
+
+        '''
+            index again the problems changed after last_change, a missing id is waited for SEARCH_CHANGE_GRACE seconds
+            since its insert may not be committed yet
+        :return: number of changes read, None if the changes after last_change were deleted by a newer index file
+        '''
+
+        batch = current_app.config['SEARCH_CHANGE_BATCH']
+        settled = _settled()
+        count = 0
+        while True:
+            changes = db.session.query(ProblemChange.id, ProblemChange.problem_id, ProblemChange.created).filter(
+                ProblemChange.id > self.last_change).order_by(ProblemChange.id.asc()).limit(batch).all()
+            # read after the changes, a prune between the two reads is seen
+            if count == 0 and pruned_change() > self.last_change:
+                return None
+            last_change = self.last_change
+            problem_ids = set()
+            for change_id, problem_id, created in changes:
+                if change_id != last_change + 1 and created > settled:
+                    break
+                last_change = change_id
+                problem_ids.add(problem_id)
+            if not problem_ids:
+                return count
+            for row in _problem_rows(Problem.id.in_(problem_ids)):
+                self.add(row)
+                problem_ids.discard(row[0])
+            # the rest are deleted
+            for problem_id in problem_ids:
+                self.remove(problem_id)
+            read = len([change for change in changes if change[0] <= last_change])
+            self.last_change = last_change
+            count += read
+            if read < batch:
+                return count
+
+    def posting(self, term):
+
+        '''
+            problems having the term, a single CJK character matches the bigrams holding it
+        :param term: term
+        :return: {problem id: weighted count}
+        '''
+
+        if len(term) > 1 or term < u'\u3400':
+            return self.postings.get(term, {})
+        # rare in queries, the terms are scanned
+        posting = dict(self.postings.get(term, {}))
+        for other, problems in self.postings.items():
+            if len(other) == 2 and term in other:
+                for problem_id, count in problems.items():
+                    posting[problem_id] = posting.get(problem_id, 0) + count
+        return posting
+
+    def search(self, query, visible_only=True):
+
+        '''
+            problems having all the terms of the query, best first
+        :param query: words to search
+        :param visible_only: only the visible problems
+        :return: [problem id]
+        '''
+
+        postings = sorted((self.posting(term) for term in set(tokenize(query))), key=len)
+        if not postings or not postings[0]:
+            return []
+        # start from the rarest term
+        scores = dict((problem_id, 0.0) for problem_id in postings[0] if (not visible_only or self.docs[problem_id][0]) and
+                      all(problem_id in posting for posting in postings[1:]))
+        total = len(self.docs)
+        average = float(self.length) / total
+        for posting in postings:
+            idf = math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+            for problem_id in scores:
+                count = posting[problem_id]
+                scores[problem_id] += idf * count * (K1 + 1) / (count + K1 * (1 - B + B * self.docs[problem_id][1] / average))
+        return sorted(scores, key=lambda problem_id: (-scores[problem_id], problem_id))
+
+
+def _stamp(path):
+
+    '''
+        modification stamp of the index file
+    :param path: file path or None
+    :return: (mtime, size) or None
+    '''
+
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+def get_search_index():
+
+    '''
+        search index of this worker, read from SEARCH_INDEX_PATH on the first use, then kept up to date with the problem
+        changes, checked at most once every SEARCH_CHECK_INTERVAL seconds, a missing file, or an old one missing pruned
+        changes, is written by a task on this host since building blocks the worker, the old index is used meanwhile,
+        without SEARCH_INDEX_PATH the index is built here
+    :return: SearchIndex obj, or None while the file is written
+    '''
+
+    state = current_app.extensions.setdefault('search_index', {'index': None, 'checked': 0, 'file': None, 'requested': 0})
+    now = time.time()
+    if state['index'] is not None and state['checked'] + current_app.config['SEARCH_CHECK_INTERVAL'] > now:
+        return state['index']
+    state['checked'] = now
+    path = current_app.config['SEARCH_INDEX_PATH']
+    # a new file comes first, the changes it holds may have been pruned
+    stamp = _stamp(path)
+    if stamp is not None and stamp != state['file']:
+        state['file'] = stamp
+        index = SearchIndex.load(path)
+        if index is not None and (state['index'] is None or index.last_change > state['index'].last_change):
+            state['index'] = index
+    if state['index'] is None and not path:
+        state['index'] = SearchIndex.build()
+    if state['index'] is None or state['index'].catch_up() is None:
+        if state['requested'] + current_app.config['SEARCH_BUILD_RETRY'] <= now:
+            state['requested'] = now
+            request_search_index()
+    return state['index']
+
+
+def like_search(query, visible_only=True):
+
+    '''
+        problems having all the words of the query in a searched column, by LIKE while there is no index
+    :param query: words to search
+    :param visible_only: only the visible problems
+    :return: [problem id] of the first FALLBACK_LIMIT problems
+    '''
+
+    words = [word for word in query.split() if word]
+    if not words:
+        return []
+    criterion = []
+    for word in words:
+        pattern = u'%%%s%%' % word.replace(u'\\', u'\\\\').replace(u'%', u'\\%').replace(u'_', u'\\_')
+        criterion.append(db.or_(*[column.ilike(pattern, escape=u'\\') for column, weight in FIELDS]))
+    if visible_only:
+        criterion.append(Problem.visible == True)
+    return [problem_id for (problem_id, ) in db.session.query(Problem.id).filter(*criterion).order_by(Problem.id.asc()).limit(FALLBACK_LIMIT)]
+
+
+def search_problems(query, visible_only=True):
+
+    '''
+        problems matching the query, best first by the index, or by id while the index file is written
+    :param query: words to search
+    :param visible_only: only the visible problems
+    :return: [problem id]
+    '''
+
+    index = get_search_index()
+    if index is None:
+        return like_search(query, visible_only)
+    return index.search(query, visible_only)
+
+
+def record_problem_changes(problem_ids):
+
+    '''
+        tell the search indexes of all the workers the problems changed, the session is committed with the changes,
+        this worker reads them on its next search
+    :param problem_ids: iterable of problem ids
+    :return: None
+    '''
+
+    ProblemChange.record(problem_ids)
+    db.session.commit()
+    state = current_app.extensions.get('search_index')
+    if state is not None:
+        state['checked'] = 0
+
+
+def write_search_index(prune=True):
+
+    '''
+        write a new index file and delete the changes it holds, the workers of the other hosts read the file
+        if SEARCH_INDEX_PATH is on shared storage, otherwise they find their index misses the deleted changes
+        and write their own file
+    :param prune: delete the changes, only the beat does, so hosts writing their own files do not make each other rebuild
+    :return: SearchIndex obj or None without SEARCH_INDEX_PATH
+    '''
+
+    path = current_app.config['SEARCH_INDEX_PATH']
+    if not path:
+        return None
+    index = SearchIndex.build()
+    index.dump(path)
+    if prune:
+        # the recent changes are kept for the workers waiting on a missing id
+        ProblemChange.query.filter(ProblemChange.id <= index.last_change, ProblemChange.created <= _settled()).delete(
+            synchronize_session=False)
+        if index.last_change > pruned_change():
+            KeyValue.put(PRUNED_KEY, str(index.last_change))
+        db.session.commit()
+    return index
+
+
+def request_search_index():
+
+    '''
+        ask the celery worker of this host to write the index file, the file is local to the host,
+        a broker outage is logged and asked again later
+    :return: True if the task was sent
+    '''
+
+    try:
+        build_search_index.apply_async(kwargs={'local': True}, queue=current_app.config['SEARCH_BUILD_QUEUE'])
+    except Exception:
+        current_app.logger.exception('Fail to request the search index')
+        return False
+    return True
+
+
+@flask_celery.task(
+    bind=True,
+    ignore_result=True
+)
+def build_search_index(self, local=False):
+
+    '''
+        write the index file, run by the beat, or by the worker of a host missing it
+    :param local: asked by a web worker of this host, skipped if another one asked first
+    :return: None
+    '''
+
+    if local:
+        index = SearchIndex.load(current_app.config['SEARCH_INDEX_PATH'])
+        if index is not None and index.last_change >= pruned_change():
+            return
+    write_search_index(prune=not local)
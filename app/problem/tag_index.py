@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from .. import db
+from ..models import Problem, OJList, Tag, TagProblem
+from ..cache import VersionedCache
+import re
+
+# operators, parentheses, quoted names and plain names
+TOKEN = re.compile(r'\s*(?:([()&|!])|"([^"]*)"|([^()&|!"]+))')
+# longest expression and deepest nesting of parentheses and ! accepted, the parser and evaluate recurse on nesting
+MAX_LENGTH = 512
+MAX_DEPTH = 32
+
+
+class TagIndex(object):
+
+    '''
+        bitmaps of problem ids kept by a worker, bit i is set for problem i,
+        tag expressions and filters are evaluated by set operations on them
+    '''
+
+    def __init__(self):
+        self.all = 0
+        self.visible = 0
+        # tag name -> bitmap
+        self.tags = {}
+        # oj name -> bitmap
+        self.ojs = {}
+        # remote id -> [problem id], few problems share one, a bitmap each would be as wide as the biggest id
+        self.remote_ids = {}
+
+    @staticmethod
+    def load(key=None):
+
+        '''
+            build the index from problems, ojs, tags and tag_problem, each read once without join
+        :param key: key in the cache, unused
+        :return: TagIndex obj
+        '''
+
+        index = TagIndex()
+        oj_names = dict(db.session.query(OJList.id, OJList.name))
+        tag_names = dict(db.session.query(Tag.id, Tag.tag_name))
+        for problem_id, oj_id, remote_id, visible in db.session.query(Problem.id, Problem.oj_id, Problem.remote_id, Problem.visible):
+            bit = 1 << problem_id
+            index.all |= bit
+            if visible:
+                index.visible |= bit
+            if oj_id in oj_names:
+                index.ojs[oj_names[oj_id]] = index.ojs.get(oj_names[oj_id], 0) | bit
+            if remote_id is not None:
+                index.remote_ids.setdefault(remote_id, []).append(problem_id)
+        for tag_id, problem_id in db.session.query(TagProblem.tag_id, TagProblem.problem_id):
+            if tag_id in tag_names:
+                index.tags[tag_names[tag_id]] = index.tags.get(tag_names[tag_id], 0) | (1 << problem_id)
+        return index
+
+    def match(self, expression):
+
+        '''
+            problems matching a tag expression, see parse_expression
+        :param expression: tag expression
+        :return: bitmap
+        '''
+
+        return self.evaluate(parse_expression(expression))
+
+    def evaluate(self, tree):
+
+        '''
+            evaluate a parsed tag expression
+        :param tree: tree from parse_expression
+        :return: bitmap
+        '''
+
+        if tree[0] == 'tag':
+            return self.tags.get(tree[1], 0)
+        if tree[0] == '!':
+            return self.all & ~self.evaluate(tree[1])
+        result = self.evaluate(tree[1])
+        for operand in tree[2:]:
+            if tree[0] == '&':
+                result &= self.evaluate(operand)
+            else:
+                result |= self.evaluate(operand)
+        return result
+
+    def search(self, expression='', oj=None, remote_id=None, visible_only=True):
+
+        '''
+            problems matching the tag expression and the filters
+        :param expression: tag expression, '' for all problems
+        :param oj: oj name or None
+        :param remote_id: remote id or None
+        :param visible_only: only the visible problems
+        :return: bitmap
+        '''
+
+        result = self.match(expression) if expression.strip() else self.all
+        if oj is not None:
+            result &= self.ojs.get(oj, 0)
+        if remote_id is not None:
+            result &= sum(1 << problem_id for problem_id in self.remote_ids.get(remote_id, []))
+        if visible_only:
+            result &= self.visible
+        return result
+
+
+def parse_expression(expression):
+
+    '''
+        parse a tag expression: & for and, | for or, ! for not, parentheses,
+        names with operators in double quotes, e.g. 'dp & (graph | "a|b") & !greedy',
+        at most MAX_LENGTH characters and MAX_DEPTH levels of nesting
+    :param expression: tag expression
+    :return: tree of ('tag', name), ('!', tree), ('&', tree, tree, ...) and ('|', tree, tree, ...)
+    '''
+
+    expression = expression.strip()
+    if len(expression) > MAX_LENGTH:
+        raise ValueError(u'expression longer than %d characters' % MAX_LENGTH)
+    tokens = []
+    position = 0
+    while position < len(expression):
+        token = TOKEN.match(expression, position)
+        if token is None:
+            raise ValueError(u'unclosed quote')
+        position = token.end()
+        if token.group(1):
+            tokens.append(token.group(1))
+        else:
+            tokens.append(('tag', (token.group(2) if token.group(2) is not None else token.group(3)).strip()))
+    tokens.append(None)
+    # position of the next token
+    state = [0]
+
+    def peek():
+        return tokens[state[0]]
+
+    def take(token):
+        if peek() == token:
+            state[0] += 1
+            return True
+        return False
+
+    def fail():
+        token = peek()
+        raise ValueError(u'unexpected %s' % (u'end' if token is None else token[1] if isinstance(token, tuple) else token))
+
+    def parse_or(depth):
+        # a chain of the same operator is one node, so only nesting makes the tree deep
+        trees = [parse_and(depth)]
+        while take('|'):
+            trees.append(parse_and(depth))
+        return trees[0] if len(trees) == 1 else ('|', ) + tuple(trees)
+
+    def parse_and(depth):
+        trees = [parse_not(depth)]
+        while take('&'):
+            trees.append(parse_not(depth))
+        return trees[0] if len(trees) == 1 else ('&', ) + tuple(trees)
+
+    def parse_not(depth):
+        if depth > MAX_DEPTH:
+            raise ValueError(u'nested deeper than %d levels' % MAX_DEPTH)
+        if take('!'):
+            return ('!', parse_not(depth + 1))
+        if take('('):
+            tree = parse_or(depth + 1)
+            if not take(')'):
+                fail()
+            return tree
+        if isinstance(peek(), tuple):
+            state[0] += 1
+            return tokens[state[0] - 1]
+        fail()
+
+    tree = parse_or(0)
+    if peek() is not None:
+        fail()
+    return tree
+
+
+# own version, statement edits do not rebuild it
+tag_index = VersionedCache('problem_tags', TagIndex.load)
+
+
+def invalidate_tag_index():
+
+    '''
+        drop the tag index in all workers after tags, problem tags, ojs or the indexed fields of problems
+        (oj, remote id, visible) changed, or problems were added, call it after the commit
+    :return: None
+    '''
+
+    tag_index.invalidate()
+
+
+def get_tag_index():
+
+    '''
+        tag index of this worker
+    :return: TagIndex obj
+    '''
+
+    return tag_index.get(None)
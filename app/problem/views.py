@@ -5,11 +5,14 @@ from flask import render_template, redirect, request, url_for, flash, abort, cur
 from flask_login import login_required, current_user
 from . import problem
 from .. import db
-from ..models import SubmissionStatus, Problem, TagProblem, Tag, OJList
+from ..models import SubmissionStatus, Problem, JudgeQueue, Statistic
 from datetime import datetime
 from .forms import SubmitForm
-from sqlalchemy.sql import or_, func
-import base64
+from ..cache import get_problem_meta
+from .fragments import get_body
+from .listing import paginate_problems, paginate_problem_ids, paginate_ranked_ids
+from .tag_index import get_tag_index
+from .search import search_problems
 
 
 @problem.route('/', methods=['GET', 'POST'])
@@ -19,11 +22,10 @@ def problem_list():
         show problem list operation
     :return: page
     '''
-    page = request.args.get('page', 1, type=int)
     if current_user.is_admin():
-        pagination = Problem.query.order_by(Problem.id.asc()).paginate(page, per_page=current_app.config['FLASKY_PROBLEMS_PER_PAGE'])
+        pagination = paginate_problems(Problem.query, count_key='problem')
     else:
-        pagination = Problem.query.filter_by(visible=True).order_by(Problem.id.asc()).paginate(page, per_page=current_app.config['FLASKY_PROBLEMS_PER_PAGE'])
+        pagination = paginate_problems(Problem.query.filter_by(visible=True), count_key='problem_visible')
     problems = pagination.items
     return render_template('problem/problem_list.html', problems=problems, pagination=pagination)
 
@@ -32,35 +34,39 @@ def problem_list():
 def problem_list_filter():
 
     '''
-        show problem list operation
+        show problem list operation, filtered by a tag expression (& and, | or, ! not, parentheses), oj and remote id
     :return: page
     '''
-    page = request.args.get('page', 1, type=int)
-    search_key = request.args.get('key', '', type=str)
-    oj = request.args.get('oj', '', type=str)
-    remote_id=request.args.get('remote_id', -1, type=int)
-    problems_pagination = Problem.query
-    if remote_id != -1:
-        problems_pagination = problems_pagination.filter(Problem.remote_id == remote_id)
-    if oj != '':
-        oj_detail = OJList.query.filter_by(name=oj).first()
-        if oj_detail is not None:
-            oj_id = oj_detail.id
-            problems_pagination = problems_pagination.filter(Problem.oj_id == oj_id)
-        else:
-            problems_pagination = problems_pagination.filter(Problem.oj_id == -100)
-    if search_key != '':
-        search_key = search_key.strip()
-        search_list = search_key.split('|')
-        if len(search_list) == 1:
-            problems_pagination = problems_pagination.join(TagProblem, TagProblem.problem_id == Problem.id).join(Tag, Tag.id == TagProblem.tag_id).filter(Tag.tag_name == search_list[0]).group_by(TagProblem.problem_id).having(func.count() == 1)
-        else:
-            problems_pagination = problems_pagination.join(TagProblem, TagProblem.problem_id==Problem.id).join(Tag, Tag.id==TagProblem.tag_id).filter(or_(Tag.tag_name==search_list[0],Tag.tag_name==search_list[1])).group_by(TagProblem.problem_id).having(func.count() == 2)
-        if not current_user.is_admin():
-            problems_pagination = problems_pagination.filter(Problem.visible == True)
-    pagination = problems_pagination.paginate(page, per_page=current_app.config['FLASKY_PROBLEMS_PER_PAGE'])
+    search_key = request.args.get('key', u'')
+    oj = request.args.get('oj', u'')
+    remote_id = request.args.get('remote_id', -1, type=int)
+    try:
+        problems = get_tag_index().search(search_key, oj=oj or None, remote_id=remote_id if remote_id != -1 else None,
+                                          visible_only=not current_user.is_admin())
+    except ValueError as e:
+        flash(u'标签表达式错误: %s' % e)
+        problems = 0
+    pagination = paginate_problem_ids(problems)
     problems = pagination.items
-    return render_template('problem/problem_list.html', problems=problems, pagination=pagination)
+    filters = dict((name, value) for name, value in (('key', search_key), ('oj', oj), ('remote_id', remote_id if remote_id != -1 else None)) if value)
+    return render_template('problem/problem_list.html', problems=problems, pagination=pagination, endpoint='problem.problem_list_filter', filters=filters)
+
+
+@problem.route('/search', methods=['GET'])
+def problem_search():
+
+    '''
+        show problem list operation, the problems having all the words of q in the title, description, source or author,
+        best first
+    :return: page
+    '''
+
+    query = request.args.get('q', u'')
+    problems = search_problems(query, visible_only=not current_user.is_admin())
+    pagination = paginate_ranked_ids(problems)
+    problems = pagination.items
+    return render_template('problem/problem_list.html', problems=problems, pagination=pagination, endpoint='problem.problem_search',
+                           filters={'q': query}, ranked=True, query=query)
 
 
 @problem.route('/<int:problem_id>', methods=['GET', 'POST'])
@@ -72,10 +78,12 @@ def problem_detail(problem_id):
     :return: page
     '''
 
-    problem = Problem.query.get_or_404(problem_id)
-    if problem.visible is False and (not current_user.is_admin()):
+    problem = get_problem_meta(problem_id)
+    if problem is None or (problem['visible'] is False and not current_user.is_admin()):
         abort(404)
-    return render_template('problem/problem.html', problem=problem)
+    counts = db.session.query(Problem.submission_num, Problem.accept_num).filter_by(id=problem_id).first_or_404()
+    body = get_body(problem_id, problem['body_version'], 'problem')
+    return render_template('problem/problem.html', problem=problem, counts=counts, body=body)
 
 
 @problem.route('/submit/<int:problem_id>', methods=['GET', 'POST'])
@@ -91,8 +99,8 @@ def submit(problem_id):
     submission = SubmissionStatus()
     form = SubmitForm()
     if form.validate_on_submit():
-        problem = Problem.query.with_lockmode('update').get(form.problem_id.data)
-        if problem is None or (problem.visible == False and not current_user.is_admin()):
+        problem = get_problem_meta(form.problem_id.data)
+        if problem is None or (problem['visible'] == False and not current_user.is_admin()):
             flash("No such problem!")
             return render_template('problem/submit.html', form=form)
         submission.submit_time = datetime.utcnow()
@@ -102,13 +110,14 @@ def submit(problem_id):
         submission.exec_memory = 0
         submission.language = form.language.data
         submission.code_length = len(form.code.data)
-        submission.code = base64.b64encode(form.code.data.encode('utf-8'))
+        submission.code = form.code.data
         submission.author_username = current_user.username
         submission.visible = True
         submission.submit_ip = request.headers.get('X-Real-IP')
-        problem.submission_num += 1
-        db.session.add(problem)
         db.session.add(submission)
+        JudgeQueue.enqueue(submission)
+        # Problem.submission_num is counted by the beat, the problem row is not locked here
+        Statistic.record([(submission.author_username, problem['id'], None, submission.status)])
         db.session.commit()
         return redirect(url_for('status.status_list'))
     form.problem_id.data = problem_id
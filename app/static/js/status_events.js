@@ -0,0 +1,22 @@
+// update the rows of the status list with the verdicts pushed by the server
+function follow_status(url) {
+    if (!window.EventSource) {
+        return;
+    }
+    var source = new EventSource(url);
+    source.onmessage = function (e) {
+        var event = JSON.parse(e.data);
+        var row = $('tr[data-run-id=' + event.submission_id + ']');
+        if (row.length == 0) {
+            return;
+        }
+        var waiting = event.status == 0 || event.status == 10;
+        row.find('.status').text(event.status_name);
+        row.find('.exec-time').text(waiting ? '-' : event.exec_time + 'ms');
+        row.find('.exec-memory').text(waiting ? '-' : event.exec_memory + 'k');
+    };
+    source.addEventListener('reload', function () {
+        source.close();
+        window.location.reload();
+    });
+}
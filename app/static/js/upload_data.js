@@ -0,0 +1,59 @@
+// send the files in chunks, an upload broken by the network or a reload goes on from the bytes the server has
+function upload_id(file) {
+    var key = file.name + '|' + file.size + '|' + file.lastModified;
+    var hash = 5381;
+    for (var i = 0; i < key.length; i++) {
+        hash = ((hash << 5) + hash + key.charCodeAt(i)) | 0;
+    }
+    return (hash >>> 0).toString(16) + '-' + file.size;
+}
+
+function upload_file(url, file, chunk_size, row) {
+    var chunk_url = url + '/chunk/' + upload_id(file);
+    var retries = 0;
+
+    function send(offset) {
+        row.find('.progress-text').text(Math.floor(offset * 100 / Math.max(file.size, 1)) + '%');
+        $.ajax({
+            url: chunk_url + '?' + $.param({offset: offset, total: file.size, name: file.name}),
+            type: 'POST',
+            data: file.slice(offset, offset + chunk_size),
+            processData: false,
+            contentType: 'application/octet-stream',
+            dataType: 'json'
+        }).done(function (data) {
+            retries = 0;
+            if (data.files) {
+                row.find('.progress-text').text($.map(data.files, function (f) { return f.name + ': ' + f.result; }).join(', '));
+            } else {
+                send(data.offset);
+            }
+        }).fail(function (xhr) {
+            if (xhr.status == 409) {
+                send(xhr.responseJSON.offset);
+            } else if (xhr.status != 400 && retries++ < 5) {
+                setTimeout(resume, 1000 * retries);
+            } else {
+                row.find('.progress-text').text(xhr.responseJSON ? xhr.responseJSON.message : 'failed');
+            }
+        });
+    }
+
+    function resume() {
+        $.getJSON(chunk_url, function (data) { send(data.offset); }).fail(function () {
+            setTimeout(resume, 1000 * Math.min(++retries, 30));
+        });
+    }
+
+    resume();
+}
+
+function upload_files(input, url, chunk_size) {
+    $.each(input.files, function (i, file) {
+        var row = $('<tr><td></td><td class="progress-text"></td></tr>');
+        row.find('td:first').text(file.name);
+        $('#upload_progress').append(row);
+        upload_file(url, file, chunk_size, row);
+    });
+    input.value = '';
+}
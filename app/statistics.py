@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+from datetime import datetime, timedelta
+from . import db, flask_celery
+from .models import Statistic, SubmissionStatus, Problem, KeyValue
+
+# id of the last submission added to Problem.submission_num
+COUNTED_KEY = 'problem_submission_counted'
+# submissions read at a time
+COUNT_BATCH = 1000
+
+
+@flask_celery.task(
+    bind=True,
+    ignore_result=True
+)
+def reconcile_statistics(self):
+
+    '''
+        rebuild the verdict histograms from submission_status,
+        fix the drift from lost updates or submissions removed with their users
+    :return: None
+    '''
+
+    Statistic.reconcile()
+
+
+def count_problem_submissions():
+
+    '''
+        add the submissions made since the last run to Problem.submission_num, so the submit path never locks the problem row,
+        a submission younger than SUBMISSION_COUNT_GRACE seconds waits for the next run since a submission before it
+        may not be committed yet, contest submissions are not counted
+    :return: number of the submissions read
+    '''
+
+    if KeyValue.query.get(COUNTED_KEY) is None:
+        KeyValue.put(COUNTED_KEY, '0')
+    # the lock keeps two runs from counting the same submissions
+    mark = KeyValue.query.filter_by(key=COUNTED_KEY).with_for_update().first()
+    last_id = int(mark.value or 0)
+    settled = datetime.utcnow() - timedelta(seconds=current_app.config['SUBMISSION_COUNT_GRACE'])
+    counts = {}
+    read = 0
+    done = False
+    while not done:
+        rows = db.session.query(SubmissionStatus.id, SubmissionStatus.problem_id, SubmissionStatus.contest_id, SubmissionStatus.submit_time).filter(
+            SubmissionStatus.id > last_id).order_by(SubmissionStatus.id.asc()).limit(COUNT_BATCH).all()
+        done = len(rows) < COUNT_BATCH
+        for submission_id, problem_id, contest_id, submit_time in rows:
+            if submit_time is not None and submit_time > settled:
+                done = True
+                break
+            if problem_id is not None and not contest_id:
+                counts[problem_id] = counts.get(problem_id, 0) + 1
+            last_id = submission_id
+            read += 1
+    # same order in all runs
+    for problem_id in sorted(counts.keys()):
+        Problem.query.filter_by(id=problem_id).update({Problem.submission_num: db.func.coalesce(Problem.submission_num, 0) + counts[problem_id]},
+                                                      synchronize_session=False)
+    mark.value = str(last_id)
+    db.session.add(mark)
+    db.session.commit()
+    return read
+
+
+@flask_celery.task(
+    bind=True,
+    ignore_result=True
+)
+def count_submissions(self):
+
+    '''
+        add the new submissions to the problem counters, run by the beat
+    :return: None
+    '''
+
+    count_problem_submissions()
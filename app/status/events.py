@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import current_app, request, Response, stream_with_context
+from datetime import datetime, timedelta
+from collections import deque
+from .. import db, flask_celery
+from ..models import StatusEvent
+import json, time
+
+
+def _feed():
+
+    '''
+        recent events read by this worker, shared by all the streams of the worker
+    :return: dict
+    '''
+
+    feed = current_app.extensions.get('status_feed')
+    if feed is None:
+        # events after 'since' are all in 'events'
+        feed = current_app.extensions['status_feed'] = {'checked': 0, 'last_id': None, 'since': None, 'events': deque()}
+    return feed
+
+
+def poll():
+
+    '''
+        read the new events, the table is read at most once every STATUS_PUSH_INTERVAL seconds
+        however many streams are open, an event is published only when all the ids before it are,
+        a missing id is waited for STATUS_PUSH_GRACE seconds since its insert may not be committed yet
+    :return: feed
+    '''
+
+    feed = _feed()
+    now = time.time()
+    if feed['checked'] + current_app.config['STATUS_PUSH_INTERVAL'] > now:
+        return feed
+    feed['checked'] = now
+    size = current_app.config['STATUS_PUSH_BUFFER']
+    if feed['last_id'] is None:
+        # start with the latest events, so streams moving to a new worker go on without a reload
+        events = StatusEvent.query.order_by(StatusEvent.id.desc()).limit(size).all()[::-1]
+        feed['last_id'] = events[0].id - 1 if events else 0
+        feed['since'] = feed['last_id'] if len(events) == size else 0
+    else:
+        # the events held back by a gap last time are read again
+        events = StatusEvent.query.filter(StatusEvent.id > feed['last_id']).order_by(StatusEvent.id.asc()).limit(size).all()
+    settled = datetime.utcnow() - timedelta(seconds=current_app.config['STATUS_PUSH_GRACE'])
+    names = dict((code, name) for name, code in current_app.config['LOCAL_SUBMISSION_STATUS'].items())
+    for event in events:
+        if event.id != feed['last_id'] + 1 and event.created > settled:
+            # an event before it may still be committed
+            break
+        feed['last_id'] = event.id
+        event = event.to_json()
+        event['status_name'] = names.get(event['status'])
+        feed['events'].append(event)
+    while len(feed['events']) > size:
+        feed['since'] = feed['events'].popleft()['id']
+    return feed
+
+
+def latest_event_id():
+
+    '''
+        id of the last event seen by this worker, read it before the page loads the submissions
+        and pass it to the stream so no change is missed
+    :return: event id
+    '''
+
+    return poll()['last_id']
+
+
+def stream_events(match):
+
+    '''
+        stream the events after the Last-Event-ID header of a reconnection or the after param of the page
+        as server-sent events until STATUS_PUSH_TIMEOUT, the browser reconnects then
+    :param match: function telling if an event is for this stream
+    :return: response
+    '''
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('after'))
+    except (TypeError, ValueError):
+        last_id = None
+
+    def generate(last_id):
+        deadline = time.time() + current_app.config['STATUS_PUSH_TIMEOUT']
+        sent = time.time()
+        yield 'retry: %d\n\n' % (current_app.config['STATUS_PUSH_INTERVAL'] * 1000)
+        while True:
+            feed = poll()
+            # the stream holds no connection while it waits
+            db.session.close()
+            if last_id is None or last_id < feed['since']:
+                # too old for the buffer, the page has to be reloaded
+                if last_id is not None:
+                    yield 'event: reload\ndata: {}\n\n'
+                    return
+                last_id = feed['last_id']
+            for event in list(feed['events']):
+                if event['id'] > last_id:
+                    last_id = event['id']
+                    if match(event):
+                        yield 'id: %d\ndata: %s\n\n' % (event['id'], json.dumps(event))
+                        sent = time.time()
+            if time.time() >= deadline:
+                # tell the browser where to continue
+                yield 'id: %d\n: bye\n\n' % last_id
+                return
+            if time.time() - sent >= current_app.config['STATUS_PUSH_HEARTBEAT']:
+                yield ': keepalive\n\n'
+                sent = time.time()
+            # a gevent worker switches to other connections here
+            time.sleep(current_app.config['STATUS_PUSH_INTERVAL'])
+
+    return Response(stream_with_context(generate(last_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@flask_celery.task(
+    bind=True,
+    ignore_result=True
+)
+def prune_status_events(self):
+
+    '''
+        delete the events older than STATUS_EVENT_KEEP seconds
+    :return: None
+    '''
+
+    StatusEvent.query.filter(StatusEvent.created < datetime.utcnow() - timedelta(seconds=current_app.config['STATUS_EVENT_KEEP'])).delete(
+        synchronize_session=False)
+    db.session.commit()
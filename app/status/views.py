@@ -7,8 +7,9 @@ from . import status
 from .. import db
 from ..models import SubmissionStatus, CompileInfo
 from ..decorators import admin_required, permission_required
+from ..pagination import keyset_paginate
+from .events import latest_event_id, stream_events
 from datetime import datetime
-import base64
 
 
 @status.route('/', methods=['GET', 'POST'])
@@ -19,11 +20,11 @@ def status_list():
     :return: page
     '''
 
-    page = request.args.get('page', 1, type=int)
+    event_id = latest_event_id() if current_user.is_authenticated else None
     if current_user.is_admin():
-        pagination = SubmissionStatus.query.order_by(SubmissionStatus.id.desc()).paginate(page,per_page=current_app.config['FLASKY_STATUS_PER_PAGE'])
+        pagination = keyset_paginate(SubmissionStatus.query, SubmissionStatus.id, current_app.config['FLASKY_STATUS_PER_PAGE'], count_key='status')
     else:
-        pagination = SubmissionStatus.query.filter_by(visible=True).order_by(SubmissionStatus.id.desc()).paginate(page, per_page=current_app.config['FLASKY_STATUS_PER_PAGE'])
+        pagination = keyset_paginate(SubmissionStatus.query.filter_by(visible=True), SubmissionStatus.id, current_app.config['FLASKY_STATUS_PER_PAGE'], count_key='status_visible')
     status = pagination.items
     status_list = {}
     language = {}
@@ -31,7 +32,20 @@ def status_list():
         status_list[current_app.config['LOCAL_SUBMISSION_STATUS'][k]]=k
     for k in current_app.config['LOCAL_LANGUAGE'].keys():
         language[current_app.config['LOCAL_LANGUAGE'][k]]=k
-    return render_template('status/status_list.html', status_list=status_list, language=language, status=status, pagination=pagination)
+    return render_template('status/status_list.html', status_list=status_list, language=language, status=status, pagination=pagination, event_id=event_id)
+
+
+@status.route('/events')
+@login_required
+def status_events():
+
+    '''
+        define operations about pushing the status changes of the submissions of current user
+    :return: event stream
+    '''
+
+    username = current_user.username
+    return stream_events(lambda event: event['author_username'] == username)
 
 
 @status.route('/<int:run_id>', methods =['GET', 'POST'])
@@ -49,7 +63,7 @@ def status_detail(run_id):
         return abort(404)
     if current_user.username != status_detail.author_username and (not current_user.is_admin()):
         return abort(403)
-    code = base64.b64decode(status_detail.code).decode('utf-8')
+    code = status_detail.code
     ce_info = CompileInfo.query.filter_by(submission_id=run_id).first()
     status_list = {}
     language = {}
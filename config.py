@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import os
+import os, socket
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config():
@@ -36,7 +36,94 @@ class Config():
     FLASKY_OJS_PER_PAGE = 50
     FLASKY_LOGS_PER_PAGE = 50
     FLASKY_BLOGS_PER_PAGE = 50
+    # seconds the total counts of listings are cached
+    PAGINATION_COUNT_TTL = 60
+    PAGINATION_COUNT_MAX_KEYS = 1000
     UPLOADED_PATH = './data/'
+    # test data uploads, sent by the page in chunks of UPLOAD_CHUNK_SIZE bytes,
+    # unfinished uploads are deleted after UPLOAD_KEEP seconds
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+    UPLOAD_KEEP = 24 * 3600
+    # seconds between two ranklist snapshots
+    RANKLIST_REFRESH_INTERVAL = 10
+    # seconds between two forced snapshots, asked by admin edits and by the pages while no snapshot exists
+    RANKLIST_RETRY_INTERVAL = 2
+    # contest submissions younger than this (seconds) are read again by the ranklist engines, a submission
+    # committed after one with a bigger id is applied as long as it commits within this time
+    RANKLIST_SUBMIT_GRACE = 30
+    # seconds the admin dashboard counters are cached
+    ADMIN_METRICS_TTL = 10
+    # versions of the per-worker caches: 'database' shares invalidations between all processes,
+    # 'memory' is for a single process, or an import path of a backend class
+    CACHE_VERSION_BACKEND = 'database'
+    # seconds between two version checks of a cache
+    CACHE_VERSION_CHECK_INTERVAL = 1
+    CACHE_MAX_KEYS = 10000
+    # keys changed one by one are read back from CACHE_CHANGE_GRACE seconds before the last check, since slow
+    # transactions commit late, and kept CACHE_CHANGE_KEEP seconds, a worker idle for longer drops all its values
+    CACHE_CHANGE_GRACE = 10
+    CACHE_CHANGE_KEEP = 3600
+    # seconds a worker keeps the user and role of a session
+    USER_CACHE_TTL = 60
+    # seconds a worker trusts verified api credentials, tokens are also dropped when they expire
+    API_AUTH_CACHE_TTL = 300
+    # rendered problem bodies kept by a worker, pre-warmed for contests starting in PROBLEM_PREWARM_AHEAD seconds
+    PROBLEM_FRAGMENT_MAX_KEYS = 2000
+    PROBLEM_PREWARM_AHEAD = 300
+    # contest user import, users per transaction and threads hashing passwords
+    CONTEST_IMPORT_CHUNK = 200
+    CONTEST_IMPORT_WORKERS = 4
+    # presence, last_seen of a user is written at most once every PRESENCE_WRITE_INTERVAL seconds,
+    # in batches of PRESENCE_BATCH_SIZE users or PRESENCE_BATCH_DELAY seconds
+    PRESENCE_WRITE_INTERVAL = 30
+    PRESENCE_BATCH_DELAY = 5
+    PRESENCE_BATCH_SIZE = 200
+    PRESENCE_MAX_USERS = 100000
+    # write the batches of quiet workers by a timer, and the last batch at exit
+    PRESENCE_BACKGROUND_FLUSH = True
+    # users seen in this many seconds are online, keep it over PRESENCE_WRITE_INTERVAL + PRESENCE_BATCH_DELAY
+    PRESENCE_ONLINE_WINDOW = 60
+    # identicon avatars, rendered on first view into AVATAR_DIR, the image is (3 * AVATAR_PATCH_SIZE) px
+    AVATAR_DIR = os.path.join(basedir, 'app', 'static', 'photo')
+    AVATAR_PATCH_SIZE = 128
+    AVATAR_CACHE_SIZE = 256
+    AVATAR_MAX_AGE = 30 * 24 * 3600
+    # status pushed to the status pages, every worker reads the new events once every STATUS_PUSH_INTERVAL seconds
+    # and keeps the last STATUS_PUSH_BUFFER of them, a stream is closed after STATUS_PUSH_TIMEOUT seconds and reconnected,
+    # the events after a missing id are held back until it shows up or STATUS_PUSH_GRACE seconds passed
+    STATUS_PUSH_INTERVAL = 1
+    STATUS_PUSH_BUFFER = 1000
+    STATUS_PUSH_GRACE = 10
+    STATUS_PUSH_TIMEOUT = 55
+    STATUS_PUSH_HEARTBEAT = 15
+    STATUS_EVENT_KEEP = 600
+    # problem search, every worker reads the index from SEARCH_INDEX_PATH (written by the beat, or by a task requested
+    # at most once every SEARCH_BUILD_RETRY seconds while missing, words are matched by LIKE meanwhile) and applies
+    # the problem changes once every SEARCH_CHECK_INTERVAL seconds, the changes after a missing id are held back
+    # until it shows up or SEARCH_CHANGE_GRACE seconds passed; the beat deletes the changes in its file, so with
+    # SEARCH_INDEX_PATH on local disks every other host writes its own file again after each beat run, through the
+    # celery worker of the host listening on SEARCH_BUILD_QUEUE (start.sh), shared storage avoids these rebuilds
+    SEARCH_INDEX_PATH = os.path.join(basedir, 'data', 'search_index.marshal')
+    SEARCH_CHECK_INTERVAL = 1
+    SEARCH_CHANGE_BATCH = 1000
+    SEARCH_CHANGE_GRACE = 10
+    SEARCH_BUILD_RETRY = 300
+    SEARCH_BUILD_QUEUE = 'search.' + socket.gethostname()
+    # problems written per transaction by the problem import api
+    PROBLEM_IMPORT_CHUNK = 500
+    # Problem.submission_num is counted by the beat, submissions younger than this (seconds) wait for the next run
+    SUBMISSION_COUNT_GRACE = 30
+    # source code of submissions longer than this is stored with zlib
+    SOURCE_CODE_COMPRESS_MIN = 256
+    # judge queue, seconds a judger holds a submission before it is given to others
+    JUDGE_LEASE_TIMEOUT = 300
+    JUDGE_MAX_ATTEMPTS = 3
+    JUDGE_CLAIM_RETRY = 5
+    JUDGE_BATCH_MAX = 32
+    JUDGE_VERDICT_BATCH_MAX = 500
+    # long poll of judgers, in seconds
+    JUDGE_MAX_WAIT = 30
+    JUDGE_POLL_INTERVAL = 1
 
     # celery_settings
     '''
@@ -50,6 +137,37 @@ class Config():
     CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
     CELERY_RESULT_BACKEND = os.environ.get('CELERY_BACKEND_URL')
     CELERY_ALWAYS_EAGER = False
+    # periodic tasks, run by a single beat process (started by start.sh, CELERY_BEAT=0 on every extra host)
+    CELERYBEAT_SCHEDULE = {
+        'reconcile-statistics': {
+            'task': 'app.statistics.reconcile_statistics',
+            'schedule': 3600
+        },
+        'count-submissions': {
+            'task': 'app.statistics.count_submissions',
+            'schedule': 60
+        },
+        'prewarm-contest-problems': {
+            'task': 'app.problem.fragments.prewarm_contest_problems',
+            'schedule': 60
+        },
+        'prune-cache-changes': {
+            'task': 'app.cache.prune_cache_changes',
+            'schedule': 600
+        },
+        'prune-status-events': {
+            'task': 'app.status.events.prune_status_events',
+            'schedule': 300
+        },
+        'build-search-index': {
+            'task': 'app.problem.search.build_search_index',
+            'schedule': 3600
+        },
+        'prune-uploads': {
+            'task': 'app.admin.problem_data.prune_uploads',
+            'schedule': 3600
+        }
+    }
 
     #sqlalchemy settings
     if os.environ.get('MYSQL_ADDR'):
@@ -126,6 +244,11 @@ class TestConfig(Config):
     TESTING = True
     Debug = True
     WTF_CSRF_ENABLED = False
+    CELERY_ALWAYS_EAGER = True
+    # indexes are kept in memory only
+    SEARCH_INDEX_PATH = None
+    # the tests flush last_seen themselves, timers would outlive the test database
+    PRESENCE_BACKGROUND_FLUSH = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or \
                               'sqlite:///' + os.path.join(basedir, 'data-test.sqlite')
 
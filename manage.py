@@ -30,6 +30,35 @@ def make_shell_context():
 manager.add_command('shell', Shell(make_context=make_shell_context))
 manager.add_command('db', MigrateCommand)
 
+@manager.command
+def enqueue_waiting():
+
+    '''
+        put the waiting and judging submissions without queue item into the judge queue
+    :return: None
+    '''
+
+    from app.models import SubmissionStatus, JudgeQueue
+    queued = db.session.query(JudgeQueue.submission_id)
+    status = [app.config['LOCAL_SUBMISSION_STATUS']['Waiting'], app.config['LOCAL_SUBMISSION_STATUS']['Judging']]
+    count = 0
+    for submission in SubmissionStatus.query.filter(SubmissionStatus.status.in_(status), ~SubmissionStatus.id.in_(queued)):
+        JudgeQueue.enqueue(submission)
+        count += 1
+    db.session.commit()
+    print('%d submissions enqueued' % count)
+
+@manager.command
+def reconcile_statistics():
+
+    '''
+        rebuild the verdict histograms of users and problems from the submissions
+    :return: None
+    '''
+
+    from app.models import Statistic
+    print('%d buckets' % Statistic.reconcile())
+
 @manager.command
 def test(coverage=False):
 
@@ -61,6 +90,228 @@ def test(coverage=False):
     return len(result.failures) or len(result.errors)
 
 
+@manager.command
+def render_avatars():
+
+    '''
+        render the avatars not rendered yet, run it offline to warm AVATAR_DIR
+    :return: None
+    '''
+
+    from app.avatar import render_missing_avatars
+    print('%d avatars rendered' % render_missing_avatars())
+
+
+@manager.command
+def bench_identicon(num=500, size=128):
+
+    '''
+        compare the identicon renderers
+    :param num: number of the identicons
+    :param size: patch size
+    :return: None
+    '''
+
+    import random, time
+    from io import BytesIO
+    from app import identicon
+    num, size = int(num), int(size)
+    codes = [random.randint(1, 1000000000000) for i in range(num)]
+    identicon.render_identicons(codes[:1], size)
+    png = lambda images: [image.save(BytesIO(), 'PNG') for image in images]
+    for name, render in (('render_identicon', lambda: [identicon.render_identicon(code, size) for code in codes]),
+                         ('render_identicons', lambda: identicon.render_identicons(codes, size)),
+                         ('render_identicons raw', lambda: identicon.render_identicons(codes, size, raw=True)),
+                         ('render_identicon png', lambda: png(identicon.render_identicon(code, size) for code in codes)),
+                         ('render_identicons png', lambda: png(identicon.render_identicons(codes, size)))):
+        start = time.time()
+        render()
+        cost = time.time() - start
+        print('%-24s %8.1f icons/s' % (name, num / cost))
+
+
+@manager.command
+def bench_api(num=50):
+
+    '''
+        compare the api calls of a judger with and without the credential cache, on a scratch testing database
+    :param num: number of the calls
+    :return: None
+    '''
+
+    import json, time
+    from base64 import b64encode
+    from app.cache import invalidate_session_users
+    num = int(num)
+    bench_app = create_app('testing')
+    with bench_app.app_context():
+        db.create_all()
+        try:
+            Role.insert_roles()
+            db.session.add(User(username='bench', email='bench@bench.com', password='bench', confirmed=True,
+                                role=Role.query.filter_by(name='Local Judger').first()))
+            db.session.commit()
+            user_id = User.query.filter_by(username='bench').first().id
+            client = bench_app.test_client()
+            headers = lambda username, password: {'Authorization': 'Basic ' + b64encode(username + ':' + password)}
+            token = json.loads(client.get('/api/v1.0/token', headers=headers('bench', 'bench')).data)['token']
+            for ttl in (0, bench_app.config['API_AUTH_CACHE_TTL']):
+                bench_app.config['API_AUTH_CACHE_TTL'] = ttl
+                for name, username, password in (('password', 'bench', 'bench'), ('token', token, '')):
+                    invalidate_session_users([user_id], password=True)
+                    client.get('/api/v1.0/metrics', headers=headers(username, password))
+                    start = time.time()
+                    for i in range(num):
+                        assert client.get('/api/v1.0/metrics', headers=headers(username, password)).status_code == 200
+                    cost = time.time() - start
+                    print('%-8s cache ttl %4ds %8.1f calls/s' % (name, ttl, num / cost))
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+@manager.command
+def bench_problem_import(num=1000):
+
+    '''
+        compare update_problem called per problem with the problem import api, on a scratch testing database
+    :param num: number of the problems
+    :return: None
+    '''
+
+    import json, time
+    from base64 import b64encode
+    from app.models import OJList
+    num = int(num)
+    bench_app = create_app('testing')
+    with bench_app.app_context():
+        db.create_all()
+        try:
+            Role.insert_roles()
+            db.session.add(User(username='bench', email='bench@bench.com', password='bench', confirmed=True,
+                                role=Role.query.filter_by(name='Remote Judger').first()))
+            db.session.add(OJList(name='bench', vjudge=True))
+            db.session.commit()
+            client = bench_app.test_client()
+            headers = {'Authorization': 'Basic ' + b64encode('bench:bench'), 'Content-Type': 'application/json'}
+            problems = [{'oj_id': 1, 'remote_id': 1000 + i, 'title': 'problem %d' % i, 'description': 'description ' * 200}
+                        for i in range(num)]
+            # the first round inserts, the second updates
+            for name in ('insert', 'update'):
+                start = time.time()
+                for problem in problems:
+                    assert client.post('/api/v1.0/problem/update/1/%d/' % problem['remote_id'], headers=headers,
+                                       data=json.dumps(problem)).status_code == 201
+                cost = time.time() - start
+                print('%-8s update_problem  %8.1f problems/s' % (name, num / cost))
+            for problem in problems:
+                problem['remote_id'] += num
+            for name in ('insert', 'update'):
+                start = time.time()
+                assert client.post('/api/v1.0/problem/import/1/', headers=dict(headers, **{'Content-Type': 'application/x-ndjson'}),
+                                   data='\n'.join(json.dumps(problem) for problem in problems)).status_code == 200
+                cost = time.time() - start
+                print('%-8s import_problems %8.1f problems/s' % (name, num / cost))
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+@manager.command
+def build_search_index():
+
+    '''
+        write the problem search index file, the beat does it every hour
+    :return: None
+    '''
+
+    from app.problem.search import write_search_index
+    index = write_search_index()
+    print('%d problems indexed' % len(index.docs) if index is not None else 'SEARCH_INDEX_PATH is not set')
+
+
+@manager.command
+def build_manifests():
+
+    '''
+        write the test data manifests of all the problems, for data put in UPLOADED_PATH by hand
+    :return: None
+    '''
+
+    from app.admin.problem_data import rebuild_manifest
+    root = app.config['UPLOADED_PATH']
+    for name in sorted(os.listdir(root) if os.path.isdir(root) else [], key=lambda name: (len(name), name)):
+        if name.isdigit():
+            manifest = rebuild_manifest(int(name))
+            print('problem %s: %d files, version %d' % (name, len(manifest['files']), manifest['version']))
+
+
+@manager.command
+def bench_search(num=5000, queries=200):
+
+    '''
+        compare the problem search index with LIKE scans, on a scratch testing database
+    :param num: number of the problems
+    :param queries: number of the queries
+    :return: None
+    '''
+
+    import random, tempfile, time
+    from app.models import Problem
+    from app.problem.search import SearchIndex
+    num, queries = int(num), int(queries)
+    # common characters of the statements
+    chars = u''.join(unichr(0x4e00 + i) for i in range(0, 3000, 7))
+    words = [u''.join(random.choice(chars) for j in range(random.randint(2, 4))) for i in range(2000)]
+    text = lambda count: u' '.join(random.choice(words) for i in range(count))
+    bench_app = create_app('testing')
+    with bench_app.app_context():
+        db.create_all()
+        try:
+            db.session.execute(Problem.__table__.insert(), [{'title': text(3), 'description': text(150), 'source_name': text(1),
+                                                             'author': text(1), 'visible': True} for i in range(num)])
+            db.session.commit()
+            start = time.time()
+            index = SearchIndex.build()
+            print('%-12s %8.1f ms' % ('build', (time.time() - start) * 1000))
+            path = tempfile.mktemp()
+            index.dump(path)
+            start = time.time()
+            SearchIndex.load(path)
+            print('%-12s %8.1f ms, %d bytes' % ('load file', (time.time() - start) * 1000, os.path.getsize(path)))
+            os.remove(path)
+            samples = [random.choice(words) for i in range(queries)]
+            for name, search in (('LIKE', lambda word: db.session.query(Problem.id).filter(db.or_(
+                                     Problem.title.like(u'%' + word + u'%'), Problem.description.like(u'%' + word + u'%'))).all()),
+                                 ('index', lambda word: index.search(word))):
+                start = time.time()
+                for word in samples:
+                    search(word)
+                print('%-12s %8.3f ms/query' % (name, (time.time() - start) * 1000 / queries))
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+@manager.command
+def explain():
+
+    '''
+        run EXPLAIN on the hot queries and flag the full table scans
+    :return: number of the queries using full scan
+    '''
+
+    from app.explain import explain_hot_queries
+    bad = 0
+    for name, lines, scans in explain_hot_queries():
+        print('[%s] %s' % ('FULL SCAN' if scans else 'OK', name))
+        for line in lines:
+            print('    ' + line)
+        if scans:
+            bad += 1
+    return bad
+
+
 if __name__ == '__main__':
     '''
         run the judge web
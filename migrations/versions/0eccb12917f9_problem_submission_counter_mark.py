@@ -0,0 +1,38 @@
+"""problem submission counter mark
+
+Revision ID: 0eccb12917f9
+Revises: 15a4ff610c52
+Create Date: 2026-10-18 17:37:46.393642
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0eccb12917f9'
+down_revision = '15a4ff610c52'
+branch_labels = None
+depends_on = None
+
+# same as COUNTED_KEY in app/statistics.py
+COUNTED_KEY = 'problem_submission_counted'
+
+config = sa.table('config',
+                  sa.column('key', sa.String),
+                  sa.column('value', sa.Text))
+submission_status = sa.table('submission_status',
+                             sa.column('id', sa.Integer))
+
+
+def upgrade():
+    # the submissions made so far are already in Problem.submission_num
+    connection = op.get_bind()
+    last_id = connection.execute(sa.select([sa.func.max(submission_status.c.id)])).scalar() or 0
+    connection.execute(config.delete().where(config.c.key == COUNTED_KEY))
+    connection.execute(config.insert().values(key=COUNTED_KEY, value=str(last_id)))
+
+
+def downgrade():
+    connection = op.get_bind()
+    connection.execute(config.delete().where(config.c.key == COUNTED_KEY))
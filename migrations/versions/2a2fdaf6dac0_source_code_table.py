@@ -0,0 +1,101 @@
+"""source code table
+
+Revision ID: 2a2fdaf6dac0
+Revises: 92ad3d3a2354
+Create Date: 2026-10-18 15:53:14.280791
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import base64, hashlib, zlib
+
+
+# revision identifiers, used by Alembic.
+revision = '2a2fdaf6dac0'
+down_revision = '92ad3d3a2354'
+branch_labels = None
+depends_on = None
+
+# same as SOURCE_CODE_COMPRESS_MIN in config.py when the revision was written
+COMPRESS_MIN = 256
+# submissions read at a time, the table is never loaded at once
+BATCH_SIZE = 500
+
+submission_status = sa.table('submission_status',
+                             sa.column('id', sa.Integer),
+                             sa.column('code', sa.Text),
+                             sa.column('source_id', sa.Integer))
+source_code = sa.table('source_code',
+                       sa.column('id', sa.Integer),
+                       sa.column('hash', sa.String),
+                       sa.column('compressed', sa.Boolean),
+                       sa.column('content', sa.LargeBinary))
+
+
+def upgrade():
+    op.create_table('source_code',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('hash', sa.String(length=40), nullable=True),
+    sa.Column('compressed', sa.Boolean(), nullable=True),
+    sa.Column('content', sa.LargeBinary(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('hash')
+    )
+    with op.batch_alter_table('submission_status') as batch_op:
+        batch_op.add_column(sa.Column('source_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_submission_status_source_id', 'source_code', ['source_id'], ['id'])
+
+    # move the base64 code into source_code, a batch of submissions at a time
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.select([submission_status.c.id, submission_status.c.code]).where(
+            sa.and_(submission_status.c.id > last_id, submission_status.c.code != None)).order_by(
+            submission_status.c.id.asc()).limit(BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        datas = {}
+        digests = []
+        for submission_id, code in rows:
+            data = base64.b64decode(code)
+            digest = hashlib.sha1(data).hexdigest()
+            datas[digest] = data
+            digests.append((submission_id, digest))
+        ids = dict(connection.execute(sa.select([source_code.c.hash, source_code.c.id]).where(source_code.c.hash.in_(datas.keys()))).fetchall())
+        for digest, data in datas.items():
+            if digest in ids:
+                continue
+            compressed = False
+            if len(data) >= COMPRESS_MIN and len(zlib.compress(data)) < len(data):
+                data, compressed = zlib.compress(data), True
+            connection.execute(source_code.insert().values(hash=digest, compressed=compressed, content=data))
+        ids = dict(connection.execute(sa.select([source_code.c.hash, source_code.c.id]).where(source_code.c.hash.in_(datas.keys()))).fetchall())
+        for submission_id, digest in digests:
+            connection.execute(submission_status.update().where(submission_status.c.id == submission_id).values(source_id=ids[digest]))
+
+    with op.batch_alter_table('submission_status') as batch_op:
+        batch_op.drop_column('code')
+
+
+def downgrade():
+    with op.batch_alter_table('submission_status') as batch_op:
+        batch_op.add_column(sa.Column('code', sa.TEXT(), nullable=True))
+
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.select([submission_status.c.id, source_code.c.compressed, source_code.c.content]).where(
+            sa.and_(submission_status.c.id > last_id, submission_status.c.source_id == source_code.c.id)).order_by(
+            submission_status.c.id.asc()).limit(BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for submission_id, compressed, content in rows:
+            data = zlib.decompress(content) if compressed else content
+            connection.execute(submission_status.update().where(submission_status.c.id == submission_id).values(code=base64.b64encode(data)))
+
+    with op.batch_alter_table('submission_status') as batch_op:
+        batch_op.drop_constraint('fk_submission_status_source_id', type_='foreignkey')
+        batch_op.drop_column('source_id')
+    op.drop_table('source_code')
@@ -6,6 +6,13 @@ echo CELERY_BACKEND_URL="db+mysql://$MYSQL_USER:$MYSQL_PASS@$MYSQL_ADDR:$MYSQL_P
 
 source /etc/profile
 
-celery -A celery_work worker --loglevel=info -f ./celery-$HOSTNAME.log -c 2 &
+# search.<host> builds the search index file of this host
+celery -A celery_work worker -Q celery,search.$(hostname) --loglevel=info -f ./celery-$HOSTNAME.log -c 2 &
+
+# the periodic tasks (submission counts, pruning) need exactly one beat in the whole deployment,
+# it runs by default, set CELERY_BEAT=0 on every extra host
+if [ "$CELERY_BEAT" != "0" ]; then
+    celery -A celery_work beat --loglevel=info -f ./celery-beat-$HOSTNAME.log &
+fi
 
 gunicorn -c guni.conf manage:app
\ No newline at end of file
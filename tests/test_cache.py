@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Problem, OJList, User, Role, Permission
+from app.cache import get_problem_meta, invalidate_problem_meta, get_session_user, invalidate_session_users
+
+class CacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test cache
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test cache
+        :return: None
+        '''
+
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_problem_meta(self):
+
+        '''
+            test the metadata is cached until invalidated
+        :return: None
+        '''
+
+        oj = OJList(name='local')
+        db.session.add(oj)
+        db.session.commit()
+        p = Problem(title='p1', oj_id=oj.id, time_limit=1000, visible=True)
+        db.session.add(p)
+        db.session.commit()
+        self.assertTrue(get_problem_meta(p.id)['oj'] == 'local')
+        self.assertIsNone(get_problem_meta(p.id + 1))
+        Problem.query.filter_by(id=p.id).update({Problem.time_limit: 2000})
+        db.session.commit()
+        self.assertTrue(get_problem_meta(p.id)['time_limit'] == 1000)
+        invalidate_problem_meta()
+        self.assertTrue(get_problem_meta(p.id)['time_limit'] == 2000)
+
+    def test_invalidate_other_worker(self):
+
+        '''
+            test the invalidation reaches another worker through the database
+        :return: None
+        '''
+
+        p = Problem(title='p1', time_limit=1000)
+        db.session.add(p)
+        db.session.commit()
+        problem_id = p.id
+        other = create_app('testing')
+        other.config['CACHE_VERSION_CHECK_INTERVAL'] = 0
+        with other.app_context():
+            self.assertTrue(get_problem_meta(problem_id)['time_limit'] == 1000)
+        Problem.query.filter_by(id=problem_id).update({Problem.time_limit: 2000})
+        db.session.commit()
+        invalidate_problem_meta()
+        with other.app_context():
+            self.assertTrue(get_problem_meta(problem_id)['time_limit'] == 2000)
+
+    def test_invalidate_key_other_worker(self):
+
+        '''
+            test invalidating a problem drops only its metadata in another worker
+        :return: None
+        '''
+
+        p1 = Problem(title='p1', time_limit=1000)
+        p2 = Problem(title='p2', time_limit=1000)
+        db.session.add_all([p1, p2])
+        db.session.commit()
+        id1, id2 = p1.id, p2.id
+        other = create_app('testing')
+        other.config['CACHE_VERSION_CHECK_INTERVAL'] = 0
+        with other.app_context():
+            self.assertTrue(get_problem_meta(id1)['time_limit'] == 1000)
+            self.assertTrue(get_problem_meta(id2)['time_limit'] == 1000)
+            self.assertIsNone(get_problem_meta(id2 + 1))
+        Problem.query.update({Problem.time_limit: 2000})
+        db.session.add(Problem(id=id2 + 1, title='p3', time_limit=3000))
+        db.session.commit()
+        invalidate_problem_meta([id1, id2 + 1])
+        self.assertTrue(get_problem_meta(id1)['time_limit'] == 2000)
+        with other.app_context():
+            self.assertTrue(get_problem_meta(id1)['time_limit'] == 2000)
+            self.assertTrue(get_problem_meta(id2)['time_limit'] == 1000)
+            self.assertTrue(get_problem_meta(id2 + 1)['time_limit'] == 3000)
+            # a worker idle for longer than the changes are kept drops everything
+            other.config['CACHE_CHANGE_KEEP'] = 0
+            self.assertTrue(get_problem_meta(id2)['time_limit'] == 2000)
+
+    def test_session_user(self):
+
+        '''
+            test the user and role of a session are loaded without a query until invalidated
+        :return: None
+        '''
+
+        Role.insert_roles()
+        u = User(username='test', password='testtest', email='test@test.com', nickname='old')
+        db.session.add(u)
+        db.session.commit()
+        user_id = u.id
+        db.session.remove()
+        self.assertTrue(get_session_user(user_id).nickname == 'old')
+        self.assertIsNone(get_session_user(user_id + 100))
+        db.session.remove()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            user = get_session_user(user_id)
+            self.assertTrue(user.can(Permission.SUBMIT_CODE))
+            self.assertFalse(user.is_admin())
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertFalse([statement for statement in statements if 'users' in statement or 'roles' in statement])
+
+        # the merged copy belongs to this session and can be changed
+        other = User(username='other', password='testtest', email='other@test.com', nickname='old')
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+        db.session.remove()
+        self.assertTrue(get_session_user(other_id).nickname == 'old')
+        db.session.remove()
+        User.query.filter_by(id=other_id).update({User.nickname: 'kept'})
+        user = get_session_user(user_id)
+        user.nickname = 'new'
+        db.session.commit()
+        invalidate_session_users([user_id])
+        db.session.remove()
+        self.assertTrue(get_session_user(user_id).nickname == 'new')
+        # only the changed user is dropped
+        self.assertTrue(get_session_user(other_id).nickname == 'old')
+
+        # without invalidation the user is reloaded after USER_CACHE_TTL
+        self.app.config['USER_CACHE_TTL'] = 0
+        invalidate_session_users([user_id])
+        db.session.remove()
+        get_session_user(user_id)
+        User.query.filter_by(id=user_id).update({User.nickname: 'ttl'})
+        db.session.commit()
+        db.session.remove()
+        self.assertTrue(get_session_user(user_id).nickname == 'ttl')
@@ -2,10 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import unittest
+import io, json, shutil, hashlib, tempfile
 from flask import url_for
 from flask_login import login_user
 from app import create_app, db
-from app.models import User, Role, Problem, OJList
+from app.models import User, Role, Problem, OJList, JudgeQueue
 
 class FlaskClientTestCase(unittest.TestCase):
 
@@ -214,6 +215,32 @@ class FlaskClientTestCase(unittest.TestCase):
         response = self.client.post(url_for('admin.upload_file', problem_id=1))
         self.assertTrue(response.status_code == 200)
 
+        self.app.config['UPLOADED_PATH'] = tempfile.mkdtemp()
+        try:
+            response = self.client.post(url_for('admin.upload_file', problem_id=1), data={
+                'file': [(io.BytesIO(b'1 2'), '1.in'), (io.BytesIO(b'3'), '1.out')]
+            }, follow_redirects=True)
+            self.assertTrue(b'1.in: created' in response.data and b'1.out: created' in response.data)
+
+            # a file in chunks, the upload goes on after a lost response
+            response = self.client.get(url_for('admin.upload_chunk', problem_id=1, upload_id='big'))
+            self.assertTrue(json.loads(response.data.decode('utf-8')) == {'offset': 0})
+            response = self.client.post(url_for('admin.upload_chunk', problem_id=1, upload_id='big', offset=0, total=6, name='2.in'),
+                                        data=b'123', content_type='application/octet-stream')
+            self.assertTrue(json.loads(response.data.decode('utf-8')) == {'offset': 3})
+            response = self.client.post(url_for('admin.upload_chunk', problem_id=1, upload_id='big', offset=0, total=6, name='2.in'),
+                                        data=b'123', content_type='application/octet-stream')
+            self.assertTrue(response.status_code == 409 and json.loads(response.data.decode('utf-8')) == {'offset': 3})
+            response = self.client.post(url_for('admin.upload_chunk', problem_id=1, upload_id='big', offset=3, total=6, name='2.in'),
+                                        data=b'456', content_type='application/octet-stream')
+            self.assertTrue(json.loads(response.data.decode('utf-8'))['files'] == [{'name': '2.in', 'result': 'created'}])
+            response = self.client.get(url_for('admin.upload_file', problem_id=1))
+            self.assertTrue(hashlib.sha256(b'123456').hexdigest().encode('utf-8') in response.data)
+            response = self.client.get(url_for('admin.upload_chunk', problem_id=1, upload_id='a.b'))
+            self.assertTrue(response.status_code == 400)
+        finally:
+            shutil.rmtree(self.app.config['UPLOADED_PATH'])
+
     def test_tag(self):
 
         '''
@@ -421,12 +448,21 @@ class FlaskClientTestCase(unittest.TestCase):
         self.client.get(url_for('admin.submission_status_detail', submission_id=1))
         self.assertTrue(b'G++' in response.data)
         response = self.client.get(url_for('admin.submission_status_edit', submission_id=1))
+        # judging keeps the queue item, so the lease can expire and the submission is claimed again
+        expire = JudgeQueue.query.filter_by(submission_id=1).first().lease_expire
+        response = self.client.post(url_for('admin.submission_status_edit', submission_id=1), data={
+            'status': '10',
+            'exec_time': '0',
+            'exec_memory': '0'
+        }, follow_redirects=True)
+        self.assertTrue(JudgeQueue.query.filter_by(submission_id=1).first().lease_expire == expire)
         response = self.client.post(url_for('admin.submission_status_edit', submission_id=1), data={
             'status': '1',
             'exec_time': '1',
             'exec_memory': '1'
         }, follow_redirects=True)
         self.assertTrue(b'Accepted' in response.data)
+        self.assertTrue(JudgeQueue.query.filter_by(submission_id=1).count() == 0)
 
     def test_log(self):
 
@@ -2,12 +2,17 @@
 # -*- coding: utf-8 -*-
 
 import unittest
+import io, shutil, tempfile
 import json
 import re
 from base64 import b64encode
 from flask import url_for
 from app import create_app, db
-from app.models import User, Role, SubmissionStatus, CompileInfo, Problem, OJList
+from app.models import User, Role, SubmissionStatus, CompileInfo, Problem, OJList, JudgeQueue, Statistic
+from app.cache import invalidate_session_users
+from app.problem.search import get_search_index
+from app.admin.problem_data import save_file
+from app.statistics import count_problem_submissions
 
 
 class APITestCase(unittest.TestCase):
@@ -119,6 +124,57 @@ class APITestCase(unittest.TestCase):
             headers=self.get_api_headers(token, ''))
         self.assertTrue(response.status_code == 200)
 
+    def test_credential_cache(self):
+
+        '''
+            test the password is hashed once for the calls of a judger, until a password changed
+        :return: None
+        '''
+
+        r = Role.query.filter_by(name='Local Judger').first()
+        u = User(username='test', email='test@test.com', password='123456', confirmed=True, role=r)
+        db.session.add(u)
+        db.session.commit()
+        checks = []
+        verify = User.verify_password
+        User.verify_password = lambda user, password: checks.append(password) or verify(user, password)
+        try:
+            for i in range(3):
+                response = self.client.get(url_for('api.get_site_metrics'), headers=self.get_api_headers('test', '123456'))
+                self.assertTrue(response.status_code == 200)
+            self.assertTrue(checks == ['123456'])
+            # wrong passwords are never kept
+            for i in range(2):
+                response = self.client.get(url_for('api.get_site_metrics'), headers=self.get_api_headers('test', '1234567'))
+                self.assertTrue(response.status_code == 401)
+            self.assertTrue(checks == ['123456', '1234567', '1234567'])
+            # other changes of the user keep the credentials
+            u.nickname = 'judger'
+            db.session.add(u)
+            db.session.commit()
+            invalidate_session_users([u.id])
+            response = self.client.get(url_for('api.get_site_metrics'), headers=self.get_api_headers('test', '123456'))
+            self.assertTrue(response.status_code == 200)
+            self.assertTrue(checks == ['123456', '1234567', '1234567'])
+        finally:
+            User.verify_password = verify
+
+        u.password = '654321'
+        db.session.add(u)
+        db.session.commit()
+        invalidate_session_users([u.id], password=True)
+        response = self.client.get(url_for('api.get_site_metrics'), headers=self.get_api_headers('test', '123456'))
+        self.assertTrue(response.status_code == 401)
+        response = self.client.get(url_for('api.get_site_metrics'), headers=self.get_api_headers('test', '654321'))
+        self.assertTrue(response.status_code == 200)
+
+        # the token is checked once, and stays valid for the judger
+        response = self.client.get(url_for('api.get_token'), headers=self.get_api_headers('test', '654321'))
+        token = json.loads(response.data.decode('utf-8'))['token']
+        for i in range(2):
+            response = self.client.get(url_for('api.get_site_metrics'), headers=self.get_api_headers(token, ''))
+            self.assertTrue(response.status_code == 200)
+
     def test_anonymous(self):
 
         '''
@@ -184,6 +240,22 @@ class APITestCase(unittest.TestCase):
         json_response = json.loads(response.data.decode('utf-8'))
         self.assertIsNone(json_response.get('message'))
         self.assertTrue(response.status_code == 200)
+        # renew the lease of the claimed submission with its token
+        token = json_response['lease_token']
+        response = self.client.post(
+            url_for('api.renew_lease', status_id=1),
+            headers=self.get_api_headers('test', '123456'),
+            data=json.dumps({'lease_token': token}))
+        self.assertTrue(response.status_code == 200)
+        response = self.client.post(
+            url_for('api.renew_lease', status_id=1),
+            headers=self.get_api_headers('test', '123456'))
+        self.assertTrue(response.status_code == 400)
+        response = self.client.post(
+            url_for('api.renew_lease', status_id=2),
+            headers=self.get_api_headers('test', '123456'),
+            data=json.dumps({'lease_token': token}))
+        self.assertTrue(response.status_code == 400)
         # add ce info to vaild status
         response = self.client.post(
             url_for('api.add_ce_info', status_id=2),
@@ -235,8 +307,13 @@ class APITestCase(unittest.TestCase):
         self.assertTrue(response.status_code == 201)
         url = response.headers.get('Location')
         self.assertIsNotNone(url)
+        # the submissions are counted by the beat
+        self.app.config['SUBMISSION_COUNT_GRACE'] = 0
+        self.assertTrue(count_problem_submissions() == 1)
         p = Problem.query.get(1)
         self.assertTrue(p.accept_num == 1)
+        self.assertTrue(p.submission_num == 1)
+        self.assertTrue(Statistic.histogram('user', 'test') == {0: 0, 10: 0, 1: 1})
 
         # get judge status after judge
         response = self.client.get(
@@ -255,6 +332,137 @@ class APITestCase(unittest.TestCase):
         json_response = json.loads(response.data.decode('utf-8'))
         self.assertTrue(b'No more waiting submissions' in json_response.get('message'))
         self.assertTrue(response.status_code == 200)
+        self.assertTrue(JudgeQueue.query.count() == 0)
+
+    def test_judge_batch(self):
+
+        '''
+            test claim submissions in batch
+        :return: None
+        '''
+
+        r = Role.query.filter_by(name='Local Judger').first()
+        u = User(username='test', email='test@test.com', password='123456', confirmed=True, role=r)
+        db.session.add(u)
+        oj = OJList(name='test')
+        db.session.add(oj)
+        db.session.commit()
+        p = Problem(title='test', visible=True, oj_id=oj.id)
+        db.session.add(p)
+        db.session.commit()
+        for i in range(3):
+            s = SubmissionStatus(status=0, problem_id=p.id, language=1, code='')
+            db.session.add(s)
+            JudgeQueue.enqueue(s)
+        db.session.commit()
+        # wrong max
+        response = self.client.post(
+            url_for('api.judge_new_batch', max=0),
+            headers=self.get_api_headers('test', '123456'))
+        self.assertTrue(response.status_code == 400)
+        # claim two of them
+        response = self.client.post(
+            url_for('api.judge_new_batch', max=2, language=1),
+            headers=self.get_api_headers('test', '123456'))
+        self.assertTrue(response.status_code == 200)
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertTrue([item['id'] for item in json_response] == [1, 2])
+        self.assertTrue(json_response[0]['oj'] == 'test')
+        # only one left
+        response = self.client.post(
+            url_for('api.judge_new_batch', max=2),
+            headers=self.get_api_headers('test', '123456'))
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertTrue([item['id'] for item in json_response] == [3])
+        response = self.client.post(
+            url_for('api.judge_new_batch', max=2),
+            headers=self.get_api_headers('test', '123456'))
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertTrue(json_response == [])
+
+    def test_judge_batch_verdict(self):
+
+        '''
+            test report verdicts in batch
+        :return: None
+        '''
+
+        r = Role.query.filter_by(name='Local Judger').first()
+        u = User(username='test', email='test@test.com', password='123456', confirmed=True, role=r)
+        db.session.add(u)
+        oj = OJList(name='test')
+        db.session.add(oj)
+        db.session.commit()
+        p = Problem(title='test', visible=True, oj_id=oj.id)
+        db.session.add(p)
+        db.session.commit()
+        for i in range(3):
+            s = SubmissionStatus(status=0, problem_id=p.id, language=1, code='')
+            db.session.add(s)
+            JudgeQueue.enqueue(s)
+        db.session.commit()
+        JudgeQueue.claim_many('test', 3)
+        # not a list
+        response = self.client.post(
+            url_for('api.change_status_batch'),
+            headers=self.get_api_headers('test', '123456'),
+            data=json.dumps({'id': 1}))
+        self.assertTrue(response.status_code == 400)
+        # wrong submission id, nothing changed
+        response = self.client.post(
+            url_for('api.change_status_batch'),
+            headers=self.get_api_headers('test', '123456'),
+            data=json.dumps([{'id': 1, 'status': 1, 'exec_time': 0, 'exec_memory': 0},
+                             {'id': 4, 'status': 1, 'exec_time': 0, 'exec_memory': 0}]))
+        self.assertTrue(response.status_code == 400)
+        self.assertTrue(SubmissionStatus.query.get(1).status == 10)
+        # update all of them
+        response = self.client.post(
+            url_for('api.change_status_batch'),
+            headers=self.get_api_headers('test', '123456'),
+            data=json.dumps([{'id': 1, 'status': 1, 'exec_time': 10, 'exec_memory': 100},
+                             {'id': 2, 'status': 2, 'exec_time': 0, 'exec_memory': 0, 'ce_info': 'error'},
+                             {'id': 3, 'status': 1, 'exec_time': 20, 'exec_memory': 200}]))
+        self.assertTrue(response.status_code == 201)
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertTrue(json_response['updated'] == [1, 2, 3])
+        self.assertTrue(Problem.query.get(p.id).accept_num == 2)
+        self.assertTrue(SubmissionStatus.query.get(3).exec_time == 20)
+        self.assertTrue(CompileInfo.query.filter_by(submission_id=2).first().info == 'error')
+        self.assertTrue(JudgeQueue.query.count() == 0)
+
+    def test_metrics(self):
+
+        '''
+            test the dashboard counters in json
+        :return: None
+        '''
+
+        r = Role.query.filter_by(name='Local Judger').first()
+        u = User(username='test', email='test@test.com', password='123456', confirmed=True, role=r)
+        db.session.add(u)
+        db.session.add(User(username='test2', email='test2@test.com', password='123456'))
+        db.session.add(SubmissionStatus(status=0))
+        db.session.add(SubmissionStatus(status=1))
+        db.session.commit()
+        response = self.client.get(
+            url_for('api.get_site_metrics'),
+            headers=self.get_api_headers('test', '123456'))
+        self.assertTrue(response.status_code == 200)
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertTrue(json_response['user_num'] == 2)
+        self.assertTrue(json_response['unconfirmed_user'] == 1)
+        self.assertTrue(json_response['submission_num'] == 2)
+        self.assertTrue(json_response['waiting_num'] == 1)
+        self.assertTrue(json_response['judging_num'] == 0)
+        # served from the cache
+        db.session.add(SubmissionStatus(status=0))
+        db.session.commit()
+        response = self.client.get(
+            url_for('api.get_site_metrics'),
+            headers=self.get_api_headers('test', '123456'))
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertTrue(json_response['submission_num'] == 2)
 
     def test_problem(self):
 
@@ -310,6 +518,7 @@ class APITestCase(unittest.TestCase):
                              'oj_id': '1'})
         )
         self.assertTrue(response.status_code == 201)
+        self.assertTrue(get_search_index().search('test', visible_only=False) == [1])
         # Wrong oj_id or remote_id
         response = self.client.post(
             url_for('api.update_problem', oj_id=1, remote_id=1),
@@ -328,3 +537,88 @@ class APITestCase(unittest.TestCase):
             headers=self.get_api_headers('test', '123456')
         )
         self.assertTrue(response.status_code == 200)
+
+    def test_problem_import(self):
+
+        '''
+            test the problems of an oj are upserted in chunks from json and ndjson
+        :return: None
+        '''
+
+        r = Role.query.filter_by(name='Remote Judger').first()
+        u = User(username='test', email='test@test.com', password='123456', confirmed=True, role=r)
+        oj, local = OJList(name='hdu', vjudge=True), OJList(name='local', vjudge=False)
+        db.session.add_all([u, oj, local])
+        db.session.commit()
+        db.session.add(Problem(title='old', description='old', oj_id=oj.id, remote_id=1000, time_limit=1000, visible=True))
+        db.session.commit()
+        self.app.config['PROBLEM_IMPORT_CHUNK'] = 2
+        response = self.client.post(
+            url_for('api.import_problems', oj_id=local.id),
+            headers=self.get_api_headers('test', '123456'),
+            data=json.dumps([]))
+        self.assertTrue(response.status_code == 400)
+
+        # json array
+        response = self.client.post(
+            url_for('api.import_problems', oj_id=oj.id),
+            headers=self.get_api_headers('test', '123456'),
+            data=json.dumps([{'remote_id': 1000, 'title': 'new', 'description': 'new'},
+                             {'remote_id': 1001, 'title': 'a', 'description': 'a', 'visible': 1},
+                             {'remote_id': 1002, 'title': 'b'},
+                             {'remote_id': 1003, 'title': 'c', 'description': 'c', 'oj_id': local.id}]))
+        self.assertTrue(response.status_code == 200)
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertTrue(json_response['created'] == 1 and json_response['updated'] == 1 and json_response['error'] == 2)
+        results = json_response['results']
+        self.assertTrue([result['result'] for result in results] == ['updated', 'created', 'error', 'error'])
+        self.assertTrue(results[2]['message'] == 'Problem require full data' and results[3]['line'] == 4)
+        problem = Problem.query.filter_by(oj_id=oj.id, remote_id=1000).first()
+        db.session.refresh(problem)
+        self.assertTrue(problem.id == results[0]['id'] and problem.title == 'new' and problem.time_limit == 1000 and problem.visible)
+        problem = Problem.query.get(results[1]['id'])
+        self.assertTrue(problem.title == 'a' and problem.visible and problem.submission_num == 0 and problem.last_update is not None)
+        self.assertTrue(get_search_index().search('new') == [results[0]['id']])
+
+        # ndjson, read line by line
+        headers = self.get_api_headers('test', '123456')
+        headers['Content-Type'] = 'application/x-ndjson'
+        lines = [json.dumps({'remote_id': 1000 + i, 'title': 'p%d' % i, 'description': 'd'}) for i in range(1, 6)]
+        response = self.client.post(
+            url_for('api.import_problems', oj_id=oj.id),
+            headers=headers,
+            data='\n'.join(lines[:2] + ['', '{broken'] + lines[2:]) + '\n')
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertTrue(json_response['created'] == 4 and json_response['updated'] == 1 and json_response['error'] == 1)
+        self.assertTrue(json_response['results'][2] == {'line': 4, 'result': 'error', 'message': 'Invalid json'})
+        self.assertTrue(Problem.query.filter_by(oj_id=oj.id).count() == 6)
+        self.assertTrue(sorted(title for title, in db.session.query(Problem.title).filter_by(oj_id=oj.id)) == ['new', 'p1', 'p2', 'p3', 'p4', 'p5'])
+
+    def test_problem_data(self):
+
+        '''
+            test judgers read the manifest and the files of the test data
+        :return: None
+        '''
+
+        r = Role.query.filter_by(name='Local Judger').first()
+        u = User(username='test', email='test@test.com', password='123456', confirmed=True, role=r)
+        p = Problem(title='test')
+        db.session.add_all([u, p])
+        db.session.commit()
+        self.app.config['UPLOADED_PATH'] = tempfile.mkdtemp()
+        try:
+            save_file(p.id, '1.in', io.BytesIO(b'1 2'))
+            response = self.client.get(url_for('api.get_problem_data', id=p.id), headers=self.get_api_headers('test', '123456'))
+            manifest = json.loads(response.data.decode('utf-8'))
+            self.assertTrue(manifest['version'] == 1 and manifest['files']['1.in']['size'] == 3)
+            response = self.client.get(url_for('api.get_problem_data_file', id=p.id, filename='1.in'),
+                                       headers=self.get_api_headers('test', '123456'))
+            self.assertTrue(response.status_code == 200 and response.data == b'1 2')
+            response = self.client.get(url_for('api.get_problem_data_file', id=p.id, filename='manifest.json'),
+                                       headers=self.get_api_headers('test', '123456'))
+            self.assertTrue(response.status_code == 404)
+            response = self.client.get(url_for('api.get_problem_data', id=p.id + 1), headers=self.get_api_headers('test', '123456'))
+            self.assertTrue(response.status_code == 404)
+        finally:
+            shutil.rmtree(self.app.config['UPLOADED_PATH'])
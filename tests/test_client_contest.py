@@ -5,8 +5,9 @@ import unittest
 from flask import url_for
 from flask_login import login_user
 from app import create_app, db
-from app.models import User, Role, Problem, Contest
-import time
+from app.models import User, Role, Problem, Contest, ContestUsers, ContestImport, SubmissionStatus
+from app.admin.user_import import parse_user_list, stage_import, run_import, get_progress
+import time, json
 
 class FlaskClientTestCase(unittest.TestCase):
 
@@ -394,7 +395,7 @@ class FlaskClientTestCase(unittest.TestCase):
         response = self.client.post(url_for('admin.contest_insert'), data={
             'contest_name': 'contest_test',
             'start_time': '2001-11-11 10:10',
-            'end_time': '2019-11-11 10:11',
+            'end_time': '2099-11-11 10:11',
             'type': '1',
             'password': 'thisisatest',
             'manager': 'test2'
@@ -442,8 +443,9 @@ class FlaskClientTestCase(unittest.TestCase):
             'username': 'test3',
             'password': '123456'
         }, follow_redirects=True)
+        # the first view sends the task of generating the snapshot
         response = self.client.get(url_for('contest.contest_ranklist', contest_id=1),follow_redirects=True)
-        self.assertTrue(b'accept' in response.data)
+        self.assertTrue(response.status_code == 200)
         time.sleep(20)
         response = self.client.get(url_for('contest.contest_ranklist', contest_id=1), follow_redirects=True)
         self.assertTrue(b'accept' in response.data)
@@ -470,7 +472,7 @@ class FlaskClientTestCase(unittest.TestCase):
         response = self.client.post(url_for('admin.contest_insert'), data={
             'contest_name': 'contest_test',
             'start_time': '2001-11-11 10:10',
-            'end_time': '2019-11-11 10:11',
+            'end_time': '2099-11-11 10:11',
             'type': '1',
             'password': 'thisisatest',
             'manager': 'test2'
@@ -518,8 +520,9 @@ class FlaskClientTestCase(unittest.TestCase):
             'username': 'test2',
             'password': '123456'
         }, follow_redirects=True)
+        # the first view sends the task of generating the snapshot
         response = self.client.get(url_for('contest.contest_ranklist_admin', contest_id=1),follow_redirects=True)
-        self.assertTrue(b'accept' in response.data)
+        self.assertTrue(response.status_code == 200)
         time.sleep(20)
         response = self.client.get(url_for('contest.contest_ranklist_admin', contest_id=1), follow_redirects=True)
         self.assertTrue(b'accept' in response.data)
@@ -681,3 +684,103 @@ class FlaskClientTestCase(unittest.TestCase):
         response = self.client.get(url_for('contest.contest_detail', contest_id=1), follow_redirects=True)
         self.assertTrue(b'已注册并确认' in response.data)
 
+    def test_contest_insert_user_bulk(self):
+
+        '''
+            test the import in chunks updates the users imported before and reports the progress
+        :return: None
+        '''
+
+        self.app.config['CONTEST_IMPORT_CHUNK'] = 2
+        u = User(username='admin', password='123456', email='admin@test.com', confirmed=True)
+        u.role_id = Role.query.filter_by(permission=0xff).first().id
+        db.session.add(u)
+        c = Contest(contest_name='contest_test', manager_username='admin')
+        db.session.add(c)
+        db.session.commit()
+        contest_id = c.id
+        response = self.client.post(url_for('auth.login'), data={
+            'username': 'admin',
+            'password': '123456'
+        }, follow_redirects=True)
+        user_list = '; '.join('name%d, 20%d, MIT, 155, user%d, pass%d, user%d@test.com' % (i, i, i, i, i) for i in range(5))
+        response = self.client.post(url_for('admin.contest_insert_user', contest_id=contest_id), data={
+            'user_list': user_list
+        }, follow_redirects=True)
+        self.assertTrue(b'插入用户成功' in response.data)
+        response = self.client.post(url_for('admin.contest_insert_user', contest_id=contest_id), data={
+            'user_list': 'renamed, 2000, CMU, 155, user0, newpass, user0@test.com; name5, 205, MIT, 155, user5, pass5, user5@test.com'
+        }, follow_redirects=True)
+        self.assertTrue(b'插入用户成功' in response.data)
+        self.assertTrue(User.query.filter(User.username.like('user%')).count() == 6)
+        self.assertTrue(ContestUsers.query.filter_by(contest_id=contest_id, user_confirmed=True).count() == 6)
+        user0 = User.query.filter_by(username='user0').first()
+        self.assertTrue(user0.verify_password('newpass'))
+        self.assertTrue(user0.photo is not None)
+        self.assertTrue(ContestUsers.query.filter_by(contest_id=contest_id, user_id=user0.id).first().school == 'CMU')
+        response = self.client.get(url_for('admin.contest_insert_user_progress', contest_id=contest_id))
+        self.assertTrue(json.loads(response.data.decode('utf-8')) == {'total': 2, 'done': 2, 'finished': True, 'error': None})
+        # the passwords are not left in the database
+        self.assertTrue(ContestImport.query.count() == 0)
+
+    def test_contest_insert_user_error(self):
+
+        '''
+            test a failed chunk is rolled back and reported in the progress
+        :return: None
+        '''
+
+        self.app.config['CONTEST_IMPORT_CHUNK'] = 1
+        c = Contest(contest_name='contest_test')
+        db.session.add(c)
+        db.session.commit()
+        contest_id = c.id
+        users = parse_user_list('name0, 200, MIT, 155, user0, pass0, user0@test.com; name1, 201, MIT, 155, user1, pass1, user1@test.com')
+        del users[1]['email']
+        run_import(stage_import(contest_id, users))
+        progress = get_progress(contest_id)
+        self.assertTrue(progress['finished'] and progress['done'] == 1)
+        self.assertTrue(progress['error'].startswith('KeyError'))
+        self.assertTrue(User.query.filter_by(username='user0').count() == 1)
+        self.assertTrue(User.query.filter_by(username='user1').count() == 0)
+        self.assertTrue(ContestImport.query.count() == 0)
+
+    def test_contest_status_events(self):
+
+        '''
+            test the contest feed pushes all submissions to the manager and own submissions to the others
+        :return: None
+        '''
+
+        self.app.config['STATUS_PUSH_INTERVAL'] = 0
+        self.app.config['STATUS_PUSH_TIMEOUT'] = 0
+        manager = User(username='manager', password='123456', email='manager@test.com', confirmed=True)
+        u = User(username='test', password='123456', email='test@test.com', confirmed=True)
+        c = Contest(contest_name='contest_test', manager_username='manager')
+        db.session.add_all([manager, u, c])
+        db.session.commit()
+        contest_id = c.id
+        db.session.add_all([ContestUsers(user_id=manager.id, contest_id=contest_id, user_confirmed=True),
+                            ContestUsers(user_id=u.id, contest_id=contest_id, user_confirmed=True)])
+        mine = SubmissionStatus(author_username='test', contest_id=contest_id, status=0)
+        other = SubmissionStatus(author_username='someone', contest_id=contest_id, status=0)
+        outside = SubmissionStatus(author_username='test', status=0)
+        db.session.add_all([mine, other, outside])
+        db.session.commit()
+        ids = [mine.id, other.id, outside.id]
+        SubmissionStatus.set_status(ids, 10)
+        db.session.commit()
+
+        response = self.client.post(url_for('auth.login'), data={
+            'username': 'test',
+            'password': '123456'
+        }, follow_redirects=True)
+        pushed = lambda: [json.loads(line[6:])['submission_id'] for line in self.client.get(
+            url_for('contest.contest_status_events', contest_id=contest_id, after=0)).get_data().splitlines() if line.startswith(b'data: ')]
+        self.assertTrue(pushed() == ids[:1])
+        response = self.client.get(url_for('auth.logout'), follow_redirects=True)
+        response = self.client.post(url_for('auth.login'), data={
+            'username': 'manager',
+            'password': '123456'
+        }, follow_redirects=True)
+        self.assertTrue(pushed() == ids[:2])
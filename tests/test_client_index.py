@@ -7,6 +7,8 @@ from flask_login import login_user
 from app import create_app, db
 from app.models import User, Role
 from app.index.views import gen_random_filename
+from app.avatar import render_missing_avatars
+import os, shutil, tempfile
 
 class FlaskClientTestCase(unittest.TestCase):
 
@@ -75,3 +77,34 @@ class FlaskClientTestCase(unittest.TestCase):
 
         response = self.client.post(url_for('index.ckupload'))
         self.assertTrue(b'POST_ERROR' in response.data)
+
+    def test_avatar(self):
+
+        '''
+            test avatars are rendered on first view and cached
+        :return: None
+        '''
+
+        self.app.config['AVATAR_DIR'] = tempfile.mkdtemp()
+        try:
+            u = User(username='test', email='test@test.com')
+            db.session.add(u)
+            db.session.commit()
+            self.assertTrue(os.listdir(self.app.config['AVATAR_DIR']) == [])
+            response = self.client.get(url_for('index.avatar', photo=u.photo))
+            self.assertTrue(response.status_code == 200)
+            self.assertTrue(response.data.startswith(b'\x89PNG'))
+            self.assertTrue(response.cache_control.max_age == self.app.config['AVATAR_MAX_AGE'])
+            self.assertTrue(os.listdir(self.app.config['AVATAR_DIR']) == [u.photo + '.png'])
+            response = self.client.get(url_for('index.avatar', photo=u.photo), headers={'If-None-Match': '"%s"' % u.photo})
+            self.assertTrue(response.status_code == 304)
+            self.assertTrue(self.client.get('/avatar/..%2Fx.png').status_code == 404)
+            # names of no user are neither rendered nor saved
+            self.assertTrue(self.client.get(url_for('index.avatar', photo='abc123')).status_code == 404)
+            self.assertTrue(os.listdir(self.app.config['AVATAR_DIR']) == [u.photo + '.png'])
+            db.session.add(User(username='test2', email='test2@test.com'))
+            db.session.commit()
+            self.assertTrue(render_missing_avatars() == 1)
+            self.assertTrue(render_missing_avatars() == 0)
+        finally:
+            shutil.rmtree(self.app.config['AVATAR_DIR'])
@@ -2,10 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import unittest
+import re
 from flask import url_for
 from flask_login import login_user
+from sqlalchemy import event
 from app import create_app, db
-from app.models import User, Role, Problem
+from app.models import User, Role, Problem, OJList, Tag, TagProblem
+from app.cache import invalidate_problem_meta
+from app.problem.tag_index import invalidate_tag_index
 
 class FlaskClientTestCase(unittest.TestCase):
 
@@ -91,6 +95,105 @@ class FlaskClientTestCase(unittest.TestCase):
 
 
 
+    def test_problem_list_batched(self):
+
+        '''
+            test the ojs and tags of a page are loaded by one query each, for the list and the filter
+        :return: None
+        '''
+
+        oj = OJList(name='hdu', vjudge=True)
+        graph, dp = Tag(tag_name='graph'), Tag(tag_name='dp')
+        db.session.add_all([oj, graph, dp])
+        db.session.commit()
+        problems = [Problem(title='problem%d' % i, visible=True, oj_id=oj.id, remote_id=1000 + i) for i in range(5)]
+        db.session.add_all(problems)
+        db.session.commit()
+        db.session.add_all([TagProblem(tag_id=graph.id, problem_id=problem.id) for problem in problems[:3]] +
+                           [TagProblem(tag_id=dp.id, problem_id=problem.id) for problem in problems[2:]])
+        db.session.commit()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = self.client.get(url_for('problem.problem_list'))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertTrue(response.data.count(b'hdu') == 5)
+        self.assertTrue(response.data.count(b'graph') == 3 and response.data.count(b'dp') == 3)
+        self.assertTrue(len([statement for statement in statements if 'tag_problem' in statement]) == 1)
+        self.assertTrue(len([statement for statement in statements if 'FROM oj_list' in statement]) == 1)
+
+        response = self.client.get(url_for('problem.problem_list_filter', key='dp'))
+        self.assertFalse(b'problem1<' in response.data)
+        self.assertTrue(b'problem2<' in response.data and b'problem4<' in response.data)
+        self.assertTrue(response.data.count(b'graph') == 1)
+        response = self.client.get(url_for('problem.problem_list_filter', key='graph & dp'))
+        self.assertTrue(b'problem2<' in response.data)
+        self.assertFalse(b'problem3<' in response.data)
+        response = self.client.get(url_for('problem.problem_list_filter', key='graph | dp'))
+        self.assertTrue(all(b'problem%d<' % i in response.data for i in range(5)))
+        response = self.client.get(url_for('problem.problem_list_filter', key='(graph | dp) & !dp'))
+        self.assertTrue(b'problem1<' in response.data)
+        self.assertFalse(b'problem2<' in response.data)
+        response = self.client.get(url_for('problem.problem_list_filter', key='graph &'))
+        self.assertTrue(b'unexpected end' in response.data)
+        response = self.client.get(url_for('problem.problem_list_filter', oj='hdu', remote_id=1003))
+        self.assertTrue(b'problem3<' in response.data)
+        self.assertFalse(b'problem2<' in response.data)
+
+        # the index follows the changes of problems and tags
+        Problem.query.filter_by(id=problems[3].id).update({Problem.visible: False})
+        db.session.commit()
+        invalidate_tag_index()
+        response = self.client.get(url_for('problem.problem_list_filter', oj='hdu'))
+        self.assertFalse(b'problem3<' in response.data)
+        self.assertTrue(b'problem4<' in response.data)
+        Tag.query.filter_by(id=dp.id).update({Tag.tag_name: 'dynamic'})
+        db.session.commit()
+        invalidate_tag_index()
+        response = self.client.get(url_for('problem.problem_list_filter', key='dynamic'))
+        self.assertTrue(b'problem4<' in response.data)
+
+        # pages of the filter keep the filter
+        self.app.config['FLASKY_PROBLEMS_PER_PAGE'] = 2
+        response = self.client.get(url_for('problem.problem_list_filter', key='graph|dynamic'))
+        self.assertTrue(b'problem1<' in response.data)
+        self.assertFalse(b'problem2<' in response.data)
+        self.assertTrue(b'key=graph%7Cdynamic' in response.data)
+        response = self.client.get(url_for('problem.problem_list_filter', key='graph|dynamic', after=problems[1].id))
+        self.assertTrue(b'problem2<' in response.data and b'problem4<' in response.data)
+        self.assertFalse(b'problem1<' in response.data)
+
+    def test_problem_search(self):
+
+        '''
+            test the search page ranks the visible problems and keeps the query in the pages
+        :return: None
+        '''
+
+        db.session.add_all([Problem(title=u'最短路 %d' % i, description=u'图论', visible=True) for i in range(3)] +
+                           [Problem(title=u'背包', description=u'求最短路', visible=True),
+                            Problem(title=u'hidden', description=u'最短路', visible=False)])
+        db.session.commit()
+        response = self.client.get(url_for('problem.problem_search', q=u'最短路'))
+        data = response.get_data(as_text=True)
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(data.index(u'最短路 2<') < data.index(u'背包<'))
+        self.assertFalse(u'hidden<' in data)
+        response = self.client.get(url_for('problem.problem_search', q=u'图论 最短路'))
+        self.assertFalse(u'背包<' in response.get_data(as_text=True))
+
+        self.app.config['FLASKY_PROBLEMS_PER_PAGE'] = 2
+        response = self.client.get(url_for('problem.problem_search', q=u'最短路', page=2))
+        data = response.get_data(as_text=True)
+        self.assertTrue(u'最短路 2<' in data and u'背包<' in data)
+        self.assertFalse(u'最短路 0<' in data)
+        links = re.findall(r'href="/problem/search\?([^"]*)"', data)
+        self.assertTrue(links and all(u'q=%E6%9C%80%E7%9F%AD%E8%B7%AF' in link for link in links))
+        self.assertTrue(any(u'page=1' in link for link in links))
+
     def test_problem_detail(self):
 
         '''
@@ -106,6 +209,7 @@ class FlaskClientTestCase(unittest.TestCase):
         p.visible = True
         db.session.add(p)
         db.session.commit()
+        invalidate_problem_meta()
         response = self.client.get(url_for('problem.problem_detail', problem_id=p.id))
         self.assertTrue(response.status_code == 200)
 
@@ -148,6 +252,7 @@ class FlaskClientTestCase(unittest.TestCase):
         p.visible = True
         db.session.add(p)
         db.session.commit()
+        invalidate_problem_meta()
         response = self.client.post(url_for('problem.submit', problem_id=p.id), data={
             'problem_id': '1',
             'language': '1',
@@ -157,6 +262,7 @@ class FlaskClientTestCase(unittest.TestCase):
         p.visible = False
         db.session.add(p)
         db.session.commit()
+        invalidate_problem_meta()
         u.role_id = Role.query.filter_by(permission=0xff).first().id
         db.session.add(u)
         db.session.commit()
@@ -2,10 +2,13 @@
 # -*- coding: utf-8 -*-
 
 import unittest
+from datetime import datetime, timedelta
 from flask import url_for
 from flask_login import login_user
 from app import create_app, db
-from app.models import User, Role, Problem, SubmissionStatus
+from app.models import User, Role, Problem, SubmissionStatus, StatusEvent
+from app.pagination import KeysetPagination
+from app.status.events import poll
 
 class FlaskClientTestCase(unittest.TestCase):
 
@@ -114,4 +117,119 @@ class FlaskClientTestCase(unittest.TestCase):
         db.session.add(u2)
         db.session.commit()
         response = self.client.get(url_for('status.status_detail', run_id=1))
-        self.assertTrue(response.status_code == 200)
\ No newline at end of file
+        self.assertTrue(response.status_code == 200)
+
+    def test_status_events(self):
+
+        '''
+            test the status changes of own submissions are pushed
+        :return: None
+        '''
+
+        self.app.config['STATUS_PUSH_INTERVAL'] = 0
+        self.app.config['STATUS_PUSH_TIMEOUT'] = 0
+        response = self.client.get(url_for('status.status_events'))
+        self.assertTrue(response.status_code == 302)
+        p = Problem(title='test', visible=True)
+        u = User(username='test', password='test', email='test@test.com', confirmed=True)
+        db.session.add_all([p, u])
+        db.session.commit()
+        mine = SubmissionStatus(problem_id=p.id, author_username='test', status=0)
+        other = SubmissionStatus(problem_id=p.id, author_username='other', status=0)
+        db.session.add_all([mine, other])
+        db.session.commit()
+        mine_id, other_id = mine.id, other.id
+        response = self.client.post(url_for('auth.login'), data={
+            'username': 'test',
+            'password': 'test'
+        }, follow_redirects=True)
+        response = self.client.get(url_for('status.status_list'))
+        self.assertTrue(b'status_events.js' in response.data)
+        self.assertTrue(b'data-run-id="%d"' % mine_id in response.data)
+
+        SubmissionStatus.set_status([mine_id, other_id], 10)
+        db.session.commit()
+        response = self.client.get(url_for('status.status_events', after=0))
+        self.assertTrue(response.mimetype == 'text/event-stream')
+        data = response.get_data()
+        self.assertTrue(b'"submission_id": %d' % mine_id in data)
+        self.assertFalse(b'"submission_id": %d' % other_id in data)
+        last_id = db.session.query(db.func.max(StatusEvent.id)).scalar()
+        self.assertTrue(b'id: %d\n: bye' % last_id in data)
+
+        # a reconnection gets the events after Last-Event-ID only
+        SubmissionStatus.set_status([mine_id], 1)
+        db.session.commit()
+        data = self.client.get(url_for('status.status_events'), headers={'Last-Event-ID': str(last_id)}).get_data()
+        self.assertTrue(data.count(b'data: ') == 1)
+        self.assertTrue(b'"status": 1' in data)
+
+        # events dropped from the buffer of the worker make the page reload
+        self.app.config['STATUS_PUSH_BUFFER'] = 1
+        SubmissionStatus.set_status([mine_id, other_id], 3)
+        db.session.commit()
+        data = self.client.get(url_for('status.status_events'), headers={'Last-Event-ID': str(last_id)}).get_data()
+        self.assertTrue(b'event: reload' in data)
+
+    def test_status_event_gap(self):
+
+        '''
+            test the events after a missing id wait for it until the grace period passed
+        :return: None
+        '''
+
+        self.app.config['STATUS_PUSH_INTERVAL'] = 0
+        self.app.config['STATUS_PUSH_GRACE'] = 10
+        db.session.add(StatusEvent(id=1, submission_id=1, status=0))
+        db.session.commit()
+        self.assertTrue(poll()['last_id'] == 1)
+        # the insert of id 2 is not committed yet
+        db.session.add(StatusEvent(id=3, submission_id=3, status=0))
+        db.session.commit()
+        self.assertTrue(poll()['last_id'] == 1)
+        db.session.add(StatusEvent(id=2, submission_id=2, status=0))
+        db.session.commit()
+        feed = poll()
+        self.assertTrue(feed['last_id'] == 3)
+        self.assertTrue([event['id'] for event in feed['events']] == [1, 2, 3])
+        # a rolled back insert leaves the id missing for ever
+        db.session.add(StatusEvent(id=5, submission_id=5, status=0, created=datetime.utcnow() - timedelta(seconds=11)))
+        db.session.commit()
+        self.assertTrue(poll()['last_id'] == 5)
+
+    def test_keyset_pagination(self):
+
+        '''
+            test pages found by the before/after keys
+        :return: None
+        '''
+
+        for i in range(5):
+            db.session.add(SubmissionStatus(status=1, visible=True, problem_id=1, author_username='test'))
+        db.session.commit()
+        pagination = KeysetPagination(SubmissionStatus.query, SubmissionStatus.id, 2)
+        self.assertTrue([s.id for s in pagination.items] == [5, 4])
+        self.assertFalse(pagination.has_prev)
+        self.assertTrue(pagination.has_next)
+        pagination = KeysetPagination(SubmissionStatus.query, SubmissionStatus.id, 2, after=pagination.next_cursor)
+        self.assertTrue([s.id for s in pagination.items] == [3, 2])
+        self.assertTrue(pagination.has_prev and pagination.has_next)
+        last = KeysetPagination(SubmissionStatus.query, SubmissionStatus.id, 2, after=pagination.next_cursor)
+        self.assertTrue([s.id for s in last.items] == [1])
+        self.assertFalse(last.has_next)
+        pagination = KeysetPagination(SubmissionStatus.query, SubmissionStatus.id, 2, before=last.prev_cursor)
+        self.assertTrue([s.id for s in pagination.items] == [3, 2])
+        # the front is reached, show a full first page
+        pagination = KeysetPagination(SubmissionStatus.query, SubmissionStatus.id, 2, before=4)
+        self.assertTrue([s.id for s in pagination.items] == [5, 4])
+        self.assertFalse(pagination.has_prev)
+        pagination = KeysetPagination(SubmissionStatus.query, SubmissionStatus.id, 2, page=3, descending=False)
+        self.assertTrue([s.id for s in pagination.items] == [5])
+        # links in the page
+        self.app.config['FLASKY_STATUS_PER_PAGE'] = 2
+        response = self.client.get(url_for('status.status_list'))
+        self.assertTrue(b'/status/?after=4' in response.data)
+        response = self.client.get(url_for('status.status_list', after=4))
+        self.assertTrue(b'<td>3</td>' in response.data)
+        self.assertFalse(b'<td>4</td>' in response.data)
+        self.assertTrue(b'/status/?before=3' in response.data)
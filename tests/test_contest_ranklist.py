@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest, os
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import User, Role, Problem, Contest, ContestUsers, ContestProblem, SubmissionStatus
+from app.contest import ranklist as ranklist_module
+from app.contest.ranklist import ContestRanklist, get_ranklist, invalidate_ranklist, generate_snapshot, load_snapshot, request_snapshot, bump_generation
+
+
+class RanklistTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test model
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        Role.insert_roles()
+        self.start = datetime(2017, 1, 1, 10, 0, 0)
+        self.contest = Contest(contest_name='test', start_time=self.start, end_time=self.start + timedelta(hours=5))
+        db.session.add(self.contest)
+        for name in ['u1', 'u2']:
+            u = User(username=name, email='%s@test.com' % name, password='123456')
+            db.session.add(u)
+            db.session.commit()
+            db.session.add(ContestUsers(user_id=u.id, contest_id=self.contest.id, realname=name, user_confirmed=True))
+        for i in range(2):
+            p = Problem(title='p%d' % i)
+            db.session.add(p)
+            db.session.commit()
+            db.session.add(ContestProblem(problem_id=p.id, contest_id=self.contest.id, problem_index=1000 + i))
+        db.session.commit()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test model
+        :return: None
+        '''
+
+        db.session.remove()
+        db.drop_all()
+        files = os.listdir('./app/static/photo')
+        for f in files:
+            if f[0] != '.':
+                os.remove(os.path.join('./app/static/photo', f))
+        self.app_context.pop()
+
+    def submit(self, username, problem_id, status, minutes):
+
+        '''
+            add a submission to the contest
+        :return: submission
+        '''
+
+        s = SubmissionStatus(author_username=username, problem_id=problem_id, status=status, contest_id=self.contest.id,
+                             submit_time=self.start + timedelta(minutes=minutes))
+        db.session.add(s)
+        db.session.commit()
+        return s
+
+    def test_rows(self):
+
+        '''
+            test the ranklist generated from one scan
+        :return: None
+        '''
+
+        self.submit('u1', 1, 3, 5)
+        self.submit('u1', 1, 1, 10)
+        self.submit('u2', 1, 1, 8)
+        self.submit('u2', 2, 1, 30)
+        ranklist = ContestRanklist(self.contest.id)
+        self.assertTrue(ranklist.refresh() == 4)
+        rows = ranklist.rows(self.contest, self.contest.problems.all())
+        self.assertTrue(rows[0]['username'] == 'u2')
+        self.assertTrue(rows[0]['total_ac'] == 2)
+        self.assertTrue(rows[0]['total_time'] == 38)
+        self.assertTrue(rows[0]['submission_detail'][1001]['first_blood'])
+        self.assertFalse(rows[0]['submission_detail'][1000]['first_blood'])
+        self.assertTrue(rows[1]['submission_detail'][1000]['submission_num'] == 2)
+        self.assertTrue(rows[1]['submission_detail'][1000]['time'] == 30)
+        self.assertTrue(rows[1]['submission_detail'][1000]['first_blood'])
+
+    def test_refresh_delta(self):
+
+        '''
+            test only new submissions and new verdicts are applied
+        :return: None
+        '''
+
+        ranklist = get_ranklist(self.contest.id)
+        s = self.submit('u1', 1, 0, 5)
+        self.assertTrue(ranklist.refresh() == 1)
+        self.assertTrue(s.id in ranklist.pending)
+        self.assertTrue(ranklist.refresh() == 0)
+        s.status = 1
+        db.session.add(s)
+        db.session.commit()
+        self.assertTrue(ranklist.refresh() == 1)
+        self.assertFalse(s.id in ranklist.pending)
+        rows = ranklist.rows(self.contest, self.contest.problems.all())
+        self.assertTrue(rows[0]['username'] == 'u1')
+        self.assertTrue(rows[0]['total_ac'] == 1)
+        invalidate_ranklist(self.contest.id)
+        self.assertFalse(get_ranklist(self.contest.id) is ranklist)
+
+    def test_refresh_late_commit(self):
+
+        '''
+            test a submission committed after one with a bigger id is applied
+        :return: None
+        '''
+
+        ranklist = ContestRanklist(self.contest.id)
+        late = SubmissionStatus(id=10, author_username='u1', problem_id=1, status=1, contest_id=self.contest.id)
+        db.session.add(late)
+        db.session.commit()
+        self.assertTrue(ranklist.refresh() == 1)
+        self.assertTrue(ranklist.last_id == 0)
+        s = SubmissionStatus(id=5, author_username='u1', problem_id=1, status=3, contest_id=self.contest.id)
+        db.session.add(s)
+        db.session.commit()
+        # the young submission is read again but applied once
+        self.assertTrue(ranklist.refresh() == 1)
+        self.assertTrue([entry[0] for entry in ranklist.cells[('u1', 1)]] == [5, 10])
+        self.app.config['RANKLIST_SUBMIT_GRACE'] = 0
+        self.assertTrue(ranklist.refresh() == 0)
+        self.assertTrue(ranklist.last_id == 10)
+        self.assertTrue(ranklist.recent == set())
+
+    def test_generation(self):
+
+        '''
+            test a changed final verdict is applied after the generation is bumped
+        :return: None
+        '''
+
+        s = self.submit('u1', 1, 1, 5)
+        ranklist = ContestRanklist(self.contest.id)
+        self.assertTrue(ranklist.refresh() == 1)
+        s.status = 3
+        db.session.add(s)
+        db.session.commit()
+        # final verdicts are not read again
+        self.assertTrue(ranklist.refresh() == 0)
+        self.assertTrue(ranklist.rows(self.contest, self.contest.problems.all())[0]['total_ac'] == 1)
+        bump_generation(self.contest.id)
+        db.session.commit()
+        self.assertTrue(ranklist.refresh() == 1)
+        self.assertTrue(ranklist.rows(self.contest, self.contest.problems.all())[0]['total_ac'] == 0)
+        self.assertTrue(ranklist.refresh() == 0)
+
+    def test_frozen_rows(self):
+
+        '''
+            test submissions after the frozen time are ignored
+        :return: None
+        '''
+
+        self.submit('u1', 1, 1, 250)
+        ranklist = ContestRanklist(self.contest.id)
+        ranklist.refresh()
+        rows = ranklist.rows(self.contest, self.contest.problems.all(), until=self.start + timedelta(hours=4))
+        self.assertTrue(rows[0]['total_ac'] == 0)
+        self.assertTrue(rows[0]['submission_detail'][1000]['submission_num'] == 0)
+
+    def test_snapshot(self):
+
+        '''
+            test the public snapshot is frozen and the admin snapshot is not
+        :return: None
+        '''
+
+        self.contest.rank_frozen = True
+        db.session.add(self.contest)
+        self.submit('u1', 1, 1, 10)
+        self.submit('u2', 1, 1, 250)
+        self.assertTrue(generate_snapshot(self.contest.id) == 1)
+        admin = load_snapshot(self.contest.id, admin=True)
+        public = load_snapshot(self.contest.id)
+        self.assertTrue(admin['problems'] == [1000, 1001])
+        self.assertTrue([row['total_ac'] for row in admin['rows']] == [1, 1])
+        self.assertTrue(public['frozen'])
+        self.assertTrue([row['total_ac'] for row in public['rows']] == [1, 0])
+        self.assertTrue(public['rows'][0]['cells'][0] == [1, 1, 10, 1])
+        self.assertTrue(generate_snapshot(self.contest.id) == 2)
+
+    def test_request_snapshot(self):
+
+        '''
+            test only one request sends the task during the refresh interval
+        :return: None
+        '''
+
+        self.contest.last_generate_rank = datetime.utcnow() - timedelta(minutes=1)
+        self.contest.start_time = datetime.utcnow() - timedelta(hours=1)
+        self.contest.end_time = datetime.utcnow() + timedelta(hours=1)
+        db.session.add(self.contest)
+        db.session.commit()
+        contest_id = self.contest.id
+        self.assertTrue(request_snapshot(self.contest))
+        self.assertTrue(load_snapshot(contest_id) is not None)
+        self.assertFalse(request_snapshot(Contest.query.get(contest_id)))
+        # forced requests share the claim, with a shorter interval
+        self.assertFalse(request_snapshot(Contest.query.get(contest_id), force=True))
+        self.app.config['RANKLIST_RETRY_INTERVAL'] = 0
+        self.assertTrue(request_snapshot(Contest.query.get(contest_id), force=True))
+        self.assertTrue(load_snapshot(contest_id)['version'] == 2)
+
+    def test_request_snapshot_never_generated(self):
+
+        '''
+            test a contest without last_generate_rank asks for the first snapshot
+        :return: None
+        '''
+
+        self.contest.start_time = datetime.utcnow() - timedelta(hours=1)
+        self.contest.end_time = datetime.utcnow() + timedelta(hours=1)
+        self.contest.last_generate_rank = None
+        db.session.add(self.contest)
+        db.session.commit()
+        self.assertTrue(request_snapshot(self.contest))
+
+    def test_request_snapshot_broker_down(self):
+
+        '''
+            test the view keeps working when the task can not be sent
+        :return: None
+        '''
+
+        class BrokenTask(object):
+
+            @staticmethod
+            def apply_async(*args, **kwargs):
+                raise IOError('broker down')
+
+        task = ranklist_module.generate_ranklist_snapshot
+        ranklist_module.generate_ranklist_snapshot = BrokenTask
+        try:
+            self.assertFalse(request_snapshot(self.contest, force=True))
+        finally:
+            ranklist_module.generate_ranklist_snapshot = task
+        self.assertTrue(load_snapshot(self.contest.id) is None)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from app import create_app, db
+from app.explain import explain_hot_queries
+
+class ExplainTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test explain
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test explain
+        :return: None
+        '''
+
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_hot_queries(self):
+
+        '''
+            test the hot queries are served by the indexes
+        :return: None
+        '''
+
+        for name, lines, scans in explain_hot_queries():
+            self.assertTrue(scans == [], '%s: %s' % (name, lines))
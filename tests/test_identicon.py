@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import random
+from app import identicon
+
+class IdenticonTestCase(unittest.TestCase):
+
+    def test_mask_renderer(self):
+
+        '''
+            test the mask renderer gives the same image as the old one
+        :return: None
+        '''
+
+        for size in (16, 37, 128):
+            codes = [random.randint(1, 1000000000000) for i in range(20)] + [0, 0xffffffff, 0x0f]
+            images = identicon.render_identicons(codes, size, raw=True)
+            for code, image in zip(codes, images):
+                self.assertTrue(identicon.render_identicon(code, size).tobytes() == image)
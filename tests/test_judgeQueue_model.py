@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from datetime import datetime, timedelta
+from app.models import JudgeQueue, SubmissionStatus, Problem, OJList
+
+class JudgeQueueModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test model
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test model
+        :return: None
+        '''
+
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_submission(self, language=None, problem_id=None):
+
+        '''
+            add a waiting submission into the queue
+        :return: submission
+        '''
+
+        submission = SubmissionStatus(status=0, language=language, problem_id=problem_id)
+        db.session.add(submission)
+        JudgeQueue.enqueue(submission)
+        db.session.commit()
+        return submission
+
+    def test_claim(self):
+
+        '''
+            test claim gives every submission to one judger in order
+        :return: None
+        '''
+
+        s1 = self.add_submission()
+        s2 = self.add_submission()
+        self.assertTrue(JudgeQueue.claim('judger1').id == s1.id)
+        self.assertTrue(JudgeQueue.claim('judger2').id == s2.id)
+        self.assertIsNone(JudgeQueue.claim('judger1'))
+        self.assertTrue(SubmissionStatus.query.get(s1.id).status == 10)
+        item = JudgeQueue.query.filter_by(submission_id=s1.id).first()
+        self.assertTrue(item.lease_owner == 'judger1')
+        self.assertTrue(item.attempts == 1)
+
+    def test_ack(self):
+
+        '''
+            test the item is removed after the verdict
+        :return: None
+        '''
+
+        s = self.add_submission()
+        JudgeQueue.claim('judger1')
+        JudgeQueue.ack(s.id)
+        db.session.commit()
+        self.assertTrue(JudgeQueue.query.count() == 0)
+
+    def test_lease(self):
+
+        '''
+            test the expired lease is reclaimed and the lease can be renewed by its token only
+        :return: None
+        '''
+
+        s = self.add_submission()
+        token = JudgeQueue.claim('judger').lease_token
+        self.assertTrue(JudgeQueue.renew(s.id, token))
+        self.assertFalse(JudgeQueue.renew(s.id, 'other'))
+        self.assertFalse(JudgeQueue.renew(s.id, None))
+        JudgeQueue.query.update({JudgeQueue.lease_expire: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        # another worker of the same judger account
+        claimed = JudgeQueue.claim('judger')
+        self.assertTrue(claimed.id == s.id and claimed.lease_token != token)
+        self.assertFalse(JudgeQueue.renew(s.id, token))
+        self.assertTrue(JudgeQueue.renew(s.id, claimed.lease_token))
+
+    def test_max_attempts(self):
+
+        '''
+            test the submission crashing judgers gets judge error
+        :return: None
+        '''
+
+        s = self.add_submission()
+        for i in range(self.app.config['JUDGE_MAX_ATTEMPTS']):
+            self.assertTrue(JudgeQueue.claim('judger1', lease=-1).id == s.id)
+        self.assertIsNone(JudgeQueue.claim('judger1'))
+        self.assertTrue(JudgeQueue.query.count() == 0)
+        self.assertTrue(SubmissionStatus.query.get(s.id).status == 11)
+
+    def test_claim_many(self):
+
+        '''
+            test batch claim with the language and oj filters
+        :return: None
+        '''
+
+        oj1 = OJList(name='local')
+        oj2 = OJList(name='remote')
+        db.session.add_all([oj1, oj2])
+        db.session.commit()
+        p1 = Problem(title='p1', oj_id=oj1.id)
+        p2 = Problem(title='p2', oj_id=oj2.id)
+        db.session.add_all([p1, p2])
+        db.session.commit()
+        s1 = self.add_submission(1, p1.id)
+        s2 = self.add_submission(6, p1.id)
+        s3 = self.add_submission(1, p2.id)
+        s4 = self.add_submission(1, p1.id)
+        self.assertTrue([s.id for s in JudgeQueue.claim_many('judger1', 2, oj_id=oj2.id)] == [s3.id])
+        self.assertTrue([s.id for s in JudgeQueue.claim_many('judger1', 5, language=1)] == [s1.id, s4.id])
+        self.assertTrue([s.id for s in JudgeQueue.claim_many('judger2', 5)] == [s2.id])
+        self.assertTrue(JudgeQueue.claim_many('judger2', 5) == [])
+        self.assertTrue(SubmissionStatus.query.filter_by(status=10).count() == 4)
+
+    def test_claim_payload(self):
+
+        '''
+            test the claimed submissions are serialized without more queries
+        :return: None
+        '''
+
+        oj = OJList(name='local')
+        db.session.add(oj)
+        db.session.commit()
+        problems = [Problem(title='p%d' % i, oj_id=oj.id) for i in range(3)]
+        db.session.add_all(problems)
+        db.session.commit()
+        for p in problems:
+            submission = self.add_submission(1, p.id)
+            submission.code = u'int main() {}'
+            db.session.commit()
+        submissions = JudgeQueue.claim_many('judger1', 5)
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            payload = [submission.to_json() for submission in submissions]
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertTrue(statements == [])
+        self.assertTrue([item['oj'] for item in payload] == ['local'] * 3)
+        self.assertTrue(payload[0]['code'] == 'aW50IG1haW4oKSB7fQ==')
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import sys
+from io import BytesIO
+import manage
+
+class ManageTestCase(unittest.TestCase):
+
+    def tearDown(self):
+
+        '''
+            tear down func for test manage
+        :return: None
+        '''
+
+        sys.stdout = sys.__stdout__
+
+    def test_bench_api(self):
+
+        '''
+            test the api benchmark runs on the scratch database
+        :return: None
+        '''
+
+        sys.stdout = output = BytesIO()
+        manage.bench_api(num=2)
+        sys.stdout = sys.__stdout__
+        lines = output.getvalue().splitlines()
+        self.assertTrue(len(lines) == 4)
+        self.assertTrue(lines[0].startswith('password cache ttl    0s'))
+        self.assertTrue(lines[3].startswith('token'))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest, time
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import User
+from app.presence import touch, flush, online_count
+
+class PresenceTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test presence
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test presence
+        :return: None
+        '''
+
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_touch(self):
+
+        '''
+            test last_seen is written in batches, once per user in the interval
+        :return: None
+        '''
+
+        old = datetime.utcnow() - timedelta(hours=1)
+        users = [User(username='u%d' % i, email='u%d@test.com' % i, photo='1', last_seen=old) for i in range(3)]
+        db.session.add_all(users)
+        db.session.commit()
+        ids = [u.id for u in users]
+        self.assertTrue(online_count() == 0)
+        touch(ids[0])
+        touch(ids[1])
+        touch(ids[0])
+        self.assertTrue(sorted(self.app.extensions['presence']['pending'].keys()) == sorted(ids[:2]))
+        self.assertTrue(online_count() == 0)
+        self.assertTrue(flush() == 2)
+        self.assertTrue(online_count() == 2)
+        touch(ids[0])
+        self.assertTrue(flush() == 0)
+        self.app.config['PRESENCE_BATCH_SIZE'] = 1
+        touch(ids[2])
+        self.assertTrue(self.app.extensions['presence']['pending'] == {})
+        self.assertTrue(online_count() == 3)
+
+    def test_background_flush(self):
+
+        '''
+            test a batch is written by its timer without another request
+        :return: None
+        '''
+
+        self.app.config['PRESENCE_BACKGROUND_FLUSH'] = True
+        self.app.config['PRESENCE_BATCH_DELAY'] = 0.1
+        u = User(username='u', email='u@test.com', photo='1', last_seen=datetime.utcnow() - timedelta(hours=1))
+        db.session.add(u)
+        db.session.commit()
+        touch(u.id)
+        self.assertTrue(online_count() == 0)
+        for i in range(50):
+            time.sleep(0.1)
+            db.session.remove()
+            if online_count() == 1:
+                break
+        self.assertTrue(online_count() == 1)
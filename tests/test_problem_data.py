@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest, os, io, time, shutil, hashlib, tempfile, zipfile
+from app import create_app
+from app.admin.problem_data import save_file, read_manifest, rebuild_manifest, upload_offset, write_chunk, finish_upload, \
+    clean_uploads, data_dir
+
+class ProblemDataTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test problem data
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.directory = tempfile.mkdtemp()
+        self.app.config['UPLOADED_PATH'] = self.directory
+
+    def tearDown(self):
+
+        '''
+            tear down func for test problem data
+        :return: None
+        '''
+
+        shutil.rmtree(self.directory)
+        self.app_context.pop()
+
+    def test_save_file(self):
+
+        '''
+            test the files are hashed in the manifest, the same content is not written again
+        :return: None
+        '''
+
+        self.assertTrue(save_file(1, '1.in', io.BytesIO(b'1 2\n')) == [('1.in', 'created')])
+        self.assertTrue(save_file(1, '1.in', io.BytesIO(b'1 2\n')) == [('1.in', 'unchanged')])
+        self.assertTrue(save_file(1, '../1.out', io.BytesIO(b'3\n')) == [('1.out', 'created')])
+        self.assertTrue(save_file(1, '1.in', io.BytesIO(b'2 3\n')) == [('1.in', 'updated')])
+        manifest = read_manifest(1)
+        self.assertTrue(manifest['version'] == 3)
+        self.assertTrue(manifest['files']['1.in'] == {'size': 4, 'sha256': hashlib.sha256(b'2 3\n').hexdigest()})
+        self.assertTrue(sorted(os.listdir(data_dir(1))) == ['.manifest.lock', '1.in', '1.out', 'manifest.json'])
+        self.assertRaises(ValueError, save_file, 1, 'manifest.json', io.BytesIO(b'{}'))
+        self.assertTrue(read_manifest(2) == {'version': 0, 'files': {}})
+
+        # files put by hand are found by a rebuild
+        with open(os.path.join(data_dir(1), '2.in'), 'wb') as f:
+            f.write(b'5')
+        manifest = rebuild_manifest(1)
+        self.assertTrue(manifest['version'] == 4 and sorted(manifest['files']) == ['1.in', '1.out', '2.in'])
+        self.assertTrue(rebuild_manifest(1)['version'] == 4)
+
+    def test_zip(self):
+
+        '''
+            test a zip archive is extracted file by file
+        :return: None
+        '''
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as f:
+            f.writestr('data/', b'')
+            f.writestr('data/1.in', b'1' * 100000)
+            f.writestr('data/1.out', b'2')
+        archive.seek(0)
+        self.assertTrue(save_file(1, 'data.zip', archive) == [('1.in', 'created'), ('1.out', 'created')])
+        self.assertTrue(read_manifest(1)['files']['1.in']['size'] == 100000)
+        self.assertTrue(sorted(name for name in os.listdir(data_dir(1)) if not name.startswith('.')) == ['1.in', '1.out', 'manifest.json'])
+        self.assertRaises(ValueError, save_file, 1, 'broken.zip', io.BytesIO(b'not a zip'))
+        self.assertTrue(sorted(name for name in os.listdir(data_dir(1)) if not name.startswith('.')) == ['1.in', '1.out', 'manifest.json'])
+        # names clashing once flattened, or without a safe name, reject the whole archive
+        for names in (['a/1.in', 'b/1.in', '2.in'], ['2.in', u'\u6570\u636e']):
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, 'w') as f:
+                for name in names:
+                    f.writestr(name, b'3')
+            archive.seek(0)
+            self.assertRaises(ValueError, save_file, 1, 'bad.zip', archive)
+            self.assertTrue(sorted(name for name in os.listdir(data_dir(1)) if not name.startswith('.')) == ['1.in', '1.out', 'manifest.json'])
+
+    def test_resumable_upload(self):
+
+        '''
+            test the chunks are appended at the received size, a chunk sent again is refused with the size
+        :return: None
+        '''
+
+        os.makedirs(data_dir(1))
+        self.assertTrue(upload_offset(1, 'abc') == 0)
+        self.assertTrue(write_chunk(1, 'abc', 0, io.BytesIO(b'12345')) == (5, True))
+        self.assertTrue(write_chunk(1, 'abc', 0, io.BytesIO(b'12345')) == (5, False))
+        self.assertTrue(write_chunk(1, 'abc', 8, io.BytesIO(b'9')) == (5, False))
+        self.assertTrue(upload_offset(1, 'abc') == 5)
+        self.assertTrue(write_chunk(1, 'abc', 5, io.BytesIO(b'678')) == (8, True))
+        self.assertTrue(finish_upload(1, 'abc', 'big.in') == [('big.in', 'created')])
+        with open(os.path.join(data_dir(1), 'big.in'), 'rb') as f:
+            self.assertTrue(f.read() == b'12345678')
+        self.assertTrue(upload_offset(1, 'abc') == 0)
+        self.assertRaises(ValueError, upload_offset, 1, '../abc')
+
+        write_chunk(1, 'old', 0, io.BytesIO(b'1'))
+        write_chunk(1, 'new', 0, io.BytesIO(b'1'))
+        old = os.path.join(data_dir(1), '.uploads', 'old.part')
+        os.utime(old, (time.time() - self.app.config['UPLOAD_KEEP'] - 1,) * 2)
+        self.assertTrue(clean_uploads() == 1)
+        self.assertTrue(upload_offset(1, 'old') == 0 and upload_offset(1, 'new') == 1)
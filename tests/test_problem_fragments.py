@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Problem, Contest, ContestProblem, ProblemFragment
+from app.problem.fragments import get_body, fragment_version, prewarm_contest_problems
+from app.cache import get_problem_meta
+
+class ProblemFragmentsTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test fragments
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test fragments
+        :return: None
+        '''
+
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_get_body(self):
+
+        '''
+            test the body is rendered once per version of the statement
+        :return: None
+        '''
+
+        p = Problem(title='p1', description='<b>old</b>', source_name='src')
+        db.session.add(p)
+        db.session.commit()
+        version = fragment_version(p)
+        self.assertTrue(get_problem_meta(p.id)['body_version'] == version)
+        body = get_body(p.id, version, 'problem')
+        self.assertTrue('<b>old</b>' in body and 'src' in body)
+        self.assertFalse('src' in get_body(p.id, version, 'contest'))
+        self.assertTrue(ProblemFragment.query.get((p.id, 'problem')).version == version)
+        # an edit in the same second of last_update still changes the version
+        p.description = '<b>new</b>'
+        db.session.commit()
+        self.assertFalse(fragment_version(p) == version)
+        self.assertTrue('<b>old</b>' in get_body(p.id, version, 'problem'))
+        self.assertTrue('<b>new</b>' in get_body(p.id, fragment_version(p), 'problem'))
+
+    def test_long_body(self):
+
+        '''
+            test a statement longer than TEXT is stored as it is
+        :return: None
+        '''
+
+        p = Problem(title='p1', description='x' * 70000)
+        db.session.add(p)
+        db.session.commit()
+        get_body(p.id, fragment_version(p), 'problem')
+        self.assertTrue('x' * 70000 in ProblemFragment.query.get((p.id, 'problem')).html)
+
+    def test_prewarm(self):
+
+        '''
+            test the problems of the contests about to start are rendered
+        :return: None
+        '''
+
+        now = datetime.utcnow()
+        p1 = Problem(title='p1', description='soon')
+        p2 = Problem(title='p2', description='later')
+        c1 = Contest(contest_name='c1', start_time=now + timedelta(seconds=60), end_time=now + timedelta(hours=5))
+        c2 = Contest(contest_name='c2', start_time=now + timedelta(days=1), end_time=now + timedelta(days=2))
+        db.session.add_all([p1, p2, c1, c2])
+        db.session.commit()
+        db.session.add_all([ContestProblem(contest_id=c1.id, problem_id=p1.id, problem_index=1000),
+                            ContestProblem(contest_id=c2.id, problem_id=p2.id, problem_index=1000)])
+        db.session.commit()
+        soon, later = p1.id, p2.id
+        prewarm_contest_problems.delay()
+        self.assertTrue('soon' in ProblemFragment.query.get((soon, 'contest')).html)
+        self.assertIsNone(ProblemFragment.query.get((later, 'contest')))
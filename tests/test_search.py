@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest, os, shutil, tempfile
+from app import create_app, db
+from app.models import Problem, ProblemChange
+from app.problem.search import tokenize, SearchIndex, get_search_index, record_problem_changes, write_search_index, search_problems
+import app.problem.search as search_module
+
+class SearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test search
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test search
+        :return: None
+        '''
+
+        shutil.rmtree(self.directory)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_problems(self, *problems):
+
+        '''
+            add problems
+        :param problems: dicts of the columns
+        :return: [problem id]
+        '''
+
+        problems = [Problem(**problem) for problem in problems]
+        db.session.add_all(problems)
+        db.session.commit()
+        return [problem.id for problem in problems]
+
+    def test_tokenize(self):
+
+        '''
+            test latin words, CJK bigrams and markup
+        :return: None
+        '''
+
+        self.assertTrue(tokenize(u'A+B Problem') == [u'a', u'b', u'problem'])
+        self.assertTrue(tokenize(u'最短路径 Dijkstra') == [u'最短', u'短路', u'路径', u'dijkstra'])
+        self.assertTrue(tokenize(u'<p>给定n个数&nbsp;求和</p>') == [u'给定', u'n', u'个数', u'求和'])
+        self.assertTrue(tokenize(u'图') == [u'图'])
+        self.assertTrue(tokenize(None) == [])
+
+    def test_search(self):
+
+        '''
+            test the ranking, the visible filter and single characters
+        :return: None
+        '''
+
+        ids = self.add_problems({'title': u'网络流', 'description': u'最大流', 'visible': True},
+                                {'title': u'最大流', 'description': u'网络流 模板', 'visible': True},
+                                {'title': u'hidden', 'source_name': u'最大流', 'visible': False},
+                                {'title': u'A+B', 'author': u'Tom', 'visible': True})
+        index = get_search_index()
+        self.assertTrue(index.search(u'最大流') == [ids[1], ids[0]])
+        self.assertTrue(sorted(index.search(u'最大流', visible_only=False)) == ids[:3])
+        self.assertTrue(index.search(u'最大流 模板') == [ids[1]])
+        self.assertTrue(index.search(u'tom') == [ids[3]])
+        self.assertTrue(sorted(index.search(u'流')) == ids[:2])
+        self.assertTrue(index.search(u'最小流') == [])
+        self.assertTrue(index.search(u'  ') == [])
+
+    def test_changes(self):
+
+        '''
+            test the workers follow the changed problems
+        :return: None
+        '''
+
+        ids = self.add_problems({'title': u'old', 'visible': True}, {'title': u'old', 'visible': True})
+        index = get_search_index()
+        self.assertTrue(index.search(u'old') == ids)
+        Problem.query.filter_by(id=ids[0]).update({Problem.title: u'new'})
+        Problem.query.filter_by(id=ids[1]).delete()
+        db.session.commit()
+        record_problem_changes(ids)
+        self.assertTrue(get_search_index().search(u'old') == [])
+        self.assertTrue(get_search_index().search(u'new') == ids[:1])
+        self.assertTrue(ids[1] not in get_search_index().docs)
+
+        # another worker catches up from its last change
+        self.app.config['SEARCH_CHANGE_BATCH'] = 1
+        other = SearchIndex()
+        self.assertTrue(other.catch_up() == 2)
+        self.assertTrue(other.search(u'new') == ids[:1] and other.last_change == get_search_index().last_change)
+
+    def test_index_file(self):
+
+        '''
+            test the index file is written, read by new workers and replaces the pruned changes
+        :return: None
+        '''
+
+        path = os.path.join(self.directory, 'index', 'search_index.marshal')
+        self.app.config['SEARCH_INDEX_PATH'] = path
+        ids = self.add_problems({'title': u'题目一', 'visible': True})
+        record_problem_changes(ids)
+        # the recent changes are kept, a lower id may still be committed
+        write_search_index()
+        self.assertTrue(ProblemChange.query.count() == 1 and SearchIndex.load(path).last_change == 0)
+        os.remove(path)
+
+        # the missing file is written by the task
+        self.app.config['SEARCH_CHANGE_GRACE'] = 0
+        request = search_module.request_search_index
+        search_module.request_search_index = write_search_index
+        try:
+            self.assertTrue(get_search_index() is None)
+        finally:
+            search_module.request_search_index = request
+        self.assertTrue(os.path.exists(path))
+        loaded = SearchIndex.load(path)
+        self.assertTrue(loaded.search(u'题目') == ids and loaded.last_change == 1)
+        self.assertTrue(get_search_index().search(u'题目') == ids)
+
+        # the beat writes a new file and prunes the changes in it
+        ids += self.add_problems({'title': u'题目二', 'visible': True})
+        record_problem_changes(ids[1:])
+        change_id = db.session.query(db.func.max(ProblemChange.id)).scalar()
+        self.app.extensions['search_index']['index'].last_change = 0
+        write_search_index()
+        self.assertTrue(ProblemChange.query.count() == 0)
+        self.assertTrue(get_search_index().search(u'题目') == ids)
+        self.assertTrue(get_search_index().last_change == change_id)
+
+        # a new worker starts from the file
+        del self.app.extensions['search_index']
+        self.assertTrue(get_search_index().search(u'题目二') == ids[1:])
+
+        with open(path, 'wb') as f:
+            f.write(b'broken')
+        self.assertTrue(SearchIndex.load(path) is None)
+
+    def test_pruned_changes(self):
+
+        '''
+            test an index missing the changes pruned by the beat of another host is written again on this host
+        :return: None
+        '''
+
+        path = os.path.join(self.directory, 'search_index.marshal')
+        self.app.config['SEARCH_INDEX_PATH'] = path
+        self.app.config['SEARCH_CHANGE_GRACE'] = 0
+        ids = self.add_problems({'title': u'local', 'visible': True})
+        record_problem_changes(ids)
+        write_search_index(prune=False)
+        self.assertTrue(get_search_index().search(u'local') == ids)
+
+        # the beat of another host writes its own file
+        ids += self.add_problems({'title': u'remote', 'visible': True})
+        record_problem_changes(ids[1:])
+        self.app.config['SEARCH_INDEX_PATH'] = os.path.join(self.directory, 'other.marshal')
+        write_search_index()
+        self.app.config['SEARCH_INDEX_PATH'] = path
+        self.assertTrue(ProblemChange.query.count() == 0)
+
+        # the old index is used while the task of this host writes the file
+        self.assertTrue(SearchIndex.load(path).catch_up() is None)
+        # every call checks the changes and the file
+        self.app.config['SEARCH_CHECK_INTERVAL'] = 0
+        self.assertTrue(get_search_index().search(u'remote') == [])
+        self.assertTrue(SearchIndex.load(path).last_change == 2)
+        self.assertTrue(get_search_index().search(u'remote') == ids[1:])
+        self.assertTrue(get_search_index().catch_up() == 0)
+
+    def test_change_gap(self):
+
+        '''
+            test the changes after a missing id wait for it until SEARCH_CHANGE_GRACE seconds passed
+        :return: None
+        '''
+
+        ids = self.add_problems({'title': u'gap', 'visible': True}, {'title': u'gap', 'visible': True})
+        # id 2 is not committed yet, or rolled back
+        db.session.add_all([ProblemChange(id=1, problem_id=ids[0]), ProblemChange(id=3, problem_id=ids[1])])
+        db.session.commit()
+        self.assertTrue(SearchIndex.build().last_change == 0)
+        index = SearchIndex()
+        self.assertTrue(index.catch_up() == 1 and index.last_change == 1)
+        self.assertTrue(index.catch_up() == 0 and index.last_change == 1)
+        self.app.config['SEARCH_CHANGE_GRACE'] = 0
+        self.assertTrue(index.catch_up() == 1 and index.last_change == 3)
+        self.assertTrue(index.search(u'gap') == ids)
+
+    def test_like_fallback(self):
+
+        '''
+            test the words are matched by LIKE while the index file is written, the task is asked once
+        :return: None
+        '''
+
+        self.app.config['SEARCH_INDEX_PATH'] = os.path.join(self.directory, 'search_index.marshal')
+        ids = self.add_problems({'title': u'A+B_1', 'visible': True}, {'title': u'a+b', 'description': u'100%', 'visible': False},
+                                {'title': u'最大流', 'visible': True})
+        requests = []
+        request = search_module.request_search_index
+        search_module.request_search_index = lambda: requests.append(1) or True
+        try:
+            self.assertTrue(search_problems(u'a+b') == ids[:1])
+            self.assertTrue(search_problems(u'A+B 100%', visible_only=False) == ids[1:2])
+            self.assertTrue(search_problems(u'_') == ids[:1])
+            self.assertTrue(search_problems(u'大流') == ids[2:])
+            self.assertTrue(search_problems(u'  ') == [])
+            self.assertTrue(requests == [1])
+        finally:
+            search_module.request_search_index = request
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from app import create_app, db
+from app.models import SourceCode, SubmissionStatus
+
+class SourceCodeModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test model
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test model
+        :return: None
+        '''
+
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_store(self):
+
+        '''
+            test the same code is stored once and the long code is compressed
+        :return: None
+        '''
+
+        short = SourceCode.store(u'int main() { puts("你好"); }')
+        self.assertFalse(short.compressed)
+        self.assertTrue(SourceCode.store(u'int main() { puts("你好"); }').id == short.id)
+        long_code = u'a = 1\n' * 1000
+        source = SourceCode.store(long_code)
+        self.assertTrue(source.compressed)
+        self.assertTrue(len(source.content) < len(long_code))
+        self.assertTrue(source.text == long_code)
+        self.assertTrue(SourceCode.query.count() == 2)
+
+    def test_submission_code(self):
+
+        '''
+            test the code of submissions
+        :return: None
+        '''
+
+        s1 = SubmissionStatus(code=u'print 1')
+        s2 = SubmissionStatus(code=u'print 1')
+        s3 = SubmissionStatus()
+        db.session.add_all([s1, s2, s3])
+        db.session.commit()
+        self.assertTrue(s1.source_id == s2.source_id)
+        self.assertTrue(SubmissionStatus.query.get(s2.id).code == u'print 1')
+        self.assertIsNone(s3.code)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Statistic, SubmissionStatus, Problem
+from app.statistics import count_problem_submissions
+
+class StatisticModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test model
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test model
+        :return: None
+        '''
+
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_record(self):
+
+        '''
+            test status changes move the counts between buckets
+        :return: None
+        '''
+
+        Statistic.record([('test', 1, None, 0), ('test', 2, None, 0)])
+        db.session.commit()
+        self.assertTrue(Statistic.histogram('user', 'test') == {0: 2})
+        Statistic.record([('test', 1, 0, 10), ('test', 2, 0, 10)])
+        Statistic.record([('test', 1, 10, '1'), ('test', 2, 10, 3)])
+        db.session.commit()
+        self.assertTrue(Statistic.histogram('user', 'test') == {0: 0, 10: 0, 1: 1, 3: 1})
+        self.assertTrue(Statistic.histogram('problem', 1) == {0: 0, 10: 0, 1: 1})
+        self.assertTrue(Statistic.histogram('user', 'other') == {})
+
+    def test_set_status(self):
+
+        '''
+            test bulk status change keeps the histograms
+        :return: None
+        '''
+
+        for i in range(3):
+            s = SubmissionStatus(author_username='test', problem_id=1, status=0)
+            db.session.add(s)
+            Statistic.record([('test', 1, None, 0)])
+        db.session.commit()
+        SubmissionStatus.set_status([1, 2], 10)
+        db.session.commit()
+        self.assertTrue(SubmissionStatus.query.filter_by(status=10).count() == 2)
+        self.assertTrue(Statistic.histogram('problem', 1) == {0: 1, 10: 2})
+
+    def test_reconcile(self):
+
+        '''
+            test reconcile rebuilds the histograms from the submissions
+        :return: None
+        '''
+
+        db.session.add(SubmissionStatus(author_username='u1', problem_id=1, status=1))
+        db.session.add(SubmissionStatus(author_username='u1', problem_id=2, status=1))
+        db.session.add(SubmissionStatus(author_username='u2', problem_id=1, status=3))
+        Statistic.record([('u1', 1, None, 6), ('u3', 3, None, 0)])
+        db.session.commit()
+        self.assertTrue(Statistic.reconcile() == 5)
+        self.assertTrue(Statistic.histogram('user', 'u1') == {1: 2})
+        self.assertTrue(Statistic.histogram('user', 'u3') == {})
+        self.assertTrue(Statistic.histogram('problem', 1) == {1: 1, 3: 1})
+
+    def test_reconcile_delta(self):
+
+        '''
+            test reconcile adds the difference and keeps the right buckets
+        :return: None
+        '''
+
+        db.session.add(SubmissionStatus(author_username='u1', problem_id=1, status=1))
+        Statistic.record([('u1', 1, None, 1), ('u1', 1, None, 1)])
+        db.session.commit()
+        Statistic.reconcile()
+        self.assertTrue(Statistic.histogram('user', 'u1') == {1: 1})
+        Statistic.reconcile()
+        self.assertTrue(Statistic.histogram('problem', 1) == {1: 1})
+
+    def test_count_problem_submissions(self):
+
+        '''
+            test the problem counters get the old submissions once and wait for the young ones
+        :return: None
+        '''
+
+        self.app.config['SUBMISSION_COUNT_GRACE'] = 30
+        old = datetime.utcnow() - timedelta(minutes=1)
+        db.session.add(Problem(id=1, title='p1', submission_num=5))
+        db.session.add(SubmissionStatus(problem_id=1, status=0, submit_time=old))
+        db.session.add(SubmissionStatus(problem_id=1, status=0, submit_time=old, contest_id=1))
+        db.session.add(SubmissionStatus(problem_id=1, status=0, submit_time=datetime.utcnow()))
+        db.session.commit()
+        self.assertTrue(count_problem_submissions() == 2)
+        self.assertTrue(Problem.query.get(1).submission_num == 6)
+        self.assertTrue(count_problem_submissions() == 0)
+        self.app.config['SUBMISSION_COUNT_GRACE'] = 0
+        self.assertTrue(count_problem_submissions() == 1)
+        self.assertTrue(Problem.query.get(1).submission_num == 7)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from app import create_app, db
+from app.models import Problem, OJList, Tag, TagProblem
+from app.pagination import BitmapPagination
+from app.cache import invalidate_problem_meta
+from app.problem.tag_index import parse_expression, get_tag_index, invalidate_tag_index, MAX_LENGTH, MAX_DEPTH
+
+class TagIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        '''
+            set up func for test tag index
+        :return: None
+        '''
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+
+        '''
+            tear down func for test tag index
+        :return: None
+        '''
+
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_parse_expression(self):
+
+        '''
+            test the precedence is ! over & over |, and the wrong expressions are refused
+        :return: None
+        '''
+
+        self.assertTrue(parse_expression(u'a | b & !c') == ('|', ('tag', u'a'), ('&', ('tag', u'b'), ('!', ('tag', u'c')))))
+        self.assertTrue(parse_expression(u'(a | b) & c') == ('&', ('|', ('tag', u'a'), ('tag', u'b')), ('tag', u'c')))
+        self.assertTrue(parse_expression(u' two words & "x|y" ') == ('&', ('tag', u'two words'), ('tag', u'x|y')))
+        for expression in (u'a &', u'(a', u'a)', u'"a', u'& a', u'!'):
+            self.assertRaises(ValueError, parse_expression, expression)
+        # a long chain is one node, deep nesting and long input are refused before any recursion error
+        self.assertTrue(len(parse_expression(u' & '.join([u'a'] * 100))) == 101)
+        self.assertTrue(get_tag_index().match(u' | '.join([u'a'] * 100)) == 0)
+        for expression in (u'(' * (MAX_DEPTH + 1) + u'a' + u')' * (MAX_DEPTH + 1), u'!' * 2000 + u'a', u'a' * (MAX_LENGTH + 1)):
+            self.assertRaises(ValueError, parse_expression, expression)
+
+    def test_version(self):
+
+        '''
+            test the index is kept when only the problem meta changed
+        :return: None
+        '''
+
+        index = get_tag_index()
+        invalidate_problem_meta()
+        self.assertTrue(get_tag_index() is index)
+        invalidate_tag_index()
+        self.assertFalse(get_tag_index() is index)
+
+    def test_search(self):
+
+        '''
+            test expressions and filters on the index
+        :return: None
+        '''
+
+        oj = OJList(name='hdu')
+        a, b = Tag(tag_name=u'图论'), Tag(tag_name='b')
+        db.session.add_all([oj, a, b])
+        db.session.commit()
+        problems = [Problem(title='p%d' % i, oj_id=oj.id if i % 2 else None, remote_id=i, visible=i != 4) for i in range(6)]
+        db.session.add_all(problems)
+        db.session.commit()
+        ids = [p.id for p in problems]
+        db.session.add_all([TagProblem(tag_id=a.id, problem_id=i) for i in ids[:3]] + [TagProblem(tag_id=b.id, problem_id=i) for i in ids[2:]])
+        db.session.commit()
+        index = get_tag_index()
+        to_ids = lambda bitmap: BitmapPagination.lowest(bitmap, 100)
+        self.assertTrue(to_ids(index.search(u'图论 & b')) == ids[2:3])
+        self.assertTrue(to_ids(index.search(u'!b')) == ids[:2])
+        self.assertTrue(to_ids(index.search(u'b', visible_only=False)) == ids[2:])
+        self.assertTrue(to_ids(index.search(u'b')) == [ids[2], ids[3], ids[5]])
+        self.assertTrue(to_ids(index.search(u'', oj='hdu')) == [ids[1], ids[3], ids[5]])
+        self.assertTrue(to_ids(index.search(u'', oj='poj')) == [])
+        self.assertTrue(to_ids(index.search(u'图论', remote_id=1)) == ids[1:2])
+        self.assertTrue(to_ids(index.search(u'missing | b', oj='hdu')) == [ids[3], ids[5]])
+
+    def test_bitmap_pagination(self):
+
+        '''
+            test pages before and after a key on a bitmap
+        :return: None
+        '''
+
+        bitmap = sum(1 << i for i in (2, 3, 5, 7, 11, 13, 17))
+        page = BitmapPagination(bitmap, 3)
+        self.assertTrue(page.items == [2, 3, 5] and page.total == 7)
+        self.assertTrue(not page.has_prev and page.has_next)
+        page = BitmapPagination(bitmap, 3, after=page.next_cursor)
+        self.assertTrue(page.items == [7, 11, 13] and page.has_prev and page.has_next)
+        page = BitmapPagination(bitmap, 3, after=page.next_cursor)
+        self.assertTrue(page.items == [17] and page.has_prev and not page.has_next)
+        page = BitmapPagination(bitmap, 3, before=page.prev_cursor)
+        self.assertTrue(page.items == [7, 11, 13] and page.has_prev and page.has_next)
+        page = BitmapPagination(bitmap, 3, before=7)
+        self.assertTrue(page.items == [2, 3, 5] and not page.has_prev)
+        page = BitmapPagination(bitmap, 3, before=3)
+        self.assertTrue(page.items == [2, 3, 5] and not page.has_prev)
+        page = BitmapPagination(0, 3)
+        self.assertTrue(page.items == [] and not page.has_next and page.total == 0)